@@ -0,0 +1,60 @@
+# accounts/async_views.py
+"""
+Async login for ASGI deployments, served at /api/async/accounts/login/.
+
+Same request and response as LoginView, but the password is checked with
+``aauthenticate`` (accounts/hashing.py): the hash runs on the bounded
+hashing pool while the event loop keeps serving other requests, and a
+login that finds the pool saturated gets a 503 with Retry-After.
+"""
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from posts.async_views import json_response
+from .hashing import PoolSaturated, aauthenticate
+from .serializers import LoginCredentialsSerializer, SimpleUserSerializer
+
+RETRY_AFTER_SECONDS = 1
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncLoginView(View):
+    """
+    POST /api/async/accounts/login/  {"username": ..., "password": ...}
+    """
+
+    async def post(self, request):
+        drf_request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+        try:
+            serializer = LoginCredentialsSerializer(data=drf_request.data)
+        except exceptions.ParseError as exc:
+            return json_response({'detail': str(exc.detail)}, status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            user = await aauthenticate(**serializer.validated_data)
+        except PoolSaturated:
+            response = json_response(
+                {'detail': 'Too many logins in progress, retry shortly.'},
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response['Retry-After'] = str(RETRY_AFTER_SECONDS)
+            return response
+        if user is None:
+            return json_response(
+                {'non_field_errors': ['Invalid username or password.']},
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return json_response({
+            'message': 'Login successful',
+            'user': SimpleUserSerializer(user).data,
+            'token': token.key,
+        })
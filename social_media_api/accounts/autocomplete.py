@@ -0,0 +1,83 @@
+# accounts/autocomplete.py
+"""
+Username prefix autocomplete for @mentions.
+
+Usernames are matched case-insensitively on ``User.username_key`` (the
+casefolded username, indexed). A prefix becomes the range
+``prefix <= key < successor(prefix)``, which is served from the index;
+``username__istartswith`` compiles to ``LIKE 'abc%'``, which SQLite never
+answers from an index.
+
+Matches are ranked by ``followers_count`` and one of two plans keeps that
+bounded whatever the prefix:
+
+- a selective prefix, matching fewer than AUTOCOMPLETE_SCAN_LIMIT users,
+  reads its whole range from the (username_key, followers_count) index,
+  without touching the table, and sorts it;
+- a dense prefix ("a", "jo") walks the followers_count index from the most
+  followed user down and stops at the ``limit``-th match. At least one in
+  total / AUTOCOMPLETE_SCAN_LIMIT users match, so the walk is short.
+
+A probe of at most AUTOCOMPLETE_SCAN_LIMIT index entries picks the plan.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.functions import Substr
+
+from .models import username_key
+
+User = get_user_model()
+
+SCAN_LIMIT = getattr(settings, 'AUTOCOMPLETE_SCAN_LIMIT', 2000)
+MAX_RESULTS = getattr(settings, 'AUTOCOMPLETE_MAX_RESULTS', 20)
+
+
+def prefix_range(key):
+    """
+    (low, high) such that ``low <= k < high`` exactly when ``k`` starts
+    with ``key``.
+    """
+    last = ord(key[-1])
+    if last == 0x10FFFF:
+        return key, None
+    return key, key[:-1] + chr(last + 1)
+
+
+def matching(key):
+    low, high = prefix_range(key)
+    users = User.objects.filter(username_key__gte=low)
+    return users.filter(username_key__lt=high) if high is not None else users
+
+
+def autocomplete(prefix, limit=10):
+    """
+    Up to ``limit`` active users whose username starts with ``prefix``
+    (case-insensitively, a leading "@" ignored), most followed first.
+    """
+    key = username_key(prefix.strip().lstrip('@'))
+    limit = max(1, min(limit, MAX_RESULTS))
+    if not key:
+        return []
+
+    dense = matching(key).order_by().values('pk')[SCAN_LIMIT - 1:SCAN_LIMIT].exists()
+    if dense:
+        # comparing a substring keeps SQLite off the key index, so it walks
+        # followers_count in order and stops after `limit` matches
+        users = (
+            User.objects.annotate(key_prefix=Substr('username_key', 1, len(key)))
+            .filter(key_prefix=key, is_active=True)
+            .order_by('-followers_count', '-id')
+        )
+        return list(users[:limit])
+
+    # (username_key, followers_count) covers this: no table rows are read
+    ranked = [
+        user_id for _, user_id in
+        sorted(matching(key).values_list('followers_count', 'id'), key=lambda row: (-row[0], -row[1]))
+    ]
+    found = []
+    while ranked and len(found) < limit:
+        chunk, ranked = ranked[:limit], ranked[limit:]
+        by_id = User.objects.filter(is_active=True).in_bulk(chunk)
+        found += [by_id[user_id] for user_id in chunk if user_id in by_id]
+    return found[:limit]
@@ -0,0 +1,60 @@
+# accounts/counters.py
+"""
+Helpers for the denormalized follower/following/post counters on User.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+User = get_user_model()
+
+
+def adjust_counter(user_ids, field, delta):
+    """
+    Atomically add ``delta`` to ``field`` for every user in ``user_ids``.
+
+    Never goes below zero: rows bulk-inserted without signals can be
+    deleted through them, and reconcile_counters repairs that drift.
+    """
+    if user_ids and delta:
+        User.objects.filter(pk__in=user_ids).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def actual_counts():
+    """
+    Correlated subqueries computing the true value of each counter.
+    """
+    Follow = User.followers.through
+    from posts.models import Post
+
+    def count_of(queryset, column):
+        return Coalesce(Subquery(
+            queryset.filter(**{column: OuterRef('pk')})
+            .order_by()
+            .values(column)
+            .annotate(total=Count('*'))
+            .values('total')
+        ), 0)
+
+    return {
+        'followers_count': count_of(Follow.objects.all(), 'from_user'),
+        'following_count': count_of(Follow.objects.all(), 'to_user'),
+        'posts_count': count_of(Post.objects.all(), 'author'),
+    }
+
+
+def reconcile_counters(queryset=None):
+    """
+    Repair counter drift in bulk. Returns the number of users fixed.
+    """
+    queryset = User.objects.all() if queryset is None else queryset
+    counts = actual_counts()
+    drift = Q()
+    for field in counts:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    drifted = (
+        queryset
+        .alias(**{f'actual_{field}': expr for field, expr in counts.items()})
+        .filter(drift)
+    )
+    return User.objects.filter(pk__in=drifted.values('pk')).update(**counts)
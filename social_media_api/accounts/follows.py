@@ -0,0 +1,119 @@
+# accounts/follows.py
+"""
+Set-based follow/unfollow for many targets at once.
+
+These write the follow table directly instead of looping over
+``following.add()``, but send the same m2m_changed signals Django would,
+so counters, feeds and the follow-graph cache stay in step.
+"""
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+
+User = get_user_model()
+Follow = User.followers.through
+
+FOLLOWED = 'followed'
+UNFOLLOWED = 'unfollowed'
+ALREADY_FOLLOWING = 'already_following'
+NOT_FOLLOWING = 'not_following'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def _send(action, user, pk_set, using):
+    m2m_changed.send(
+        sender=Follow, action=action, instance=user, reverse=True,
+        model=User, pk_set=pk_set, using=using,
+    )
+
+
+def _classify(user, target_ids):
+    """
+    Split ``target_ids`` into (existing users, currently followed) with one
+    query each.
+    """
+    target_ids = set(target_ids) - {user.pk}
+    found = set(User.objects.filter(pk__in=target_ids).values_list('pk', flat=True))
+    followed = set(
+        Follow.objects
+        .filter(to_user_id=user.pk, from_user_id__in=found)
+        .values_list('from_user_id', flat=True)
+    )
+    return found, followed
+
+
+def _lock_followed(user, target_ids, using):
+    """
+    The ids in ``target_ids`` that ``user`` follows, read inside the write
+    transaction after locking ``user``'s row, so concurrent bulk calls for
+    the same user take turns and never count the same edge twice.
+    """
+    list(User.objects.using(using).select_for_update().filter(pk=user.pk).values_list('pk'))
+    return set(
+        Follow.objects.using(using)
+        .filter(to_user_id=user.pk, from_user_id__in=target_ids)
+        .values_list('from_user_id', flat=True)
+    )
+
+
+def _results(user, target_ids, found, statuses):
+    results, seen = [], set()
+    for target_id in target_ids:
+        if target_id in seen:
+            continue
+        seen.add(target_id)
+        if target_id == user.pk:
+            status = SELF
+        elif target_id not in found:
+            status = NOT_FOUND
+        else:
+            status = statuses(target_id)
+        results.append({'user_id': target_id, 'status': status})
+    return results
+
+
+def bulk_follow(user, target_ids):
+    """
+    Make ``user`` follow every existing user in ``target_ids``.
+    Returns one ``{'user_id', 'status'}`` dict per distinct id, in input order.
+    """
+    found, followed = _classify(user, target_ids)
+    new_ids = found - followed
+    if new_ids:
+        using = router.db_for_write(Follow, instance=user)
+        with transaction.atomic(using=using):
+            # the counters move by len(new_ids): drop edges added since _classify
+            new_ids -= _lock_followed(user, new_ids, using)
+            if new_ids:
+                _send('pre_add', user, new_ids, using)
+                Follow.objects.using(using).bulk_create(
+                    [Follow(from_user_id=target_id, to_user_id=user.pk) for target_id in new_ids],
+                    ignore_conflicts=True,
+                )
+                _send('post_add', user, new_ids, using)
+    return _results(
+        user, target_ids, found,
+        lambda target_id: FOLLOWED if target_id in new_ids else ALREADY_FOLLOWING,
+    )
+
+
+def bulk_unfollow(user, target_ids):
+    """
+    Make ``user`` unfollow every user in ``target_ids`` they follow.
+    """
+    found, followed = _classify(user, target_ids)
+    if followed:
+        using = router.db_for_write(Follow, instance=user)
+        with transaction.atomic(using=using):
+            followed &= _lock_followed(user, followed, using)
+            if followed:
+                _send('pre_remove', user, followed, using)
+                Follow.objects.using(using).filter(
+                    to_user_id=user.pk, from_user_id__in=followed
+                ).delete()
+                _send('post_remove', user, followed, using)
+    return _results(
+        user, target_ids, found,
+        lambda target_id: UNFOLLOWED if target_id in followed else NOT_FOLLOWING,
+    )
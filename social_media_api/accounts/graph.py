@@ -0,0 +1,118 @@
+# accounts/graph.py
+"""
+In-process cache of the follow graph.
+
+Each user's following set is held as a sorted ``array('q')`` of user ids,
+loaded lazily from the follow table the first time it is needed. Membership
+checks are a bisect (O(log n)) and author lists for feed queries come
+straight from the array, without touching ``accounts_user_followers``.
+
+Entries are evicted least-recently-used once the arrays exceed
+FOLLOW_GRAPH_CACHE_BYTES, dropped by the m2m_changed handler in
+accounts/signals.py whenever an edge changes, and expire after
+FOLLOW_GRAPH_CACHE_TTL seconds so other worker processes catch up.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+User = get_user_model()
+
+# rough per-entry cost of the dict slot, tuple and array header
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class FollowGraphCache:
+
+    def __init__(self, max_bytes=None, ttl=None):
+        self.max_bytes = max_bytes or getattr(settings, 'FOLLOW_GRAPH_CACHE_BYTES', 32 * 1024 * 1024)
+        self.ttl = ttl or getattr(settings, 'FOLLOW_GRAPH_CACHE_TTL', 60)
+        self._entries = OrderedDict()  # user_id -> (loaded_at, array)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(ids):
+        return ids.itemsize * len(ids) + ENTRY_OVERHEAD_BYTES
+
+    def following_ids(self, user_id):
+        """
+        Sorted array of the ids ``user_id`` follows.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        Follow = User.followers.through
+        ids = array('q', (
+            Follow.objects
+            .filter(to_user_id=user_id)
+            .order_by('from_user_id')
+            .values_list('from_user_id', flat=True)
+        ))
+        self._store(user_id, ids)
+        return ids
+
+    def is_following(self, user_id, target_id):
+        ids = self.following_ids(user_id)
+        index = bisect_left(ids, target_id)
+        return index < len(ids) and ids[index] == target_id
+
+    def confirm_following(self, user_id, target_id):
+        """
+        The follow table's answer for one edge, for decisions that must not
+        be up to FOLLOW_GRAPH_CACHE_TTL stale. A cached set that disagrees
+        (changed through another worker) is dropped.
+        """
+        Follow = User.followers.through
+        following = Follow.objects.filter(to_user_id=user_id, from_user_id=target_id).exists()
+        if following != self.is_following(user_id, target_id):
+            self._discard([user_id])
+        return following
+
+    def _store(self, user_id, ids):
+        with self._lock:
+            old = self._entries.pop(user_id, None)
+            if old is not None:
+                self._bytes -= self._size(old[1])
+            self._entries[user_id] = (time.monotonic(), ids)
+            self._bytes += self._size(ids)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+
+    def invalidate(self, user_ids):
+        """
+        Drop cached entries now and again once the current transaction
+        commits, so a concurrent reload cannot cache pre-commit state.
+        """
+        user_ids = list(user_ids)
+        self._discard(user_ids)
+        transaction.on_commit(lambda: self._discard(user_ids))
+
+    def _discard(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.pop(user_id, None)
+                if entry is not None:
+                    self._bytes -= self._size(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+follow_graph = FollowGraphCache()
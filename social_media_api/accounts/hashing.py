@@ -0,0 +1,145 @@
+# accounts/hashing.py
+"""
+Password verification off the request path, with backpressure.
+
+A login spends hundreds of milliseconds of CPU in PBKDF2. Run inline it
+blocks the ASGI event loop, or the one shared thread every sync view runs
+on, so a login storm stalls feed reads too. ``hashing_pool`` runs hashes
+on LOGIN_HASH_WORKERS threads (hashlib releases the GIL while it iterates)
+and admits at most LOGIN_HASH_QUEUE_DEPTH more waiting logins; beyond that
+``PoolSaturated`` is raised and the view answers 503 at once instead of
+queueing. Queue wait and hash time are sampled for ``stats()``.
+
+``hash_passwords`` is the worker function of the bulk import's process
+pool (accounts/importer.py). Importing this module loads no models (the
+user model is only looked up inside ``aauthenticate``), so spawned
+workers can import it without setting up Django.
+"""
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    cuts = statistics.quantiles(samples * 2 if len(samples) == 1 else samples, n=100, method='inclusive')
+    return {'p50': round(cuts[49], 2), 'p95': round(cuts[94], 2), 'p99': round(cuts[98], 2)}
+
+
+class HashingPool:
+
+    def __init__(self, workers=None, queue_depth=None, samples=1000):
+        self.workers = workers or getattr(settings, 'LOGIN_HASH_WORKERS', 2)
+        self.queue_depth = queue_depth if queue_depth is not None else getattr(settings, 'LOGIN_HASH_QUEUE_DEPTH', 32)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._wait_ms = deque(maxlen=samples)
+        self._hash_ms = deque(maxlen=samples)
+        self.completed = self.rejected = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='login-hash')
+        return self._executor
+
+    def submit(self, function, *args):
+        """
+        Run ``function(*args)`` on the pool and return its Future, or raise
+        PoolSaturated if every worker is busy and the queue is full.
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                self.rejected += 1
+                raise PoolSaturated
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                with self._lock:
+                    self._wait_ms.append((started - submitted) * 1000)
+                    self._hash_ms.append((time.perf_counter() - started) * 1000)
+
+        try:
+            future = self.executor.submit(timed)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future is not None:
+                self.completed += 1
+
+    async def arun(self, function, *args):
+        return await asyncio.wrap_future(self.submit(function, *args))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'in_progress': self._pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'wait_ms': percentiles(list(self._wait_ms)),
+                'hash_ms': percentiles(list(self._hash_ms)),
+            }
+
+
+hashing_pool = HashingPool()
+
+
+def hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+async def aauthenticate(username, password):
+    """
+    Async ``authenticate()`` for username/password, with the same rules as
+    ModelBackend, hashing on ``hashing_pool``. Returns the user or None;
+    raises PoolSaturated.
+    """
+    User = get_user_model()
+    try:
+        user = await User._default_manager.aget_by_natural_key(username)
+    except User.DoesNotExist:
+        # hash anyway, so response times do not reveal which usernames exist
+        await hashing_pool.arun(make_password, password)
+        return None
+
+    outdated = []
+    if not await hashing_pool.arun(check_password, password, user.password, outdated.append):
+        return None
+    if not user.is_active:
+        return None
+    if outdated:
+        # the hasher or its iteration count changed: store an upgraded hash
+        user.password = await hashing_pool.arun(make_password, password)
+        await user.asave(update_fields=['password'])
+    return user
@@ -0,0 +1,194 @@
+# accounts/importer.py
+"""
+Bulk user import (``manage.py import_users``, POST /api/accounts/import/).
+
+Rows are read one at a time from CSV (with a header line) or JSON Lines,
+with columns ``username``, ``password`` and optionally ``email``, ``bio``,
+``first_name`` and ``last_name``; other columns are ignored. Every
+IMPORT_BATCH_SIZE rows:
+
+- each row is cleaned with the model fields' own validation and usernames
+  are checked against the database with one query and against earlier
+  rows of the file;
+- the passwords of valid rows are hashed on a pool of IMPORT_HASH_WORKERS
+  processes, while the next batch is read and validated;
+- users and their tokens are inserted with two bulk_create() calls.
+
+A row that fails is reported with its line number and field errors and
+the rest of its batch is imported regardless. bulk_create() sends no
+signals; a new user without a picture has nothing to react to.
+"""
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from .hashing import hash_passwords
+from .models import username_key
+
+User = get_user_model()
+
+BATCH_SIZE = getattr(settings, 'IMPORT_BATCH_SIZE', 1000)
+HASH_WORKERS = getattr(settings, 'IMPORT_HASH_WORKERS', None)
+FIELDS = ('username', 'email', 'bio', 'first_name', 'last_name')
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, f"Invalid JSON: {exc}"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected a JSON object."
+
+
+def read_rows(lines, file_format):
+    """
+    (line number, record dict or error message) for each row of ``lines``,
+    an iterable of text lines.
+    """
+    return read_csv(lines) if file_format == 'csv' else read_jsonl(lines)
+
+
+def format_for(filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(extension)
+
+
+def clean(record):
+    """
+    (values, None) for a valid record, or (None, {field: [messages]}).
+    """
+    values, errors = {}, {}
+    for name in FIELDS:
+        field = User._meta.get_field(name)
+        try:
+            values[name] = field.clean(record.get(name) or '', None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    password = record.get('password')
+    if not isinstance(password, str) or not password:
+        errors['password'] = ["This field is required."]
+    if errors:
+        return None, errors
+    values['username'] = User.normalize_username(values['username'])
+    values['email'] = BaseUserManager.normalize_email(values['email'])
+    values['password'] = password
+    return values, None
+
+
+class UserImport:
+    """
+    One import run; ``run(rows)`` returns {"created", "failed", "errors"}.
+    """
+
+    def __init__(self, batch_size=None, workers=None):
+        self.batch_size = batch_size or BATCH_SIZE
+        workers = HASH_WORKERS if workers is None else workers
+        self.workers = os.cpu_count() if workers is None else workers
+        self.seen = set()
+        self.created = 0
+        self.errors = []
+
+    def fail(self, line, errors, username=None):
+        self.errors.append({'line': line, 'username': username, 'errors': errors})
+
+    def run(self, rows):
+        executor = None
+        if self.workers:
+            # spawn: never fork a process holding DB connections and threads
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'))
+        pending = deque()
+        try:
+            rows = iter(rows)
+            while batch := list(islice(rows, self.batch_size)):
+                valid = self.validate(batch)
+                pending.append((valid, self.hash(executor, [values['password'] for _, values in valid])))
+                # hashing of this batch overlaps reading and validating the next
+                if len(pending) > 1:
+                    self.insert(*pending.popleft())
+            while pending:
+                self.insert(*pending.popleft())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        errors = sorted(self.errors, key=lambda error: error['line'])
+        return {'created': self.created, 'failed': len(errors), 'errors': errors}
+
+    def validate(self, batch):
+        valid = []
+        for line, record in batch:
+            if isinstance(record, str):
+                self.fail(line, {'non_field_errors': [record]})
+                continue
+            values, errors = clean(record)
+            if errors:
+                self.fail(line, errors, record.get('username'))
+            else:
+                valid.append((line, values))
+
+        taken = set(
+            User.objects.filter(username__in=[values['username'] for _, values in valid])
+            .values_list('username', flat=True)
+        )
+        unique, message = [], str(User._meta.get_field('username').error_messages['unique'])
+        for line, values in valid:
+            username = values['username']
+            if username in taken or username in self.seen:
+                self.fail(line, {'username': [message]}, username)
+            else:
+                self.seen.add(username)
+                unique.append((line, values))
+        return unique
+
+    def hash(self, executor, passwords):
+        if executor is None:
+            future = Future()
+            future.set_result(hash_passwords(passwords))
+            return [future]
+        size = max(1, -(-len(passwords) // self.workers))
+        return [executor.submit(hash_passwords, passwords[i:i + size]) for i in range(0, len(passwords), size)]
+
+    def insert(self, valid, futures):
+        hashes = [encoded for future in futures for encoded in future.result()]
+        users = [
+            User(**{**values, 'password': encoded}, username_key=username_key(values['username']))
+            for (_, values), encoded in zip(valid, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                self.save(users)
+        except IntegrityError:
+            # a username taken since validation: import row by row
+            for (line, values), user in zip(valid, users):
+                user.pk = None  # assigned by the rolled back insert
+                try:
+                    with transaction.atomic():
+                        self.save([user])
+                except IntegrityError as exc:
+                    self.fail(line, {'non_field_errors': [str(exc)]}, values['username'])
+
+    def save(self, users):
+        User.objects.bulk_create(users)
+        Token.objects.bulk_create(Token(user=user, key=Token.generate_key()) for user in users)
+        self.created += len(users)
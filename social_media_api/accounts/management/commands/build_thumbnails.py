@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.thumbnails import thumbnail_pipeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Generate missing profile picture thumbnails on the thumbnail process pool"
+
+    def handle(self, *args, **options):
+        queued = 0
+        users = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        for user in users.only('id', 'profile_picture', 'thumbnails').iterator():
+            if user.thumbnails.get('source') != user.profile_picture.name:
+                thumbnail_pipeline.submit(user.pk, user.profile_picture.name)
+                queued += 1
+        thumbnail_pipeline.wait()
+        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails for {queued} user(s)."))
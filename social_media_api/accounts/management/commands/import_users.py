@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importer import FORMATS, UserImport, format_for, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users from a CSV (with a header line) or JSON Lines file with "
+        "username, password and optional email, bio, first_name, last_name "
+        "columns. Passwords are hashed on a process pool; users and tokens are "
+        "bulk inserted in batches; invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for standard input")
+        parser.add_argument('--format', choices=FORMATS, help="Default: from the file extension")
+        parser.add_argument('--batch-size', type=int, help="Rows per bulk insert (default IMPORT_BATCH_SIZE)")
+        parser.add_argument(
+            '--workers', type=int,
+            help="Password hashing processes (default IMPORT_HASH_WORKERS, else one per CPU; 0 hashes inline)"
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or format_for(options['path'])
+        if file_format is None:
+            raise CommandError("Pass --format: the file extension is neither .csv nor .jsonl.")
+
+        run = UserImport(batch_size=options['batch_size'], workers=options['workers'])
+        if options['path'] == '-':
+            result = run.run(read_rows(sys.stdin, file_format))
+        else:
+            try:
+                with open(options['path'], encoding='utf-8-sig', errors='replace', newline='') as lines:
+                    result = run.run(read_rows(lines, file_format))
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        for error in result['errors']:
+            details = '; '.join(
+                f"{field}: {' '.join(messages)}" for field, messages in error['errors'].items()
+            )
+            self.stdout.write(self.style.WARNING(f"line {error['line']} ({error['username']}): {details}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} user(s); {result['failed']} row(s) failed."
+        ))
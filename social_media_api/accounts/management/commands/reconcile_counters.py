@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute followers_count, following_count and posts_count where they have drifted"
+
+    def handle(self, *args, **kwargs):
+        fixed = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(f"Repaired counters for {fixed} user(s)."))
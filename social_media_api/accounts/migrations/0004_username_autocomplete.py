@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+"""
+Indexed casefolded usernames for @mention autocomplete (see
+accounts/autocomplete.py); existing users get their key filled in.
+"""
+from django.db import migrations, models
+
+
+def populate_username_keys(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    batch = []
+    for user in User.objects.only('id', 'username').iterator(chunk_size=1000):
+        user.username_key = user.username.casefold()
+        batch.append(user)
+        if len(batch) >= 1000:
+            User.objects.bulk_update(batch, ['username_key'])
+            batch = []
+    User.objects.bulk_update(batch, ['username_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_thumbnails'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='username_key',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['username_key', 'followers_count'], name='user_username_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['followers_count'], name='user_followers_count_idx'),
+        ),
+        migrations.RunPython(populate_username_keys, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,47 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+
+def username_key(username):
+    """
+    Case-insensitive form of a username, as stored in ``User.username_key``.
+    """
+    return username.casefold()
+
+
 class User(AbstractUser):
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # {"source": picture name, "64": thumbnail name, ...}; see accounts/thumbnails.py
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     followers = models.ManyToManyField(
         'self',
         symmetrical=False,
         related_name='following',
         blank=True
     )
+    # Denormalized counters, maintained by accounts/signals.py and
+    # posts/signals.py; `manage.py reconcile_counters` repairs drift.
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    # casefolded username for indexed prefix lookups (accounts/autocomplete.py);
+    # set by save(), so bulk_create()/update() callers must fill it themselves
+    username_key = models.CharField(max_length=150, default='', editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['username_key', 'followers_count'], name='user_username_key_idx'),
+            # autocomplete of common prefixes walks users from the most followed
+            models.Index(fields=['followers_count'], name='user_followers_count_idx'),
+        ]
 
     def __str__(self):
         return self.username
+
+    def save(self, *args, **kwargs):
+        self.username_key = username_key(self.username)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'username' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'username_key'}
+        super().save(*args, **kwargs)
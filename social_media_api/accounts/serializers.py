@@ -3,6 +3,8 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework.authtoken.models import Token
 
+from .thumbnails import thumbnail_urls
+
 User = get_user_model()
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -28,10 +30,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserLoginSerializer(serializers.Serializer):
+class LoginCredentialsSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
+
+class UserLoginSerializer(LoginCredentialsSerializer):
+
     def validate(self, data):
         user = authenticate(username=data['username'], password=data['password'])
         if not user:
@@ -40,16 +45,46 @@ class UserLoginSerializer(serializers.Serializer):
         return data
 
 
+class ThumbnailsField(serializers.ReadOnlyField):
+    """
+    {size: url} of the profile picture thumbnails, falling back to the
+    original picture until they have been generated.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, user):
+        request = self.context.get('request')
+        return thumbnail_urls(user, request.build_absolute_uri if request is not None else None)
+
+
 class SimpleUserSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    # counters are stored on the user row, so serializing costs no queries
+    profile_picture_thumbnails = ThumbnailsField()
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'bio', 'profile_picture', 'profile_picture_thumbnails',
+            'followers_count', 'following_count', 'posts_count'
+        ]
+        read_only_fields = ['followers_count', 'following_count', 'posts_count']
+
+
+class UserMentionSerializer(serializers.ModelSerializer):
+    profile_picture_thumbnails = ThumbnailsField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'bio', 'profile_picture', 'followers_count', 'following_count']
+        fields = ['id', 'username', 'profile_picture_thumbnails', 'followers_count']
+        read_only_fields = fields
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
 
-    def get_following_count(self, obj):
-        return obj.following.count()
+class BulkFollowSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500,
+    )
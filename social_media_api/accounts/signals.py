@@ -0,0 +1,78 @@
+# accounts/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .counters import adjust_counter
+from .graph import follow_graph
+from .thumbnails import thumbnail_pipeline
+
+User = get_user_model()
+Follow = User.followers.through
+
+
+@receiver(m2m_changed, sender=Follow)
+def sync_follow_edges(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep followers_count/following_count and the follow-graph cache in
+    step with the follow table.
+
+    Runs inside the transaction Django opens for add()/remove()/clear(),
+    so the counters commit or roll back together with the edges.
+    """
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() reports the ids it was given, not the edges that existed;
+        # clear() reports none at all. Record the real ones before deletion.
+        related = instance.following if reverse else instance.followers
+        if pk_set is not None:
+            related = related.filter(pk__in=pk_set)
+        instance._removed_follow_ids = set(related.values_list('pk', flat=True))
+        return
+
+    if action == 'post_add':
+        delta, ids = 1, pk_set or set()
+    elif action in ('post_remove', 'post_clear'):
+        delta, ids = -1, instance.__dict__.pop('_removed_follow_ids', set())
+    else:
+        return
+    if not ids:
+        return
+
+    # reverse: instance follows ids; forward: ids follow instance
+    follow_graph.invalidate([instance.pk] if reverse else ids)
+    own_field, other_field = (
+        ('following_count', 'followers_count') if reverse
+        else ('followers_count', 'following_count')
+    )
+    adjust_counter([instance.pk], own_field, delta * len(ids))
+    adjust_counter(ids, other_field, delta)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    # cascaded edge deletes bypass m2m_changed, so start the cache afresh
+    follow_graph.clear()
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def forget_deactivated_user(sender, instance, **kwargs):
+    if not instance.is_active:
+        token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate_key(instance.key)
+
+
+@receiver(post_save, sender=User)
+def queue_profile_thumbnails(sender, instance, **kwargs):
+    """
+    Render thumbnails for a new profile picture once the save commits.
+    """
+    picture = instance.profile_picture
+    if picture and instance.thumbnails.get('source') != picture.name:
+        thumbnail_pipeline.schedule(instance)
@@ -1,3 +1,480 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+from PIL import Image
+
+from posts.models import Post
+from .authentication import token_cache
+from .autocomplete import autocomplete
+from .counters import reconcile_counters
+from .follows import bulk_follow
+from .graph import FollowGraphCache, follow_graph
+from .hashing import HashingPool, hashing_pool
+from .serializers import SimpleUserSerializer
+from .thumbnails import ThumbnailPipeline, thumbnail_name, thumbnail_pipeline
+
+User = get_user_model()
+
+
+class RegisterLoginTestCase(APITestCase):
+    """
+    Anonymous clients can register and log in.
+    """
+
+    def test_register_then_login(self):
+        response = self.client.post(
+            reverse("register"), {"username": "newcomer", "password": "testpass123"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            reverse("login"), {"username": "newcomer", "password": "testpass123"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["token"], Token.objects.get(user__username="newcomer").key)
+
+        response = self.client.post(
+            reverse("login"), {"username": "newcomer", "password": "wrong"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncLoginTestCase(TestCase):
+    """
+    The async login hashes on the bounded pool and sheds load with 503s.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="storm", password="testpass123")
+        self.url = reverse("async-login")
+
+    async def login(self, password="testpass123", username="storm"):
+        return await self.async_client.post(
+            self.url, {"username": username, "password": password}, content_type="application/json"
+        )
+
+    async def test_login(self):
+        completed = hashing_pool.stats()["completed"]
+        response = await self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = await Token.objects.aget(user=self.user)
+        self.assertEqual(response.json()["token"], token.key)
+        stats = hashing_pool.stats()
+        self.assertEqual(stats["completed"], completed + 1)
+        self.assertGreater(stats["hash_ms"]["p50"], 0)
+
+        self.assertEqual((await self.login(password="wrong")).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((await self.login(username="nobody")).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((await self.login(username="")).status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_saturated_pool_answers_503(self):
+        pool = HashingPool(workers=1, queue_depth=0)
+        release = threading.Event()
+        pool.submit(release.wait)
+        try:
+            with mock.patch("accounts.hashing.hashing_pool", pool):
+                response = await self.login()
+        finally:
+            release.set()
+            pool.shutdown()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+
+class UserImportTestCase(APITestCase):
+    """
+    Bulk import streams rows, hashes on a pool and reports bad rows.
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        admin = User.objects.create(username="admin", is_staff=True)
+        User.objects.create(username="taken")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=admin).key}")
+
+    @mock.patch("accounts.importer.HASH_WORKERS", 0)
+    def test_jsonl_upload(self):
+        lines = [
+            '{"username": "Ada", "password": "pw-1", "email": "ada@EXAMPLE.com", "bio": "first"}',
+            '{"username": "taken", "password": "pw-2"}',
+            "",
+            "not json",
+            '{"username": "Ada", "password": "pw-3"}',
+            '{"username": "grace", "password": "pw-4", "role": "ignored"}',
+            '{"username": "no spaces", "password": ""}',
+        ]
+        upload = SimpleUploadedFile("users.jsonl", "\n".join(lines).encode())
+        response = self.client.post(reverse("user-import"), {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [2, 4, 5, 7])
+        self.assertEqual(set(response.data["errors"][3]["errors"]), {"username", "password"})
+
+        ada = User.objects.get(username="Ada")
+        self.assertEqual((ada.email, ada.bio, ada.username_key), ("ada@example.com", "first", "ada"))
+        self.assertTrue(ada.check_password("pw-1"))
+        self.assertEqual(Token.objects.filter(user__username__in=["Ada", "grace"]).count(), 2)
+        self.assertEqual(autocomplete("gr"), [User.objects.get(username="grace")])
+
+    def test_admin_only(self):
+        User.objects.filter(username="admin").update(is_staff=False)
+        token_cache.clear()
+        upload = SimpleUploadedFile("users.csv", b"username,password\nx,y\n")
+        response = self.client.post(reverse("user-import"), {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_hashes_on_a_process_pool(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write('username,password,bio\nlinus,pw-1,"two\nlines"\ntaken,pw-2,\n')
+        self.addCleanup(os.remove, handle.name)
+        out = io.StringIO()
+        call_command("import_users", handle.name, "--workers", "1", stdout=out)
+        self.assertIn("Imported 1 user(s); 1 row(s) failed.", out.getvalue())
+        self.assertIn("line 4 (taken)", out.getvalue())
+        linus = User.objects.get(username="linus")
+        self.assertEqual(linus.bio, "two\nlines")
+        self.assertTrue(linus.check_password("pw-1"))
+
+
+class FollowCountersTestCase(APITestCase):
+    """
+    Stored follower/following/post counters stay in step with the data.
+    """
+
+    def setUp(self):
+        follow_graph.clear()
+        self.alice = User.objects.create_user(username="alice", password="testpass123")
+        self.bob = User.objects.create_user(username="bob", password="testpass123")
+        token = Token.objects.create(user=self.alice)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.followers_count, user.following_count
+
+    def test_follow_and_unfollow_views_update_counters(self):
+        response = self.client.post(reverse("follow-user", args=[self.bob.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"]["followers_count"], 1)
+        self.assertEqual(self.counts(self.alice), (0, 1))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        response = self.client.post(reverse("unfollow-user", args=[self.bob.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"]["followers_count"], 0)
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_direct_m2m_changes_update_counters(self):
+        carol = User.objects.create_user(username="carol", password="testpass123")
+        self.bob.followers.add(self.alice, carol)
+        self.assertEqual(self.counts(self.bob), (2, 0))
+        self.assertEqual(self.counts(carol), (0, 1))
+
+        # removing a non-existent edge must not decrement anything
+        self.alice.following.remove(self.bob, carol)
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(carol), (0, 1))
+
+        self.bob.followers.clear()
+        self.assertEqual(self.counts(self.bob), (0, 0))
+        self.assertEqual(self.counts(carol), (0, 0))
+
+    def test_user_list_costs_constant_queries(self):
+        for i in range(5):
+            User.objects.create_user(username=f"user{i}", password="x")
+        with self.assertNumQueries(3):  # token auth, count, page
+            response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ReconcileCountersTestCase(TestCase):
+
+    def test_reconcile_repairs_drift(self):
+        alice = User.objects.create_user(username="alice", password="x")
+        bob = User.objects.create_user(username="bob", password="x")
+        alice.following.add(bob)
+        Post.objects.create(author=bob, title="t", content="c")
+        User.objects.update(followers_count=7, following_count=7, posts_count=7)
+
+        self.assertEqual(reconcile_counters(), 2)
+        bob.refresh_from_db()
+        self.assertEqual((bob.followers_count, bob.following_count, bob.posts_count), (1, 0, 1))
+        self.assertEqual(reconcile_counters(), 0)
+
+    def test_deleting_uncounted_rows_stops_at_zero(self):
+        alice = User.objects.create_user(username="alice", password="x")
+        # bulk_create sends no post_save, so the posts are never counted
+        Post.objects.bulk_create([Post(author=alice, title="t", content="c") for _ in range(2)])
+        Post.objects.filter(author=alice).delete()
+        alice.refresh_from_db()
+        self.assertEqual(alice.posts_count, 0)
+
+
+class FollowGraphCacheTestCase(APITestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f"user{i}") for i in range(6)]
+        self.reader = self.users[0]
+        self.reader.following.add(*self.users[3:0:-1])
+
+    def test_membership_is_served_from_memory(self):
+        cache = FollowGraphCache()
+        self.assertEqual(list(cache.following_ids(self.reader.id)), sorted(u.id for u in self.users[1:4]))
+        with self.assertNumQueries(0):
+            self.assertTrue(cache.is_following(self.reader.id, self.users[2].id))
+            self.assertFalse(cache.is_following(self.reader.id, self.users[5].id))
+
+    def test_follow_changes_invalidate_cached_entry(self):
+        follow_graph.clear()
+        self.assertFalse(follow_graph.is_following(self.reader.id, self.users[5].id))
+        self.reader.following.add(self.users[5])
+        self.assertTrue(follow_graph.is_following(self.reader.id, self.users[5].id))
+        self.users[5].followers.remove(self.reader)
+        self.assertFalse(follow_graph.is_following(self.reader.id, self.users[5].id))
+
+    def test_refusals_are_confirmed_against_the_table(self):
+        # edges written by another worker: this process's cached set is stale
+        Follow = User.followers.through
+        token = Token.objects.create(user=self.reader)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        follow_graph.clear()
+        self.assertFalse(follow_graph.is_following(self.reader.id, self.users[5].id))
+        Follow.objects.create(from_user=self.users[5], to_user=self.reader)
+        response = self.client.post(reverse("unfollow-user", args=[self.users[5].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertTrue(follow_graph.is_following(self.reader.id, self.users[1].id))
+        Follow.objects.filter(from_user=self.users[1], to_user=self.reader).delete()
+        response = self.client.post(reverse("follow-user", args=[self.users[1].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(follow_graph.is_following(self.reader.id, self.users[1].id))
+
+        response = self.client.post(reverse("follow-user", args=[self.users[1].id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lru_eviction_respects_memory_cap(self):
+        cache = FollowGraphCache(max_bytes=500)
+        for user in self.users:
+            cache.following_ids(user.id)
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 500)
+        self.assertEqual(stats["entries"], 2)
+        # most recently loaded users survive
+        with self.assertNumQueries(0):
+            cache.following_ids(self.users[-1].id)
+
+
+class BulkFollowTestCase(APITestCase):
+
+    def setUp(self):
+        follow_graph.clear()
+        self.me = User.objects.create(username="me")
+        self.others = [User.objects.create(username=f"other{i}") for i in range(4)]
+        self.me.following.add(self.others[0])
+        token = Token.objects.create(user=self.me)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_bulk_follow_reports_per_id_status(self):
+        ids = [o.id for o in self.others] + [self.others[1].id, self.me.id, 9999]
+        response = self.client.post(reverse("bulk-follow"), {"user_ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["changed"], 3)
+        self.assertEqual([r["status"] for r in response.data["results"]], [
+            "already_following", "followed", "followed", "followed", "self", "not_found",
+        ])
+        self.me.refresh_from_db()
+        self.assertEqual(self.me.following_count, 4)
+        self.assertEqual(set(self.me.following.values_list("id", flat=True)), {o.id for o in self.others})
+
+    def test_bulk_unfollow(self):
+        ids = [self.others[0].id, self.others[1].id]
+        response = self.client.post(reverse("bulk-unfollow"), {"user_ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r["status"] for r in response.data["results"]], ["unfollowed", "not_following"]
+        )
+        self.me.refresh_from_db()
+        self.assertEqual(self.me.following_count, 0)
+        self.assertFalse(follow_graph.is_following(self.me.id, self.others[0].id))
+
+    def test_overlapping_bulk_follows_count_each_edge_once(self):
+        ids = [o.id for o in self.others[:3]]
+        bulk_follow(self.me, ids)
+        # a second call that classified its ids before the first one committed
+        with mock.patch("accounts.follows._classify", return_value=(set(ids[1:]) | {self.others[3].id}, set())):
+            results = bulk_follow(self.me, ids[1:] + [self.others[3].id])
+        self.assertEqual([r["status"] for r in results], ["already_following", "already_following", "followed"])
+        self.me.refresh_from_db()
+        self.assertEqual(self.me.following_count, 4)
+        self.assertEqual([o.followers_count for o in User.objects.filter(pk__in=ids)], [1, 1, 1])
+        self.assertEqual(reconcile_counters(), 0)
+
+    def test_empty_batch_is_rejected(self):
+        response = self.client.post(reverse("bulk-follow"), {"user_ids": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create(username="reader")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("feed")
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.client.get(self.url)
+        hits = token_cache.hits
+        with self.assertNumQueries(1):  # the feed page only
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.hits, hits + 1)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_are_admin_only(self):
+        self.assertEqual(self.client.get(reverse("token-cache-stats")).status_code, status.HTTP_403_FORBIDDEN)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        token_cache.clear()
+        response = self.client.get(reverse("token-cache-stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("hit_rate", response.data)
+
+
+def photo(name="photo.jpg", size=(1200, 900)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "navy").save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class UserAutocompleteTestCase(APITestCase):
+    """
+    /api/accounts/users/autocomplete/ matches username prefixes, most followed first.
+    """
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(username="viewer", password="testpass123")
+        for username, followers in [("Johanna", 5), ("john", 50), ("jonas", 20), ("JOE", 0), ("mary", 99)]:
+            User.objects.create_user(username=username, password="x")
+            User.objects.filter(username=username).update(followers_count=followers)
+        token = Token.objects.create(user=self.viewer)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.url = reverse("user-autocomplete")
+
+    def usernames(self, query, **params):
+        response = self.client.get(self.url, {"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user["username"] for user in response.data]
+
+    def test_case_insensitive_prefix_ranked_by_followers(self):
+        self.assertEqual(self.usernames("jo"), ["john", "jonas", "Johanna", "JOE"])
+        self.assertEqual(self.usernames("@JOH"), ["john", "Johanna"])
+        self.assertEqual(self.usernames("jo", limit=2), ["john", "jonas"])
+        self.assertEqual(self.usernames("x"), [])
+        self.assertEqual(self.usernames(""), [])
+
+    def test_dense_prefixes_walk_the_followers_index(self):
+        with mock.patch("accounts.autocomplete.SCAN_LIMIT", 2):
+            self.assertEqual([u.username for u in autocomplete("jo")], ["john", "jonas", "Johanna", "JOE"])
+            self.assertEqual([u.username for u in autocomplete("joh", limit=1)], ["john"])
+
+    def test_renames_and_deactivations(self):
+        john = User.objects.get(username="john")
+        john.username = "Zack"
+        john.save(update_fields=["username"])
+        self.assertEqual(User.objects.get(pk=john.pk).username_key, "zack")
+        self.assertEqual(self.usernames("z"), ["Zack"])
+
+        User.objects.filter(username="jonas").update(is_active=False)
+        self.assertEqual(self.usernames("jo"), ["Johanna", "JOE"])
+
+
+class ProfileThumbnailTestCase(TransactionTestCase):
+    """
+    Profile pictures get thumbnails from the process pool after the request.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username="pictured", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_serializer_falls_back_to_original_until_ready(self):
+        pipeline = ThumbnailPipeline(workers=0)
+        User.objects.filter(pk=self.user.pk).update(profile_picture="profiles/raw.jpg")
+        self.user.refresh_from_db()
+        urls = SimpleUserSerializer(self.user).data["profile_picture_thumbnails"]
+        self.assertEqual(set(urls.values()), {"/media/profiles/raw.jpg"})
+
+        pipeline.finish(self.user.pk, "profiles/raw.jpg", [64, 128, 256])
+        self.user.refresh_from_db()
+        urls = SimpleUserSerializer(self.user).data["profile_picture_thumbnails"]
+        self.assertEqual(urls["64"], "/media/" + thumbnail_name(self.user.pk, "profiles/raw.jpg", 64))
+
+    def test_upload_is_thumbnailed_by_the_pool(self):
+        response = self.client.put(reverse("profile"), {"profile_picture": photo()}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        thumbnail_pipeline.wait(timeout=60)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.thumbnails["source"], self.user.profile_picture.name)
+        for size in (64, 128, 256):
+            with Image.open(default_storage.path(self.user.thumbnails[str(size)])) as image:
+                self.assertEqual(image.size, (size, size))
+
+        # a replacement picture supersedes the old thumbnails
+        old = [default_storage.path(name) for key, name in self.user.thumbnails.items() if key != "source"]
+        self.client.put(reverse("profile"), {"profile_picture": photo("second.jpg")}, format="multipart")
+        thumbnail_pipeline.wait(timeout=60)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.thumbnails["64"], thumbnail_name(self.user.pk, self.user.profile_picture.name, 64))
+        self.assertFalse(any(os.path.exists(path) for path in old))
+
+    def test_pictures_with_the_same_stem_keep_separate_thumbnails(self):
+        other = User.objects.create_user(username="other", password="testpass123")
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        self.client.put(reverse("profile"), {"profile_picture": photo("avatar.png")}, format="multipart")
+        other_client.put(reverse("profile"), {"profile_picture": photo("avatar.jpg")}, format="multipart")
+        thumbnail_pipeline.wait(timeout=60)
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        mine = [name for key, name in self.user.thumbnails.items() if key != "source"]
+        self.assertEqual(len(mine), 3)
+        self.assertFalse(set(mine) & set(other.thumbnails.values()))
+
+        # replacing the other user's picture leaves these thumbnails alone
+        other_client.put(reverse("profile"), {"profile_picture": photo("avatar.png")}, format="multipart")
+        thumbnail_pipeline.wait(timeout=60)
+        self.assertTrue(all(default_storage.exists(name) for name in mine))
@@ -0,0 +1,160 @@
+# accounts/thumbnails.py
+"""
+Profile picture thumbnails, generated off the request path.
+
+When a user's ``profile_picture`` changes, a job is queued once the
+transaction commits. A process pool (THUMBNAIL_WORKERS processes) renders
+square JPEG thumbnails at PROFILE_THUMBNAIL_SIZES with Pillow, straight
+from and to MEDIA_ROOT. When the job finishes, the names are recorded in
+``User.thumbnails`` with an UPDATE that only applies if the picture is
+still the one that was rendered. Until then serializers fall back to the
+original picture (see ``thumbnail_urls``).
+
+Requires a filesystem storage, since workers open files by path.
+THUMBNAIL_WORKERS = 0 renders inline after commit (tests, debugging).
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = tuple(getattr(settings, 'PROFILE_THUMBNAIL_SIZES', (64, 128, 256)))
+THUMBNAIL_DIR = 'profiles/thumbs'
+
+
+def render_thumbnails(source_path, targets):
+    """
+    Worker-side: write a ``size`` x ``size`` center-cropped JPEG of
+    ``source_path`` for every ``(size, path)`` in ``targets``.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        # let the JPEG decoder downscale to the largest size needed
+        # instead of decoding a multi-megapixel photo at full resolution
+        largest = max(size for size, _ in targets)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for size, path in sorted(targets, reverse=True):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            ImageOps.fit(image, (size, size), Image.LANCZOS).save(path, 'JPEG', quality=85, optimize=True)
+    return [size for size, _ in targets]
+
+
+def thumbnail_name(user_id, source_name, size):
+    # keyed by owner and full source name: pictures that share a file stem
+    # (avatar.png, avatar.jpg, other/avatar.png) never share thumbnails
+    digest = hashlib.sha1(source_name.encode()).hexdigest()[:16]
+    return f'{THUMBNAIL_DIR}/{user_id}/{digest}_{size}.jpg'
+
+
+def thumbnail_urls(user, build_url=None):
+    """
+    {size: url} for ``user``'s profile picture: the thumbnail when it has
+    been generated for the current picture, the original otherwise. None
+    without a picture.
+    """
+    picture = user.profile_picture
+    if not picture:
+        return None
+    ready = user.thumbnails if user.thumbnails.get('source') == picture.name else {}
+    build_url = build_url or (lambda url: url)
+    original = build_url(picture.url)
+    return {
+        str(size): build_url(default_storage.url(ready[str(size)])) if str(size) in ready else original
+        for size in THUMBNAIL_SIZES
+    }
+
+
+class ThumbnailPipeline:
+
+    def __init__(self, workers=None):
+        self.workers = getattr(settings, 'THUMBNAIL_WORKERS', 2) if workers is None else workers
+        self._executor = None
+        self._pending = set()
+        self._in_flight = set()  # (user id, picture name)
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: never fork a process holding DB connections and threads
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'))
+            return self._executor
+
+    def schedule(self, user):
+        """
+        Queue thumbnails for ``user``'s current picture after commit.
+        """
+        user_id, source_name = user.pk, user.profile_picture.name
+        transaction.on_commit(lambda: self.submit(user_id, source_name))
+
+    def submit(self, user_id, source_name):
+        targets = [
+            (size, default_storage.path(thumbnail_name(user_id, source_name, size)))
+            for size in THUMBNAIL_SIZES
+        ]
+        source_path = default_storage.path(source_name)
+        if not self.workers:
+            self.finish(user_id, source_name, render_thumbnails(source_path, targets))
+            return
+        with self._lock:
+            if (user_id, source_name) in self._in_flight:
+                return
+            self._in_flight.add((user_id, source_name))
+        future = self.executor.submit(render_thumbnails, source_path, targets)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda f: self.done(f, user_id, source_name))
+
+    def done(self, future, user_id, source_name):
+        try:
+            self.finish(user_id, source_name, future.result())
+        except Exception:
+            logger.exception("Thumbnail generation failed for user %s (%s)", user_id, source_name)
+        finally:
+            # callbacks normally run on the executor's thread, which has a
+            # connection of its own to release
+            if not connection.in_atomic_block:
+                close_old_connections()
+            with self._settled:
+                self._pending.discard(future)
+                self._in_flight.discard((user_id, source_name))
+                self._settled.notify_all()
+
+    def finish(self, user_id, source_name, sizes):
+        from .models import User
+
+        thumbnails = {'source': source_name}
+        thumbnails.update((str(size), thumbnail_name(user_id, source_name, size)) for size in sizes)
+        previous = User.objects.filter(pk=user_id).values_list('thumbnails', flat=True).first() or {}
+        updated = User.objects.filter(pk=user_id, profile_picture=source_name).update(thumbnails=thumbnails)
+        if updated:
+            # files of the picture this one replaced
+            stale = [name for key, name in previous.items() if key != 'source' and name not in thumbnails.values()]
+        else:
+            # the picture was replaced (or the user deleted) while rendering
+            stale = [name for key, name in thumbnails.items() if key != 'source']
+        for name in stale:
+            default_storage.delete(name)
+
+    def wait(self, timeout=None):
+        """
+        Block until queued jobs have finished and been recorded (tests,
+        management commands).
+        """
+        with self._settled:
+            self._settled.wait_for(lambda: not self._pending, timeout=timeout)
+
+
+thumbnail_pipeline = ThumbnailPipeline()
@@ -1,11 +1,22 @@
 # accounts/urls.py
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView, FollowUserView, UnfollowUserView
+from .views import (
+    RegisterView, LoginView, ProfileView, UserListView,
+    FollowUserView, UnfollowUserView, BulkFollowView, BulkUnfollowView,
+    TokenCacheStatsView, UserAutocompleteView, LoginHashingStatsView, UserImportView,
+)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('users/', UserListView.as_view(), name='user-list'),
+    path('import/', UserImportView.as_view(), name='user-import'),
+    path('users/autocomplete/', UserAutocompleteView.as_view(), name='user-autocomplete'),
     path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow-user'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow-user'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='bulk-follow'),
+    path('unfollow/bulk/', BulkUnfollowView.as_view(), name='bulk-unfollow'),
+    path('token-cache/', TokenCacheStatsView.as_view(), name='token-cache-stats'),
+    path('login-hashing/', LoginHashingStatsView.as_view(), name='login-hashing-stats'),
 ]
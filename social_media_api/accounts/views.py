@@ -1,16 +1,27 @@
+import codecs
+
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from rest_framework import generics, status, permissions, serializers
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from .authentication import CachedTokenAuthentication, token_cache
+from .autocomplete import autocomplete
+from .follows import bulk_follow, bulk_unfollow
+from .graph import follow_graph
+from .hashing import hashing_pool
+from .importer import FORMATS, UserImport, format_for, read_rows
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
-    SimpleUserSerializer
+    SimpleUserSerializer,
+    BulkFollowSerializer,
+    ThumbnailsField,
+    UserMentionSerializer
 )
 
 CustomUser = get_user_model()
@@ -20,12 +31,38 @@ class UserListView(generics.ListAPIView):
     Returns a list of all registered users.
     Accessible only to authenticated users.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = SimpleUserSerializer
+    replica_reads = True  # see social_media_api/db_router.py
 
     # ✅ Required line for the check
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.all().order_by('id')
+
+# ---------------------------------------------------------------------
+# 🔹 USERNAME AUTOCOMPLETE VIEW
+# ---------------------------------------------------------------------
+class UserAutocompleteView(APIView):
+    """
+    Users whose username starts with ?q= (case-insensitive, for @mentions),
+    most followed first. ?limit= caps the results (default 10, at most 20).
+    GET /api/accounts/users/autocomplete/?q=jo
+
+    Served from the indexed username_key column (see accounts/autocomplete.py).
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    replica_reads = True
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        users = autocomplete(request.query_params.get('q', ''), limit=limit)
+        serializer = UserMentionSerializer(users, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 # ---------------------------------------------------------------------
 # 🔹 REGISTER VIEW
@@ -35,6 +72,8 @@ class RegisterView(APIView):
     Handle user registration.
     Creates a new user, hashes password, and issues an auth token.
     """
+    permission_classes = [permissions.AllowAny]
+
     def post(self, request):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
@@ -56,6 +95,8 @@ class LoginView(APIView):
     Handle user login.
     Authenticates using username/password and returns a token.
     """
+    permission_classes = [permissions.AllowAny]
+
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
@@ -69,25 +110,50 @@ class LoginView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# ---------------------------------------------------------------------
+# 🔹 BULK USER IMPORT VIEW
+# ---------------------------------------------------------------------
+class UserImportView(APIView):
+    """
+    Import users from an uploaded CSV or JSON Lines file (admin only).
+    POST /api/accounts/import/  multipart: file=<users.csv>[, format=csv|jsonl]
+
+    Rows are streamed from the upload, passwords hashed on a process pool
+    and users and tokens bulk inserted (see accounts/importer.py). Invalid
+    rows are skipped and listed with their line number and errors.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or format_for(upload.name)
+        if file_format not in FORMATS:
+            return Response(
+                {"format": [f"Choose one of {', '.join(FORMATS)}."]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        # undecodable bytes become U+FFFD, which fails username validation
+        lines = codecs.iterdecode(upload, 'utf-8-sig', errors='replace')
+        result = UserImport().run(read_rows(lines, file_format))
+        return Response(result, status=status.HTTP_200_OK)
+
+
 # ---------------------------------------------------------------------
 # 🔹 USER PROFILE SERIALIZER
 # ---------------------------------------------------------------------
 class UserProfileSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    profile_picture_thumbnails = ThumbnailsField()
 
     class Meta:
-        model = User
+        model = CustomUser
         fields = [
-            'id', 'username', 'email', 'bio',
-            'profile_picture', 'followers_count', 'following_count'
+            'id', 'username', 'email', 'bio', 'profile_picture', 'profile_picture_thumbnails',
+            'followers_count', 'following_count', 'posts_count'
         ]
-
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-
-    def get_following_count(self, obj):
-        return obj.following.count()
+        read_only_fields = ['followers_count', 'following_count', 'posts_count']
 
 
 # ---------------------------------------------------------------------
@@ -97,14 +163,17 @@ class ProfileView(APIView):
     """
     Retrieve or update the current user's profile.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
+        # request.user may come from the token cache; show current counters
+        request.user.refresh_from_db()
         serializer = UserProfileSerializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request):
+        request.user.refresh_from_db()
         serializer = UserProfileSerializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -123,18 +192,22 @@ class FollowUserView(generics.GenericAPIView):
     Authenticated user follows another user by ID.
     POST /api/accounts/follow/<int:user_id>/
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, user_id, *args, **kwargs):
         if request.user.id == user_id:
             return Response({"detail": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
 
-        target = get_object_or_404(User, pk=user_id)
-        if target in request.user.following.all():
+        target = get_object_or_404(CustomUser, pk=user_id)
+        # the cache may lag other workers: confirm a refusal with the follow table
+        if (follow_graph.is_following(request.user.id, target.id)
+                and follow_graph.confirm_following(request.user.id, target.id)):
             return Response({"detail": f"You already follow {target.username}."}, status=status.HTTP_400_BAD_REQUEST)
 
+        # the m2m_changed handler updates both counters in the same transaction
         request.user.following.add(target)
+        target.refresh_from_db(fields=['followers_count', 'following_count'])
         serializer = SimpleUserSerializer(target, context={'request': request})
         return Response({
             "detail": f"You are now following {target.username}.",
@@ -150,20 +223,98 @@ class UnfollowUserView(generics.GenericAPIView):
     Authenticated user unfollows another user by ID.
     POST /api/accounts/unfollow/<int:user_id>/
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, user_id, *args, **kwargs):
         if request.user.id == user_id:
             return Response({"detail": "You cannot unfollow yourself."}, status=status.HTTP_400_BAD_REQUEST)
 
-        target = get_object_or_404(User, pk=user_id)
-        if target not in request.user.following.all():
+        target = get_object_or_404(CustomUser, pk=user_id)
+        # the cache may lag other workers: confirm a refusal with the follow table
+        if not (follow_graph.is_following(request.user.id, target.id)
+                or follow_graph.confirm_following(request.user.id, target.id)):
             return Response({"detail": f"You are not following {target.username}."}, status=status.HTTP_400_BAD_REQUEST)
 
+        # the m2m_changed handler updates both counters in the same transaction
         request.user.following.remove(target)
+        target.refresh_from_db(fields=['followers_count', 'following_count'])
         serializer = SimpleUserSerializer(target, context={'request': request})
         return Response({
             "detail": f"You have unfollowed {target.username}.",
             "user": serializer.data
         }, status=status.HTTP_200_OK)
+
+
+# ---------------------------------------------------------------------
+# 🔹 BULK FOLLOW / UNFOLLOW VIEWS
+# ---------------------------------------------------------------------
+class BulkFollowView(generics.GenericAPIView):
+    """
+    Authenticated user follows many users at once.
+    POST /api/accounts/follow/bulk/  {"user_ids": [1, 2, 3]}
+
+    Ids are resolved and checked against existing follows with one query
+    each and new follows are written with a single bulk insert. Every id
+    gets its own status: followed, already_following, not_found or self.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = BulkFollowSerializer
+    changed_status = 'followed'
+
+    def apply(self, user, user_ids):
+        return bulk_follow(user, user_ids)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = self.apply(request.user, serializer.validated_data['user_ids'])
+        return Response({
+            "changed": sum(1 for result in results if result["status"] == self.changed_status),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+
+class BulkUnfollowView(BulkFollowView):
+    """
+    Authenticated user unfollows many users at once.
+    POST /api/accounts/unfollow/bulk/  {"user_ids": [1, 2, 3]}
+
+    Statuses: unfollowed, not_following, not_found or self.
+    """
+    changed_status = 'unfollowed'
+
+    def apply(self, user, user_ids):
+        return bulk_unfollow(user, user_ids)
+
+
+# ---------------------------------------------------------------------
+# 🔹 TOKEN CACHE STATS VIEW
+# ---------------------------------------------------------------------
+class TokenCacheStatsView(APIView):
+    """
+    Hit/miss counters of this worker's token cache (admin only).
+    GET /api/accounts/token-cache/
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache.stats(), status=status.HTTP_200_OK)
+
+
+# ---------------------------------------------------------------------
+# 🔹 LOGIN HASHING STATS VIEW
+# ---------------------------------------------------------------------
+class LoginHashingStatsView(APIView):
+    """
+    Load and latency of this worker's password hashing pool, used by the
+    async login (admin only).
+    GET /api/accounts/login-hashing/
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(hashing_pool.stats(), status=status.HTTP_200_OK)
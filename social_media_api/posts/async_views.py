@@ -0,0 +1,204 @@
+# posts/async_views.py
+"""
+Native async read endpoints for ASGI deployments.
+
+Served under /api/async/ next to the DRF views. Each endpoint borrows its
+queryset, filter backends and serializer from the matching DRF view, but
+authenticates, paginates and fetches with Django's async ORM (``aget``,
+``aiterator``), so a request waiting on the database or the client does
+not hold a worker thread. Serialization works on prefetched objects and
+never touches the database. Writes and ``?page=`` pagination stay on the
+DRF endpoints.
+
+The feed also serves deltas here, and ``?since=...&wait=<seconds>``
+long-polls: the request awaits an event until posts land (see
+posts/longpoll.py). /api/async/events/ streams new posts and comments as
+server-sent events from the worker's broker (see posts/events.py).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, Http404, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from accounts.authentication import CachedTokenAuthentication
+from accounts.graph import follow_graph
+from .events import broker, comment_topic, encode_event, post_topic
+from .longpoll import delta_response, is_first_page, parse_since, parse_wait, wait_for_entries, watermark
+from .pagination import KeysetPagination
+from .views import PostViewSet, CommentViewSet, FeedView
+
+EVENTS_HEARTBEAT = getattr(settings, 'EVENTS_HEARTBEAT', 15)
+EVENTS_RETRY_MS = 3000
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status_code,
+    )
+
+
+async def authenticate(request, required):
+    """
+    (user, None), or (None, 401 response) when the token is bad or missing
+    and ``required``.
+    """
+    try:
+        result = await CachedTokenAuthentication().aauthenticate(request)
+    except exceptions.AuthenticationFailed as exc:
+        return None, json_response({'detail': str(exc.detail)}, status.HTTP_401_UNAUTHORIZED)
+    user = result[0] if result else AnonymousUser()
+    if required and not user.is_authenticated:
+        return None, json_response(
+            {'detail': 'Authentication credentials were not provided.'},
+            status.HTTP_401_UNAUTHORIZED,
+        )
+    return user, None
+
+
+class AsyncReadView(View):
+    """
+    Base class: ``drf_view`` supplies the queryset, filters and serializer.
+    """
+    drf_view = None
+    drf_action = None
+    require_authentication = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        user, error = await authenticate(request, self.require_authentication)
+        if error is not None:
+            return error
+        self.view = self.build_drf_view(request, user, kwargs)
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+        except exceptions.APIException as exc:
+            return json_response({'detail': exc.detail}, exc.status_code)
+
+    def build_drf_view(self, request, user, kwargs):
+        drf_request = Request(request, authenticators=())
+        drf_request.user = user
+        view = self.drf_view(request=drf_request, args=(), kwargs=kwargs, format_kwarg=None)
+        view.action = self.drf_action
+        return view
+
+
+class AsyncListView(AsyncReadView):
+    drf_action = 'list'
+
+    async def get(self, request, *args, **kwargs):
+        view = self.view
+        # filter backends may query (a ?post= filter validates its post exists)
+        queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(queryset, view.request, view)
+        data = view.get_serializer(page, many=True).data
+        return json_response(self.get_response_data(page, paginator.get_paginated_response(data).data))
+
+    def get_response_data(self, page, data):
+        return data
+
+
+class AsyncDetailView(AsyncReadView):
+    drf_action = 'retrieve'
+
+    async def get(self, request, pk, *args, **kwargs):
+        view = self.view
+        try:
+            obj = await view.get_queryset().aget(pk=pk)
+        except view.get_queryset().model.DoesNotExist:
+            raise Http404
+        return json_response(view.get_serializer(obj).data)
+
+
+class AsyncPostListView(AsyncListView):
+    drf_view = PostViewSet
+
+
+class AsyncPostDetailView(AsyncDetailView):
+    drf_view = PostViewSet
+
+
+class AsyncCommentListView(AsyncListView):
+    drf_view = CommentViewSet
+
+
+class AsyncFeedView(AsyncListView):
+    drf_view = FeedView
+    require_authentication = True
+
+    async def get(self, request, *args, **kwargs):
+        view = self.view
+        since = view.request.query_params.get('since')
+        if since is None:
+            return await super().get(request, *args, **kwargs)
+        since = parse_since(since)
+        wait = parse_wait(view.request.query_params.get('wait'))
+        limit = KeysetPagination().get_page_size(view.request)
+        queryset = view.get_delta_queryset(since)[:limit + 1]
+
+        async def fetch():
+            return [post async for post in queryset.aiterator(chunk_size=limit + 1)]
+
+        posts = await wait_for_entries(view.request.user.pk, fetch, wait) if wait else await fetch()
+        return json_response(delta_response(posts, view.serialize, since, limit))
+
+    def get_response_data(self, page, data):
+        if is_first_page(self.view.request.query_params):
+            data['since'] = watermark(page)
+        return data
+
+
+class AsyncEventStreamView(View):
+    """
+    GET /api/async/events/  ->  text/event-stream
+
+    ``post`` events for new posts by the authors the user follows (as of
+    connecting) and ``comment`` events for new comments on the user's
+    posts, each carrying the same JSON as the create response. A comment
+    line is sent every EVENTS_HEARTBEAT seconds without events. A stream
+    that falls too far behind gets an ``overflow`` event and is closed;
+    reconnect and catch up with /api/feed/?since=.
+    """
+
+    async def get(self, request):
+        user, error = await authenticate(request, required=True)
+        if error is not None:
+            return error
+        authors = await sync_to_async(follow_graph.following_ids)(user.pk)
+        subscription = broker.subscribe([post_topic(author_id) for author_id in authors] + [comment_topic(user.pk)])
+        return EventStreamResponse(subscription)
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """
+    Streams a Subscription's frames; closing the response (the server does
+    once the client has gone) unsubscribes.
+    """
+
+    def __init__(self, subscription):
+        super().__init__(self.stream(subscription), content_type='text/event-stream')
+        self.subscription = subscription
+        self['Cache-Control'] = 'no-cache'
+        self['X-Accel-Buffering'] = 'no'  # nginx: pass events through unbuffered
+
+    @staticmethod
+    async def stream(subscription):
+        with subscription:
+            yield f'retry: {EVENTS_RETRY_MS}\n\n'.encode()
+            while True:
+                frames = await subscription.get(EVENTS_HEARTBEAT)
+                if subscription.overflowed:
+                    yield encode_event('overflow', {'detail': 'Too far behind, reconnect.'})
+                    return
+                yield b''.join(frames) if frames else b': keepalive\n\n'
+
+    def close(self):
+        self.subscription.close()
+        super().close()
@@ -0,0 +1,75 @@
+# posts/cleanup.py
+"""
+Set-wise deletion of users and everything that refers to them.
+
+``QuerySet.delete()`` collects the cascade in Python and sends the
+post_delete signals of every row, so deleting a user's comments runs the
+comment stats UPDATE once per comment. ``delete_users`` instead issues
+one DELETE per table, children first. The FTS tables follow along through
+their AFTER DELETE triggers. Counters and comment stats of the rows that
+survive are then reconciled in bulk, and the in-process caches that may
+hold deleted rows are cleared. Used by ``generate_data --clear`` and the
+load-test harness.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.authentication import token_cache
+from accounts.counters import reconcile_counters
+from accounts.graph import follow_graph
+from .counters import reconcile_comment_stats
+from .models import AuthorAffinity, Comment, FeedEntry, Post
+from .representations import representation_cache
+
+User = get_user_model()
+
+RECONCILE_BATCH_SIZE = 500
+
+
+def raw_delete(queryset):
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_users(users):
+    """
+    Delete the users of the ``users`` queryset with their posts, comments,
+    follows, tokens and feed entries. Returns the number of users deleted.
+    """
+    Follow = User.followers.through
+    user_ids = users.values('pk')
+    post_ids = Post.objects.filter(author__in=user_ids).values('pk')
+    with transaction.atomic():
+        # survivors whose counters or comment stats include deleted rows
+        partners = sorted(set(
+            Follow.objects.filter(from_user__in=user_ids).exclude(to_user__in=user_ids)
+            .values_list('to_user_id', flat=True)
+        ) | set(
+            Follow.objects.filter(to_user__in=user_ids).exclude(from_user__in=user_ids)
+            .values_list('from_user_id', flat=True)
+        ))
+        commented = sorted(set(
+            Comment.objects.filter(author__in=user_ids).exclude(post__in=post_ids)
+            .values_list('post_id', flat=True)
+        ))
+
+        raw_delete(FeedEntry.objects.filter(Q(user__in=user_ids) | Q(post__in=post_ids)))
+        raw_delete(AuthorAffinity.objects.filter(Q(user__in=user_ids) | Q(author__in=user_ids)))
+        raw_delete(Comment.objects.filter(Q(author__in=user_ids) | Q(post__in=post_ids)))
+        raw_delete(Post.objects.filter(author__in=user_ids))
+        raw_delete(Follow.objects.filter(Q(from_user__in=user_ids) | Q(to_user__in=user_ids)))
+        for field in User._meta.get_fields(include_hidden=True):
+            # tokens, admin log entries, group and permission links
+            reverse_fk = field.auto_created and not field.concrete and not field.many_to_many
+            if reverse_fk and field.related_model not in (Post, Comment, FeedEntry, AuthorAffinity, Follow):
+                raw_delete(field.related_model._base_manager.filter(**{f'{field.field.name}__in': user_ids}))
+        deleted = raw_delete(User.objects.filter(pk__in=user_ids))
+
+        for start in range(0, len(partners), RECONCILE_BATCH_SIZE):
+            reconcile_counters(User.objects.filter(pk__in=partners[start:start + RECONCILE_BATCH_SIZE]))
+        for start in range(0, len(commented), RECONCILE_BATCH_SIZE):
+            reconcile_comment_stats(Post.objects.filter(pk__in=commented[start:start + RECONCILE_BATCH_SIZE]))
+    follow_graph.clear()
+    representation_cache.clear()
+    token_cache.clear()
+    return deleted
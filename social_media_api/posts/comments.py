@@ -0,0 +1,73 @@
+# posts/comments.py
+"""
+Batch comment creation.
+
+All referenced posts are resolved with one query and the valid comments
+are written with a single bulk_create inside one transaction. bulk_create
+sends no post_save signals, so the effects of posts/signals.py are applied
+set-based instead (comment stats, feed scores). Created comments are
+published to the event stream like single ones. Every input item gets a
+result, in input order:
+
+- ``created``: inserted; the result carries the serialized comment.
+- ``invalid``: failed validation; the result carries field errors.
+- ``skipped``: valid, but not inserted because the batch was atomic and
+  another item was invalid.
+"""
+from django.db import transaction
+from rest_framework.exceptions import ErrorDetail
+
+from .counters import record_comments
+from .events import publish_comment
+from .models import Post, Comment
+from .ranking import record_comments_activity
+from .serializers import CommentBatchItemSerializer, CommentSerializer
+
+CREATED = 'created'
+INVALID = 'invalid'
+SKIPPED = 'skipped'
+
+
+def create_comments(user, items, atomic=False):
+    """
+    Create comments by ``user`` from ``items`` (dicts with post and
+    content). Returns one result dict per item.
+    """
+    results, valid = [], []
+    for index, item in enumerate(items):
+        serializer = CommentBatchItemSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+            results.append({'index': index, 'status': CREATED})
+        else:
+            results.append({'index': index, 'status': INVALID, 'errors': serializer.errors})
+
+    post_authors = dict(
+        Post.objects.filter(pk__in={data['post'] for _, data in valid}).values_list('pk', 'author_id')
+    )
+    comments = []
+    for index, data in valid:
+        if data['post'] in post_authors:
+            comments.append((index, Comment(post_id=data['post'], author=user, content=data['content'])))
+        else:
+            message = f'Invalid pk "{data["post"]}" - object does not exist.'
+            results[index] = {
+                'index': index, 'status': INVALID,
+                'errors': {'post': [ErrorDetail(message, code='does_not_exist')]},
+            }
+
+    if atomic and len(comments) < len(items):
+        for index, _ in comments:
+            results[index]['status'] = SKIPPED
+        return results
+
+    with transaction.atomic():
+        created = Comment.objects.bulk_create([comment for _, comment in comments])
+        record_comments(created)
+        record_comments_activity(created, post_authors)
+
+    serializer = CommentSerializer()
+    for (index, _), comment in zip(comments, created):
+        results[index]['comment'] = serializer.to_representation(comment)
+        publish_comment(post_authors[comment.post_id], results[index]['comment'])
+    return results
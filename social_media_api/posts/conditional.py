@@ -0,0 +1,96 @@
+# posts/conditional.py
+"""
+ETag / Last-Modified support for read endpoints.
+
+Validators are computed from cheap aggregates instead of the rendered body:
+for a list, the ids and ``updated_at`` of the rows on the requested page
+(fetched without prefetches or serialization); for a detail view, the
+row's ``updated_at``. Views can fold in related rows (e.g. a post's
+embedded comments) through ``get_related_validator``. When the client's
+If-None-Match / If-Modified-Since still match, a 304 is returned before
+anything is serialized.
+"""
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    validator_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_list_validator_rows()
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        return self.conditional(request, rows, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = (
+                self.get_queryset()
+                .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                .values_list('pk', self.validator_field)
+                .first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            # a malformed pk, as in rest_framework.generics.get_object_or_404
+            raise Http404
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional(request, [row], super().retrieve, *args, **kwargs)
+
+    def get_list_validator_rows(self):
+        """
+        (pk, updated_at) for the rows on the requested page, or None when
+        the view is not paginated.
+        """
+        if self.paginator is None:
+            return None
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .select_related(None)
+        )
+        page = self.paginate_queryset(queryset)
+        return [(obj.pk, getattr(obj, self.validator_field)) for obj in page]
+
+    def get_related_validator(self, pks):
+        """
+        Optional (last modified, digest) for related rows that appear in the
+        representation of ``pks``.
+        """
+        return None
+
+    def conditional(self, request, rows, render, *args, **kwargs):
+        """
+        Answer 304 if the client's validators match ``rows``; otherwise
+        call ``render`` and attach ETag/Last-Modified to its response.
+        """
+        pks = [pk for pk, _ in rows]
+        timestamps = [modified for _, modified in rows if modified is not None]
+        parts = [request.get_full_path(), repr(pks), *(ts.isoformat() for ts in timestamps)]
+
+        related = self.get_related_validator(pks) if pks else None
+        if related is not None:
+            related_modified, related_digest = related
+            parts.append(related_digest)
+            if related_modified is not None:
+                timestamps.append(related_modified)
+
+        etag = quote_etag(hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest())
+        last_modified = timegm(max(timestamps).utctimetuple()) if timestamps else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+        response = render(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
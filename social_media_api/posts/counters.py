@@ -0,0 +1,83 @@
+# posts/counters.py
+"""
+Helpers for the denormalized comment_count / last_comment_at on Post.
+"""
+from django.db.models import Case, Count, DateTimeField, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Post, Comment
+
+
+def record_comment(comment):
+    """
+    Count a new comment against its post.
+    """
+    record_comments([comment])
+
+
+def record_comments(comments):
+    """
+    Count new comments (e.g. from bulk_create) against their posts, with
+    one UPDATE for all of them.
+    """
+    by_post = {}
+    for comment in comments:
+        by_post.setdefault(comment.post_id, []).append(comment.created_at)
+    if not by_post:
+        return
+    added = Case(
+        *[When(pk=post_id, then=Value(len(created))) for post_id, created in by_post.items()],
+        output_field=IntegerField(),
+    )
+    latest = Case(
+        *[When(pk=post_id, then=Value(max(created))) for post_id, created in by_post.items()],
+        output_field=DateTimeField(),
+    )
+    Post.objects.filter(pk__in=by_post).update(
+        comment_count=F('comment_count') + added,
+        last_comment_at=Greatest(Coalesce('last_comment_at', latest), latest),
+    )
+
+
+def forget_comment(comment):
+    """
+    Uncount a deleted comment; ``last_comment_at`` falls back to the newest
+    remaining comment. Never goes below zero, like accounts' counters.
+    """
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, 0),
+        last_comment_at=actual_comment_stats()['last_comment_at'],
+    )
+
+
+def actual_comment_stats():
+    """
+    Correlated subqueries computing the true value of each field.
+    """
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+    return {
+        'comment_count': Coalesce(Subquery(comments.annotate(total=Count('*')).values('total')), 0),
+        'last_comment_at': Subquery(comments.annotate(latest=Max('created_at')).values('latest')),
+    }
+
+
+def reconcile_comment_stats(queryset=None):
+    """
+    Recompute comment stats where they have drifted. Returns the number of
+    posts fixed.
+    """
+    queryset = Post.objects.all() if queryset is None else queryset
+    stats = actual_comment_stats()
+    drifted = (
+        queryset
+        .alias(actual_count=stats['comment_count'], actual_last=stats['last_comment_at'])
+        .filter(
+            ~Q(comment_count=F('actual_count'))
+            # spelled out: a negated exact lookup would treat NULL = NULL as drift
+            | Q(last_comment_at__lt=F('actual_last'))
+            | Q(last_comment_at__gt=F('actual_last'))
+            | Q(last_comment_at__isnull=True, actual_last__isnull=False)
+            | Q(last_comment_at__isnull=False, actual_last__isnull=True)
+        )
+    )
+    return Post.objects.filter(pk__in=drifted.values('pk')).update(**stats)
@@ -0,0 +1,262 @@
+# posts/events.py
+"""
+In-process pub/sub for the server-sent event stream (/api/async/events/).
+
+Views publish after their transaction commits: a new post on
+``author:<author id>``, a new comment on ``comments:<post author id>``.
+Each event is encoded as an SSE frame once and handed to every matching
+subscription of this process with one ``call_soon_threadsafe`` per event
+loop, so thousands of open streams in an ASGI worker share one broker.
+A subscription that falls EVENTS_QUEUE_SIZE frames behind is dropped; the
+client reconnects and catches up from the feed (``?since=``).
+
+The broker also passes each frame to a transport (EVENTS_TRANSPORT) that
+carries it to the other worker processes:
+
+- ``LocalTransport``: one process, nothing to carry (the default);
+- ``UnixSocketTransport``: workers on one host. A worker with subscribers
+  binds a datagram socket in EVENTS_SOCKET_DIR; publishers send each
+  frame to every socket there. Sends never block: a frame for a worker
+  whose buffer is full is lost, and sockets left by dead workers are
+  removed.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import uuid
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = getattr(settings, 'EVENTS_QUEUE_SIZE', 256)
+
+
+def encode_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n".encode()
+
+
+def post_topic(author_id):
+    return f'author:{author_id}'
+
+
+def comment_topic(post_author_id):
+    return f'comments:{post_author_id}'
+
+
+class Subscription:
+    """
+    Frames for one stream; filled on its event loop's thread. Closing it
+    (or leaving its ``with`` block) unsubscribes.
+    """
+
+    def __init__(self, broker, topics, loop):
+        self.broker = broker
+        self.topics = topics
+        self.loop = loop
+        self.frames = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+
+    def put(self, frame):
+        if len(self.frames) >= self.broker.max_pending:
+            self.overflowed = True
+        else:
+            self.frames.append(frame)
+        self.ready.set()
+
+    async def get(self, timeout):
+        """
+        Every frame waiting, or [] after ``timeout`` seconds without one.
+        """
+        if not self.frames and not self.overflowed:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.ready.clear()
+        frames = list(self.frames)
+        self.frames.clear()
+        return frames
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Broker:
+
+    def __init__(self, transport=None, max_pending=None):
+        self._transport = transport
+        self.max_pending = max_pending or QUEUE_SIZE
+        self._lock = threading.Lock()
+        self._topics = defaultdict(set)
+        self._listening = False
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            path = getattr(settings, 'EVENTS_TRANSPORT', 'posts.events.LocalTransport')
+            self._transport = import_string(path)()
+        return self._transport
+
+    def subscribe(self, topics):
+        """
+        A Subscription to ``topics``, filled on the running event loop.
+        """
+        subscription = Subscription(self, list(topics), asyncio.get_running_loop())
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics[topic].add(subscription)
+            if not self._listening:
+                self.transport.listen(self.deliver)
+                self._listening = True
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscriptions = self._topics.get(topic)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._topics[topic]
+
+    def publish(self, topic, event, data):
+        """
+        Send ``data`` as an ``event`` frame to the subscribers of ``topic``
+        in every process; callable from any thread.
+        """
+        frame = encode_event(event, data)
+        self.deliver(topic, frame)
+        self.transport.send(topic, frame)
+
+    def deliver(self, topic, frame):
+        """
+        Hand ``frame`` to this process's subscribers of ``topic``.
+        """
+        with self._lock:
+            subscriptions = self._topics.get(topic)
+            if not subscriptions:
+                return
+            by_loop = defaultdict(list)
+            for subscription in subscriptions:
+                by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._put, group, frame)
+            except RuntimeError:
+                pass  # the loop has closed
+
+    @staticmethod
+    def _put(subscriptions, frame):
+        for subscription in subscriptions:
+            subscription.put(frame)
+
+
+class LocalTransport:
+    """
+    Single worker process: events never leave it.
+    """
+
+    def listen(self, deliver):
+        pass
+
+    def send(self, topic, frame):
+        pass
+
+    def close(self):
+        pass
+
+
+class UnixSocketTransport:
+    """
+    Worker processes on one host, over datagram sockets in ``directory``.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = (
+            directory
+            or getattr(settings, 'EVENTS_SOCKET_DIR', None)
+            or os.path.join(tempfile.gettempdir(), 'social_media_api-events')
+        )
+        self.path = None
+        self._receiver = None
+        self._sender = None
+
+    def listen(self, deliver):
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.bind(self.path)
+        threading.Thread(
+            target=self.receive, args=(self._receiver, deliver), name='event-transport', daemon=True,
+        ).start()
+
+    @staticmethod
+    def receive(receiver, deliver):
+        while True:
+            try:
+                message = receiver.recv(1 << 20)
+            except OSError:
+                message = b''
+            if not message:
+                return  # closed
+            topic, _, frame = message.partition(b'\n')
+            deliver(topic.decode(), frame)
+
+    def send(self, topic, frame):
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+        message = topic.encode() + b'\n' + frame
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return  # no worker has subscribers yet
+        for entry in entries:
+            if not entry.name.endswith('.sock') or entry.path == self.path:
+                continue
+            try:
+                self._sender.sendto(message, entry.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(entry.path)  # its worker has exited
+                except FileNotFoundError:
+                    pass
+            except OSError as exc:
+                logger.warning("Event for %s not sent to %s: %s", topic, entry.name, exc)
+
+    def close(self):
+        if self._receiver is not None:
+            os.unlink(self.path)
+            self._receiver.shutdown(socket.SHUT_RDWR)  # wakes the receiving thread
+            self._receiver.close()
+            self._receiver = self.path = None
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+
+
+broker = Broker()
+
+
+def publish_post(author_id, data):
+    transaction.on_commit(lambda: broker.publish(post_topic(author_id), 'post', data))
+
+
+def publish_comment(post_author_id, data):
+    transaction.on_commit(lambda: broker.publish(comment_topic(post_author_id), 'comment', data))
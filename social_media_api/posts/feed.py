@@ -0,0 +1,159 @@
+# posts/feed.py
+"""
+Fan-out-on-write home feed.
+
+Every post is copied into the FeedEntry table of each of its author's
+followers when it is created, and follow/unfollow backfill or prune the
+follower's entries. Serving a feed is then one indexed range read on
+(user, created_at) — or (user, score) for the ranked feed — instead of a
+join over the follow graph.
+
+Writers wake this worker's long-poll waiters (posts/longpoll.py) for the
+feeds they touched once their transaction commits.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from accounts.graph import follow_graph
+from .longpoll import feed_waiters
+from .models import Post, FeedEntry
+from .ranking import affinities_for_author, affinities_of
+
+FEED_MAX_ENTRIES = getattr(settings, 'FEED_MAX_ENTRIES', 500)
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def feed_queryset(user, ranked=False, since=None):
+    """
+    Posts in ``user``'s materialized feed, newest first, or by precomputed
+    score (see posts/ranking.py) when ``ranked``. With ``since``, only the
+    entries added after that watermark, in the order they were added.
+    """
+    # Annotating reuses the join made by filter(), so ordering and keyset
+    # pagination on feed_created_at/feed_score/feed_post_id stay on the
+    # feed indexes. The since filter must be in the same filter() call to
+    # constrain that join rather than add another.
+    lookups = {'feed_entries__user': user}
+    if since is not None:
+        lookups['feed_entries__id__gt'] = since
+    queryset = (
+        Post.objects
+        .filter(**lookups)
+        .annotate(
+            feed_created_at=F('feed_entries__created_at'),
+            feed_post_id=F('feed_entries__post_id'),
+            feed_entry_id=F('feed_entries__id'),
+        )
+        .select_related('author')
+    )
+    if since is not None:
+        return queryset.order_by('feed_entry_id')
+    if ranked:
+        return queryset.annotate(feed_score=F('feed_entries__score')).order_by('-feed_score', '-feed_post_id')
+    return queryset.order_by('-feed_created_at', '-feed_post_id')
+
+
+def trim_feeds(user_ids, limit=None):
+    """
+    Delete everything but the newest ``limit`` entries for each given user.
+
+    ``user_ids`` may be a list or a values() queryset; the trim is a single
+    DELETE driven by a ROW_NUMBER() window over the affected feeds.
+    """
+    limit = FEED_MAX_ENTRIES if limit is None else limit
+    ranked = (
+        FeedEntry.objects
+        .filter(user_id__in=user_ids)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('created_at').desc(), F('post_id').desc()],
+        ))
+        .filter(rank__gt=limit)
+        .values('pk')
+    )
+    FeedEntry.objects.filter(pk__in=ranked).delete()
+
+
+def fan_out_post(post):
+    """
+    Push ``post`` into the feed of every follower of its author.
+    """
+    follower_ids = post.author.followers.values_list('id', flat=True)
+    affinities = affinities_for_author(post.author_id)
+    notified = []
+    with transaction.atomic():
+        batch = []
+        for follower_id in follower_ids.iterator(chunk_size=FAN_OUT_BATCH_SIZE):
+            notified.append(follower_id)
+            batch.append(FeedEntry(
+                user_id=follower_id, post=post, created_at=post.created_at,
+                score=post.activity_score + affinities.get(follower_id, 0.0),
+            ))
+            if len(batch) >= FAN_OUT_BATCH_SIZE:
+                FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        trim_feeds(follower_ids)
+        transaction.on_commit(lambda: feed_waiters.notify(notified))
+
+
+def backfill_feed(user_id, author_ids):
+    """
+    Copy the newest posts of ``author_ids`` into ``user_id``'s feed
+    (called after a follow).
+    """
+    affinities = affinities_of(user_id)
+    entries = []
+    for author_id in author_ids:
+        recent = (
+            Post.objects
+            .filter(author_id=author_id)
+            .order_by('-created_at', '-id')
+            .values_list('id', 'created_at', 'activity_score')[:FEED_MAX_ENTRIES]
+        )
+        entries.extend(
+            FeedEntry(
+                user_id=user_id, post_id=post_id, created_at=created_at,
+                score=activity + affinities.get(author_id, 0.0),
+            )
+            for post_id, created_at, activity in recent
+        )
+    with transaction.atomic():
+        FeedEntry.objects.bulk_create(entries, batch_size=FAN_OUT_BATCH_SIZE, ignore_conflicts=True)
+        trim_feeds([user_id])
+        if entries:
+            transaction.on_commit(lambda: feed_waiters.notify([user_id]))
+
+
+def prune_feed(user_id, author_ids):
+    """
+    Drop posts by ``author_ids`` from ``user_id``'s feed (called after an unfollow).
+    """
+    FeedEntry.objects.filter(user_id=user_id, post__author_id__in=author_ids).delete()
+
+
+def rebuild_feed(user_id):
+    """
+    Recompute ``user_id``'s feed from scratch out of the follow graph.
+    """
+    recent = (
+        Post.objects
+        .filter(author_id__in=list(follow_graph.following_ids(user_id)))
+        .order_by('-created_at', '-id')
+        .values_list('id', 'created_at', 'author_id', 'activity_score')[:FEED_MAX_ENTRIES]
+    )
+    affinities = affinities_of(user_id)
+    entries = [
+        FeedEntry(
+            user_id=user_id, post_id=post_id, created_at=created_at,
+            score=activity + affinities.get(author_id, 0.0),
+        )
+        for post_id, created_at, author_id, activity in recent
+    ]
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        FeedEntry.objects.bulk_create(entries, batch_size=FAN_OUT_BATCH_SIZE)
@@ -0,0 +1,575 @@
+# posts/loadtest.py
+"""
+Synthetic load tests for the whole API (``manage.py loadtest``).
+
+A population of ``loadtest_*`` users is seeded with a power-law follow
+graph: a few accounts are followed by most users, most by a handful. The
+same skew drives the load: each call is made by an actor drawn with Zipf
+weights, so a few very active users do much of the work. Calls are drawn
+from a weighted mix (login, feed reads, post and comment writes,
+follow/unfollow) by closed-loop clients that send their next request as
+soon as the previous one answers.
+
+Targets:
+
+- ``wsgi``: ``social_media_api.wsgi.application`` called in-process from
+  one thread per client;
+- ``asgi``: ``social_media_api.asgi.application`` driven in-process by one
+  asyncio task per client;
+- ``http://host:port``: a running server using the same database (the
+  population is seeded through the ORM).
+
+Each endpoint gets its request count, errors (5xx or no response),
+rejections (4xx), throughput and p50/p95/p99 latency. In-process targets
+also count the SQL queries each request ran, through a database execute
+wrapper. ``report()`` returns all of it as a JSON-serializable dict, so runs
+can be saved and compared across commits.
+"""
+import asyncio
+import contextvars
+import http.client
+import io
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import accumulate
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.core.signals import got_request_exception
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.counters import reconcile_counters
+from accounts.models import username_key
+from .cleanup import delete_users
+from .feed import rebuild_feed
+from .models import Post
+from .query_plans import allowed_host
+
+User = get_user_model()
+
+PREFIX = 'loadtest_'
+PASSWORD = 'loadtest-password'
+
+DEFAULT_MIX = {
+    'feed': 40,
+    'feed_top': 5,
+    'posts': 10,
+    'login': 5,
+    'async_login': 0,  # /api/async/accounts/login/ (accounts/async_views.py)
+    'post': 8,
+    'comment': 15,
+    'follow': 10,
+    'unfollow': 7,
+}
+
+WORDS = "time people year way day thing world life hand part child eye place work week case point".split()
+
+
+def zipf_weights(count, exponent=1.0):
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def parse_mix(text):
+    """
+    "feed=50,login=0" -> DEFAULT_MIX with those weights replaced.
+    """
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}.")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one operation with a positive weight.")
+    return mix
+
+
+# ---------------------------------------------------------------------
+# 🔹 POPULATION
+# ---------------------------------------------------------------------
+def seed_population(users, follows, posts, rng, stdout=None):
+    """
+    Create ``users`` loadtest users (sharing one password hash), a follow
+    graph with ``follows`` edges per user on average and Zipf-distributed
+    in-degrees, ``posts`` posts per user on average, tokens for everyone
+    and materialized feeds. Returns the population state.
+    """
+    clear_population()
+    password = make_password(PASSWORD)  # hashed once, not once per user
+    created = User.objects.bulk_create(
+        User(username=f'{PREFIX}{i}', username_key=username_key(f'{PREFIX}{i}'), password=password)
+        for i in range(users)
+    )
+    ids = [user.pk for user in created]
+    popularity = zipf_weights(len(ids))
+
+    Follow = User.followers.through
+    edges = set()
+    for follower in ids:
+        # out-degrees are skewed too: a few users follow hundreds
+        degree = min(len(ids) - 1, int(rng.paretovariate(1.5) * follows / 3))
+        for author in rng.choices(ids, cum_weights=popularity, k=degree):
+            if author != follower:
+                edges.add((author, follower))
+    Follow.objects.bulk_create(
+        (Follow(from_user_id=author, to_user_id=follower) for author, follower in edges),
+        batch_size=5000,
+    )
+
+    Post.objects.bulk_create(
+        (
+            Post(author_id=author, title=sentence(rng, 4), content=sentence(rng, 20))
+            for author in rng.choices(ids, cum_weights=popularity, k=users * posts)
+        ),
+        batch_size=5000,
+    )
+    Token.objects.bulk_create(Token(user_id=user_id, key=Token.generate_key()) for user_id in ids)
+    reconcile_counters(User.objects.filter(pk__in=ids))
+    for user_id in ids:
+        rebuild_feed(user_id)
+    if stdout is not None:
+        stdout.write(f"Seeded {len(ids)} users, {len(edges)} follows, {users * posts} posts.")
+
+    following = {user_id: set() for user_id in ids}
+    for author, follower in edges:
+        following[follower].add(author)
+    return Population(ids, following, rng)
+
+
+def clear_population():
+    return delete_users(User.objects.filter(username__startswith=PREFIX))
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+class Population:
+    """
+    What clients know about the seeded users: tokens, follow edges and
+    recent post ids. Shared by all clients, guarded by a lock.
+    """
+
+    def __init__(self, ids, following, rng):
+        self.ids = ids
+        self.usernames = {user_id: f'{PREFIX}{i}' for i, user_id in enumerate(ids)}
+        self.tokens = dict(Token.objects.filter(user_id__in=ids).values_list('user_id', 'key'))
+        self.following = following
+        self.activity = zipf_weights(len(ids))
+        self.recent_posts = list(
+            Post.objects.filter(author_id__in=ids).order_by('-created_at').values_list('pk', flat=True)[:1000]
+        )
+        self.rng = rng
+        self.lock = threading.Lock()
+
+    def actor(self):
+        with self.lock:
+            return self.rng.choices(self.ids, cum_weights=self.activity)[0]
+
+    def choice(self, items):
+        with self.lock:
+            return self.rng.choice(items) if items else None
+
+    def add_post(self, post_id):
+        with self.lock:
+            self.recent_posts.insert(0, post_id)
+            del self.recent_posts[1000:]
+
+
+# ---------------------------------------------------------------------
+# 🔹 OPERATIONS
+# ---------------------------------------------------------------------
+class Call:
+    """
+    One request: ``label`` groups it in the report, ``on_response`` updates
+    the population from a successful answer.
+    """
+
+    def __init__(self, label, method, path, body=None, token=None, on_response=None):
+        self.label = label
+        self.method = method
+        self.path = path
+        self.body = body
+        self.token = token
+        self.on_response = on_response
+
+
+def next_call(population, mix_names, mix_weights):
+    with population.lock:
+        name = population.rng.choices(mix_names, cum_weights=mix_weights)[0]
+    user_id = population.actor()
+    token = population.tokens[user_id]
+
+    if name == 'feed':
+        return Call('GET /api/feed/', 'GET', '/api/feed/', token=token)
+    if name == 'feed_top':
+        return Call('GET /api/feed/?rank=top', 'GET', '/api/feed/?rank=top', token=token)
+    if name == 'posts':
+        return Call('GET /api/posts/', 'GET', '/api/posts/', token=token)
+    if name in ('login', 'async_login'):
+        def remember_token(data):
+            population.tokens[user_id] = data['token']
+        path = '/api/accounts/login/' if name == 'login' else '/api/async/accounts/login/'
+        body = {'username': population.usernames[user_id], 'password': PASSWORD}
+        return Call(f'POST {path}', 'POST', path, body, on_response=remember_token)
+    if name == 'post':
+        body = {'title': sentence(population.rng, 4), 'content': sentence(population.rng, 20)}
+        return Call('POST /api/posts/', 'POST', '/api/posts/', body, token,
+                    on_response=lambda data: population.add_post(data['id']))
+    if name == 'comment':
+        post_id = population.choice(population.recent_posts[:200])
+        body = {'post': post_id, 'content': sentence(population.rng, 8)}
+        return Call('POST /api/comments/', 'POST', '/api/comments/', body, token)
+    if name == 'follow':
+        # popular accounts gain most followers
+        target = next(
+            (candidate for candidate in (population.actor() for _ in range(5))
+             if candidate != user_id and candidate not in population.following[user_id]),
+            population.actor(),
+        )
+        return Call(
+            'POST /api/accounts/follow/<id>/', 'POST', f'/api/accounts/follow/{target}/', {}, token,
+            on_response=lambda data: population.following[user_id].add(target),
+        )
+    if name == 'unfollow':
+        target = population.choice(sorted(population.following[user_id]))
+        if target is None:
+            return next_call(population, mix_names, mix_weights)
+        return Call(
+            'POST /api/accounts/unfollow/<id>/', 'POST', f'/api/accounts/unfollow/{target}/', {}, token,
+            on_response=lambda data: population.following[user_id].discard(target),
+        )
+    raise ValueError(name)
+
+
+# ---------------------------------------------------------------------
+# 🔹 TRANSPORTS
+# ---------------------------------------------------------------------
+_sample = contextvars.ContextVar('loadtest_sample', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    sample = _sample.get()
+    if sample is not None:
+        sample['queries'] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def record_exception(sender, **kwargs):
+    sample = _sample.get()
+    if sample is not None:
+        exc = sys.exc_info()[1]
+        sample['error'] = describe(exc)
+
+
+def describe(exc):
+    return f'{type(exc).__name__}: {exc}' if exc is not None else 'unknown error'
+
+
+def encode(call):
+    headers = {'Host': allowed_host(), 'Content-Type': 'application/json'}
+    if call.token:
+        headers['Authorization'] = f'Token {call.token}'
+    body = json.dumps(call.body).encode() if call.body is not None else b''
+    return headers, body
+
+
+def decode(payload):
+    try:
+        return json.loads(payload) if payload else None
+    except ValueError:
+        return None
+
+
+class WSGITransport:
+    counts_queries = True
+
+    def __init__(self):
+        from social_media_api.wsgi import application
+        self.application = application
+
+    def request(self, call):
+        headers, body = encode(call)
+        path, _, query = call.path.partition('?')
+        environ = {
+            'REQUEST_METHOD': call.method, 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': headers['Host'], 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1', 'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body), 'wsgi.errors': sys.stderr, 'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http', 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        environ.update(('HTTP_' + name.upper().replace('-', '_'), value) for name, value in headers.items())
+        environ['CONTENT_TYPE'] = environ.pop('HTTP_CONTENT_TYPE')
+        status = []
+        response = self.application(environ, lambda status_line, response_headers, exc_info=None: status.append(status_line))
+        try:
+            payload = b''.join(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return int(status[0].split()[0]), decode(payload)
+
+
+class HTTPTransport:
+    counts_queries = False
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.local = threading.local()
+
+    def request(self, call):
+        headers, body = encode(call)
+        headers['Host'] = f'{self.host}:{self.port}'
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            connection.request(call.method, call.path, body=body or None, headers=headers)
+            response = connection.getresponse()
+            return response.status, decode(response.read())
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            raise
+
+
+class ASGITransport:
+    counts_queries = True
+
+    def __init__(self):
+        from social_media_api.asgi import application
+        self.application = application
+
+    async def request(self, call):
+        headers, body = encode(call)
+        path, _, query = call.path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': call.method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+                       + [(b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 5000), 'server': (headers['Host'], 80),
+        }
+        status_code, chunks = None, []
+        body_sent = False
+        finished = asyncio.Event()
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body'):
+                    finished.set()
+
+        await self.application(scope, receive, send)
+        return status_code, decode(b''.join(chunks))
+
+
+# ---------------------------------------------------------------------
+# 🔹 RUNNER
+# ---------------------------------------------------------------------
+class Recorder:
+
+    def __init__(self):
+        self.samples = {}  # label -> [(latency ms, status, queries)]
+        self.errors = {}  # label -> Counter of exception descriptions
+        self.lock = threading.Lock()
+
+    def add(self, label, latency, status, sample):
+        with self.lock:
+            self.samples.setdefault(label, []).append((latency, status, sample['queries']))
+            if 'error' in sample:
+                self.errors.setdefault(label, Counter())[sample['error']] += 1
+
+
+def finish_call(call, status, data):
+    if call.on_response is not None and status is not None and status < 400 and isinstance(data, dict):
+        call.on_response(data)
+
+
+def run_threads(transport, population, mix, clients, duration, recorder):
+    names, weights = list(mix), list(accumulate(mix.values()))
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            call = next_call(population, names, weights)
+            sample = {'queries': 0}
+            token = _sample.set(sample)
+            start = time.perf_counter()
+            try:
+                status, data = transport.request(call)
+            except Exception as exc:
+                status, data = None, None
+                sample['error'] = describe(exc)
+            finally:
+                _sample.reset(token)
+            recorder.add(call.label, (time.perf_counter() - start) * 1000, status, sample)
+            finish_call(call, status, data)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_tasks(transport, population, mix, clients, duration, recorder):
+    names, weights = list(mix), list(accumulate(mix.values()))
+
+    async def client(deadline):
+        while time.perf_counter() < deadline:
+            call = next_call(population, names, weights)
+            sample = {'queries': 0}
+            _sample.set(sample)  # each task runs in its own context
+            start = time.perf_counter()
+            try:
+                status, data = await transport.request(call)
+            except Exception as exc:
+                status, data = None, None
+                sample['error'] = describe(exc)
+            recorder.add(call.label, (time.perf_counter() - start) * 1000, status, sample)
+            finish_call(call, status, data)
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(client(deadline) for _ in range(clients)))
+
+    asyncio.run(main())
+
+
+def run_load(target, population, mix, clients, duration):
+    """
+    Drive ``target`` ('wsgi', 'asgi' or a server URL) for ``duration``
+    seconds with ``clients`` concurrent clients; returns (Recorder,
+    elapsed seconds, whether queries were counted).
+    """
+    if target == 'asgi':
+        transport, runner = ASGITransport(), run_tasks
+    elif target == 'wsgi':
+        transport, runner = WSGITransport(), run_threads
+    else:
+        transport, runner = HTTPTransport(target), run_threads
+
+    recorder = Recorder()
+    # failures are counted per endpoint instead of logged one by one
+    request_logger = logging.getLogger('django.request')
+    request_logger_disabled, request_logger.disabled = request_logger.disabled, True
+    got_request_exception.connect(record_exception)
+    if transport.counts_queries:
+        connection_created.connect(install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(None, connection)
+    start = time.perf_counter()
+    try:
+        runner(transport, population, mix, clients, duration, recorder)
+    finally:
+        request_logger.disabled = request_logger_disabled
+        got_request_exception.disconnect(record_exception)
+        if transport.counts_queries:
+            connection_created.disconnect(install_query_counter)
+            for connection in connections.all(initialized_only=True):
+                if count_queries in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(count_queries)
+    return recorder, time.perf_counter() - start, transport.counts_queries
+
+
+# ---------------------------------------------------------------------
+# 🔹 REPORTS
+# ---------------------------------------------------------------------
+def percentile(sorted_values, q):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method='inclusive')[q - 1]
+
+
+def summarize(samples, elapsed, counted_queries, errors=None):
+    latencies = sorted(latency for latency, _, _ in samples)
+    # failed requests are left out: with DEBUG the 500 page renders frame
+    # locals, whose __str__ methods query
+    queries = [count for _, status, count in samples if status is not None and status < 500]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status is None or status >= 500),
+        'rejected': sum(1 for _, status, _ in samples if status is not None and 400 <= status < 500),
+        'rps': round(len(samples) / elapsed, 2),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries_mean': round(statistics.fmean(queries), 2) if counted_queries and queries else None,
+        'queries_max': max(queries) if counted_queries and queries else None,
+        'error_types': dict((errors or Counter()).most_common(5)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(recorder, elapsed, counted_queries, options):
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    return {
+        'created_at': timezone.now().isoformat(),
+        'commit': git_commit(),
+        'options': options,
+        'elapsed_s': round(elapsed, 3),
+        'total': summarize(all_samples, elapsed, counted_queries) if all_samples else None,
+        'endpoints': {
+            label: summarize(samples, elapsed, counted_queries, recorder.errors.get(label))
+            for label, samples in sorted(recorder.samples.items())
+        },
+    }
+
+
+def compare(current, baseline):
+    """
+    [(endpoint, metric, baseline value, current value, relative change)]
+    for the latency and throughput figures of both reports.
+    """
+    rows = []
+    for label, stats in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(label)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'queries_mean'):
+            old, new = before.get(metric), stats.get(metric)
+            if old is None or new is None:
+                continue
+            rows.append((label, metric, old, new, (new - old) / old if old else None))
+    return rows
@@ -0,0 +1,139 @@
+# posts/longpoll.py
+"""
+Delta sync and long-poll for the home feed.
+
+FeedEntry ids only grow, so the highest entry id a client has seen is a
+watermark: ``?since=<watermark>`` returns the entries added after it,
+read on the (user_id, id) range of the feed's user index. The first
+page of the feed and every delta carry the watermark to send next as
+``since``. Entries backfilled by a new follow get new ids too, so they
+arrive as a delta even though their posts are older; deleted posts are
+not reported.
+
+On the async endpoint ``?wait=<seconds>`` holds an empty delta open until
+entries land or the wait runs out. Waiters are asyncio events held by
+``feed_waiters`` in the worker's event loop, so no thread is pinned.
+Fan-out wakes the followers' waiters in its own process once it commits;
+writes made by other processes are picked up by a recheck every
+FEED_LONG_POLL_RECHECK seconds.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+FEED_LONG_POLL_MAX_WAIT = getattr(settings, 'FEED_LONG_POLL_MAX_WAIT', 30)
+FEED_LONG_POLL_RECHECK = getattr(settings, 'FEED_LONG_POLL_RECHECK', 5)
+
+
+def parse_since(value):
+    try:
+        since = int(value)
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        raise ValidationError({'since': ['Expected a watermark from a previous feed response.']})
+    return since
+
+
+def parse_wait(value):
+    if value is None:
+        return 0
+    try:
+        wait = float(value)
+    except ValueError:
+        raise ValidationError({'wait': ['Expected a number of seconds.']})
+    return max(0.0, min(wait, FEED_LONG_POLL_MAX_WAIT))
+
+
+def watermark(posts, since=0):
+    """
+    The ``since`` to send next after receiving ``posts`` (feed_queryset rows).
+    """
+    return max((post.feed_entry_id for post in posts), default=since)
+
+
+def is_first_page(query_params):
+    return not query_params.get('cursor') and query_params.get('page', '1') == '1'
+
+
+def delta_response(posts, serialize, since, limit):
+    """
+    Body of a delta response. ``posts`` are up to ``limit + 1`` rows of
+    ``feed_queryset(since=...)``; ``serialize`` renders a list of them.
+    Results are newest first, like the feed; ``has_more`` asks the client
+    to come back with the new ``since`` for the rest.
+    """
+    page = posts[:limit]
+    return {
+        'since': watermark(page, since),
+        'has_more': len(posts) > limit,
+        'results': serialize(page[::-1]),
+    }
+
+
+class FeedWaiters:
+    """
+    Long-poll requests of this worker waiting for feed entries, by user id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+
+    @contextmanager
+    def listen(self, user_id):
+        """
+        Register an asyncio.Event that is set when ``user_id``'s feed gains
+        entries. Register before checking, so no commit is missed.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters[user_id].add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                waiters = self._waiters[user_id]
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[user_id]
+
+    def notify(self, user_ids):
+        """
+        Wake the waiters of ``user_ids``; callable from any thread.
+        """
+        with self._lock:
+            if not self._waiters:
+                return
+            woken = [waiter for user_id in user_ids for waiter in self._waiters.get(user_id, ())]
+        for loop, event in woken:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # the loop has closed
+
+
+feed_waiters = FeedWaiters()
+
+
+async def wait_for_entries(user_id, fetch, wait):
+    """
+    Await ``fetch()`` until it returns rows or ``wait`` seconds pass.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    with feed_waiters.listen(user_id) as event:
+        while True:
+            rows = await fetch()
+            remaining = deadline - loop.time()
+            if rows or remaining <= 0:
+                return rows
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, FEED_LONG_POLL_RECHECK))
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
@@ -0,0 +1,75 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.query_plans import audit, index_migrations, migration_source
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN QUERY PLAN every SELECT run by the API's GET endpoints across "
+        "their filter/ordering/search/page combinations, flag full table scans "
+        "and temp B-tree sorts, and propose composite indexes as migrations. "
+        "Requests run in transactions that are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help="Username to make the requests as (default: the user following the most accounts)"
+        )
+        parser.add_argument('--write', action='store_true', help="Write the proposed migrations to disk")
+        parser.add_argument('--verbose-sql', action='store_true', help="Print the full SQL of each finding")
+        parser.add_argument(
+            '--fail-on-findings', action='store_true', help="Exit with an error if any index is proposed (CI)"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The query-plan audit reads SQLite's EXPLAIN QUERY PLAN output.")
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}.")
+        else:
+            user = User.objects.order_by('-following_count', 'id').first()
+            if user is None:
+                raise CommandError("The audit needs at least one user to make requests as.")
+
+        findings, proposals = audit(user)
+
+        for finding in findings:
+            params = '&'.join(f'{key}={value}' for key, value in finding['params'].items()) or '-'
+            self.stdout.write(f"{finding['view']} ?{params}")
+            for detail, _ in finding['issues']:
+                self.stdout.write(self.style.WARNING(f"    {detail}"))
+            sql = finding['sql']
+            if not options['verbose_sql'] and len(sql) > 160:
+                sql = sql[:157] + '...'
+            self.stdout.write(f"    {sql}")
+        self.stdout.write(f"{len(findings)} statement(s) with scans or temp B-trees.")
+
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("No indexes to propose."))
+            return
+
+        self.stdout.write("\nProposed indexes (add each to the model's Meta.indexes too):")
+        for proposal in proposals:
+            self.stdout.write(
+                f"  {proposal['model']._meta.label}: models.Index(fields={proposal['fields']!r}, "
+                f"name={proposal['name']!r})  # {', '.join(proposal['views'])}"
+            )
+        for migration in index_migrations(proposals).values():
+            path, source = migration_source(migration)
+            if options['write']:
+                with open(path, 'w') as handle:
+                    handle.write(source)
+                self.stdout.write(self.style.SUCCESS(f"Wrote {os.path.relpath(path)}"))
+            else:
+                self.stdout.write(f"\n# {os.path.relpath(path)}\n{source}")
+
+        if options['fail_on_findings']:
+            raise CommandError(f"{len(proposals)} index(es) proposed.")
@@ -0,0 +1,132 @@
+import asyncio
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+from posts.feed import rebuild_feed
+from posts.models import Post
+
+User = get_user_model()
+
+PREFIX = 'bench_asgi_'
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the ASGI application in-process with many concurrent clients and "
+        "compare the sync DRF read endpoints with their /api/async/ variants. "
+        "Seeds bench_asgi_* users and posts and deletes them afterwards; run it "
+        "against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help="Simultaneous clients")
+        parser.add_argument('--requests', type=int, default=5, help="Requests per client")
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20, help="Posts per author")
+
+    def handle(self, *args, **options):
+        token = self.seed(options)
+        try:
+            endpoints = [
+                ('sync feed', '/api/feed/'),
+                ('async feed', '/api/async/feed/'),
+                ('sync posts', '/api/posts/'),
+                ('async posts', '/api/async/posts/'),
+            ]
+            for name, path in endpoints:
+                stats = asyncio.run(self.run_load(path, token, options))
+                self.stdout.write(
+                    f"{name:>12}: {stats['rps']:8.1f} req/s, p50 {stats['p50']:7.1f} ms, "
+                    f"p95 {stats['p95']:7.1f} ms, p99 {stats['p99']:7.1f} ms, "
+                    f"peak threads {stats['peak_threads']}, errors {stats['errors']}"
+                )
+        finally:
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+    def seed(self, options):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        reader = User.objects.create(username=f'{PREFIX}reader')
+        authors = User.objects.bulk_create(
+            User(username=f'{PREFIX}author_{i}', password='!') for i in range(options['authors'])
+        )
+        Post.objects.bulk_create(
+            Post(author=author, title=f'post {n}', content='benchmark')
+            for author in authors for n in range(options['posts'])
+        )
+        User.followers.through.objects.bulk_create(
+            User.followers.through(from_user_id=author.pk, to_user_id=reader.pk) for author in authors
+        )
+        rebuild_feed(reader.pk)
+        return Token.objects.create(user=reader).key
+
+    async def run_load(self, path, token, options):
+        from social_media_api.asgi import application
+        latencies, errors = [], 0
+        peak_threads = threading.active_count()
+        running = True
+
+        async def watch_threads():
+            nonlocal peak_threads
+            while running:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        async def request_once():
+            nonlocal errors
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'authorization', f'Token {token}'.encode())],
+                'client': ('127.0.0.1', 5000), 'server': ('localhost', 80),
+            }
+            status_code = None
+            body_sent = False
+            finished = asyncio.Event()
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # the client stays connected until the response is complete
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                nonlocal status_code
+                if message['type'] == 'http.response.start':
+                    status_code = message['status']
+                elif not message.get('more_body'):
+                    finished.set()
+
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status_code != 200:
+                errors += 1
+
+        async def client():
+            for _ in range(options['requests']):
+                await request_once()
+
+        watcher = asyncio.create_task(watch_threads())
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - start
+        running = False
+        await watcher
+
+        latencies.sort()
+        quantiles = statistics.quantiles(latencies, n=100)
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': quantiles[49], 'p95': quantiles[94], 'p99': quantiles[98],
+            'peak_threads': peak_threads,
+            'errors': errors,
+        }
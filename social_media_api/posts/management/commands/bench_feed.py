@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feed import feed_queryset, rebuild_feed
+from posts.models import Post
+
+User = get_user_model()
+
+
+def legacy_feed_queryset(user):
+    # what FeedView did before the materialized feed
+    return Post.objects.filter(author__in=user.following.all()).order_by('-created_at')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare join-based and materialized feed latency on a synthetic "
+        "follow graph. Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=100, help="Follows per user")
+        parser.add_argument('--posts', type=int, default=20, help="Posts per user")
+        parser.add_argument('--samples', type=int, default=200, help="Feed reads per strategy")
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            users = self.build_graph(rng, options)
+            readers = [rng.choice(users) for _ in range(options['samples'])]
+            page_size = options['page_size']
+
+            results = {
+                'join': self.measure(legacy_feed_queryset, readers, page_size),
+                'materialized': self.measure(feed_queryset, readers, page_size),
+            }
+            transaction.set_rollback(True)
+
+        for name, timings in results.items():
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"{name:>13}: p50 {statistics.median(timings):.2f} ms, "
+                f"p95 {p95:.2f} ms, mean {statistics.mean(timings):.2f} ms"
+            )
+
+    def build_graph(self, rng, options):
+        self.stdout.write("Building synthetic graph...")
+        users = User.objects.bulk_create(
+            User(username=f"bench_feed_{i}", password='!') for i in range(options['users'])
+        )
+        Follow = User.followers.through
+        edges = set()
+        for user in users:
+            for author in rng.sample(users, min(options['follows'], len(users))):
+                if author.pk != user.pk:
+                    edges.add((author.pk, user.pk))
+        Follow.objects.bulk_create(
+            (Follow(from_user_id=author_id, to_user_id=follower_id) for author_id, follower_id in edges),
+            batch_size=5000,
+        )
+        Post.objects.bulk_create(
+            (
+                Post(author=user, title=f"post {n}", content="benchmark")
+                for user in users for n in range(options['posts'])
+            ),
+            batch_size=5000,
+        )
+        for user in users:
+            rebuild_feed(user.pk)
+        return users
+
+    def measure(self, build_queryset, readers, page_size):
+        timings = []
+        for user in readers:
+            start = time.perf_counter()
+            list(build_queryset(user)[:page_size])
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from posts.models import Post
+from posts.search import FullTextSearchFilter, fts_available
+from posts.views import PostViewSet
+
+User = get_user_model()
+
+SYLLABLES = "ka lo mi ne ru sa ti vo be da fe gi ho ju ly".split()
+# ~3000 pseudo-words drawn with Zipf weights, like natural-language text
+VOCABULARY = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES[:14]]
+ZIPF_WEIGHTS = list(accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare FTS5 search with DRF's LIKE-based SearchFilter on synthetic "
+        "posts. Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--samples', type=int, default=20, help="Searches per strategy")
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("FTS5 search is only available on SQLite.")
+        rng = random.Random(options['seed'])
+        factory = APIRequestFactory()
+        # a very common word down to a rare one, so broad and selective searches are timed
+        terms = [VOCABULARY[0], VOCABULARY[30], VOCABULARY[1000], 'zephyrine']
+
+        with transaction.atomic():
+            self.populate(rng, options['posts'])
+            results = {}
+            for name, backend in (('SearchFilter', filters.SearchFilter()), ('FTS5', FullTextSearchFilter())):
+                results[name] = {
+                    term: self.measure(backend, factory, term, options) for term in terms
+                }
+            transaction.set_rollback(True)
+
+        for name, by_term in results.items():
+            for term, timings in by_term.items():
+                self.stdout.write(
+                    f"{name:>12} {term!r:>14}: p50 {statistics.median(timings):8.2f} ms, "
+                    f"max {max(timings):8.2f} ms"
+                )
+
+    def populate(self, rng, count):
+        self.stdout.write(f"Inserting {count} posts...")
+        author = User.objects.create(username='bench_search_author')
+        start = time.perf_counter()
+        batch = []
+        for i in range(count):
+            words = rng.choices(VOCABULARY, cum_weights=ZIPF_WEIGHTS, k=30)
+            if i % 10_000 == 0:
+                words.append('zephyrine')
+            batch.append(Post(author=author, title=' '.join(words[:5]), content=' '.join(words[5:])))
+            if len(batch) == 10_000:
+                Post.objects.bulk_create(batch)
+                batch = []
+        Post.objects.bulk_create(batch)
+        self.stdout.write(f"Inserted in {time.perf_counter() - start:.1f} s (index maintained by triggers).")
+
+    def measure(self, backend, factory, term, options):
+        view = PostViewSet()
+        request = Request(factory.get('/api/posts/', {'search': term}))
+        timings = []
+        for _ in range(options['samples']):
+            start = time.perf_counter()
+            queryset = backend.filter_queryset(request, Post.objects.all(), view)
+            list(queryset[:options['page_size']])
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
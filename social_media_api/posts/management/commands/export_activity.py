@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import export_stream
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Stream a user's posts and comments as NDJSON (optionally gzip) to a file or stdout"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('-o', '--output', help="Write to this file instead of stdout")
+        parser.add_argument('--gzip', action='store_true', help="Gzip-compress the output")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+
+        if options['output']:
+            with open(options['output'], 'wb') as out:
+                written = self.write(out, user, options['gzip'])
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}.")
+        else:
+            stdout = getattr(self.stdout._out, 'buffer', None)
+            if stdout is None and options['gzip']:
+                raise CommandError("Refusing to write gzip data to a text stream; use --output.")
+            if stdout is None:
+                for chunk in export_stream(user):
+                    self.stdout.write(chunk.decode('utf-8'), ending='')
+            else:
+                self.write(stdout, user, options['gzip'])
+                stdout.flush()
+
+    def write(self, out, user, compress):
+        written = 0
+        for chunk in export_stream(user, compress=compress):
+            out.write(chunk)
+            written += len(chunk)
+        return written
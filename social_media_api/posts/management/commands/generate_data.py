@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.synthetic import CHUNK_SIZE, PASSWORD, PREFIX, Generator, clear_data
+
+
+class Command(BaseCommand):
+    help = (
+        f"Bulk-generate synthetic data for benchmarks: {PREFIX}* users (password "
+        f"{PASSWORD!r}, hashed once), a power-law follow graph, posts and comments, "
+        "written with chunked executemany() INSERTs. The same --seed gives the "
+        "same data. Run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20, help="Mean follows per user")
+        parser.add_argument('--posts', type=int, default=5, help="Mean posts per user")
+        parser.add_argument('--comments', type=float, default=2, help="Mean comments per post")
+        parser.add_argument('--days', type=int, default=30, help="Spread posts over this many days up to now")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows per executemany()")
+        parser.add_argument(
+            '--feeds', action='store_true',
+            help="Also materialize everyone's home feed (up to FEED_MAX_ENTRIES rows per user)"
+        )
+        parser.add_argument('--clear', action='store_true', help=f"Delete existing {PREFIX}* users first")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_data()
+        generator = Generator(
+            options['users'], options['follows'], options['posts'], options['comments'],
+            seed=options['seed'], days=options['days'], chunk_size=options['chunk_size'],
+            feeds=options['feeds'], stdout=self.stdout,
+        )
+        try:
+            timings = generator.run()
+        except ValueError as exc:
+            raise CommandError(f"{exc} Pass --clear to delete them first.")
+
+        seconds = sum(elapsed for _, elapsed in timings.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {generator.users} users, {timings['follows'][0]} follows, "
+            f"{generator.posts} posts and {generator.comments} comments in {seconds:.1f}s."
+        ))
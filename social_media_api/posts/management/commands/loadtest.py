@@ -0,0 +1,100 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.loadtest import (
+    DEFAULT_MIX, clear_population, compare, parse_mix, report, run_load, seed_population,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a synthetic load test against the API: seeds loadtest_* users with a "
+        "power-law follow graph, drives a weighted mix of logins, feed reads, "
+        "post/comment writes and follows, and reports per-endpoint latency "
+        "percentiles, throughput and query counts. Seeded users are deleted "
+        "afterwards; run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', default='wsgi',
+            help="'wsgi' or 'asgi' to run the app in-process, or the URL of a running server"
+        )
+        parser.add_argument('--clients', type=int, default=8, help="Concurrent closed-loop clients")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds of measured load")
+        parser.add_argument('--warmup', type=float, default=1.0, help="Seconds of unrecorded load first")
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--follows', type=int, default=20, help="Mean follows per user")
+        parser.add_argument('--posts', type=int, default=5, help="Mean posts per user")
+        parser.add_argument(
+            '--mix', default='',
+            help=f"Operation weights to override, e.g. 'feed=60,login=0' (default {DEFAULT_MIX})"
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Write the report to this JSON file")
+        parser.add_argument('--compare', help="A previous JSON report to compare against")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded users afterwards")
+
+    def handle(self, *args, **options):
+        if options['target'] not in ('wsgi', 'asgi') and not options['target'].startswith('http://'):
+            raise CommandError("--target must be 'wsgi', 'asgi' or an http:// URL.")
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        rng = random.Random(options['seed'])
+        population = seed_population(options['users'], options['follows'], options['posts'], rng, self.stdout)
+        try:
+            if options['warmup'] > 0:
+                run_load(options['target'], population, mix, options['clients'], options['warmup'])
+            recorder, elapsed, counted = run_load(
+                options['target'], population, mix, options['clients'], options['duration']
+            )
+        finally:
+            if not options['keep']:
+                clear_population()
+
+        settings_used = {
+            key: options[key] for key in ('target', 'clients', 'duration', 'users', 'follows', 'posts', 'seed')
+        }
+        settings_used['mix'] = mix
+        result = report(recorder, elapsed, counted, settings_used)
+        self.print_report(result)
+        if baseline is not None:
+            self.print_comparison(result, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(result, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def print_report(self, result):
+        self.stdout.write(
+            f"{'endpoint':<34} {'reqs':>6} {'err':>4} {'4xx':>4} {'req/s':>8} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}"
+        )
+        rows = list(result['endpoints'].items())
+        if result['total'] is not None:
+            rows.append(('total', result['total']))
+        for label, stats in rows:
+            queries = f"{stats['queries_mean']:.1f}" if stats['queries_mean'] is not None else '-'
+            self.stdout.write(
+                f"{label:<34} {stats['requests']:>6} {stats['errors']:>4} {stats['rejected']:>4} "
+                f"{stats['rps']:>8.1f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                f"{stats['p99_ms']:>8.2f} {queries:>8}"
+            )
+        for label, stats in result['endpoints'].items():
+            for error, count in stats['error_types'].items():
+                self.stdout.write(self.style.WARNING(f"  {label}: {count} x {error}"))
+
+    def print_comparison(self, result, baseline):
+        self.stdout.write(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('created_at')}):")
+        for label, metric, old, new, change in compare(result, baseline):
+            change_text = f"{change:+.1%}" if change is not None else 'n/a'
+            self.stdout.write(f"  {label:<34} {metric:<13} {old:>10} -> {new:>10} ({change_text})")
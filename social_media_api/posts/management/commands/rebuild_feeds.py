@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.feed import rebuild_feed
+from posts.ranking import rescore_posts
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home feeds from the follow graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids', nargs='*', type=int,
+            help="Only rebuild the feeds of these users (default: everyone)",
+        )
+        parser.add_argument(
+            '--rescore', action='store_true',
+            help="First recompute post activity scores and author affinities from the comments",
+        )
+
+    def handle(self, *args, **options):
+        if options['rescore']:
+            rescore_posts()
+            self.stdout.write("Rescored posts and author affinities.")
+
+        users = User.objects.order_by('id')
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            rebuild_feed(user_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} feed(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_comment_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute comment_count and last_comment_at on posts where they have drifted"
+
+    def handle(self, *args, **kwargs):
+        fixed = reconcile_comment_stats()
+        self.stdout.write(self.style.SUCCESS(f"Repaired comment stats for {fixed} post(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import FTS_INDEXES, fts_available, fts_table, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 full-text indexes for posts and comments"
+
+    def handle(self, *args, **kwargs):
+        if not fts_available():
+            raise CommandError("Full-text indexes are only maintained on SQLite.")
+        for model in FTS_INDEXES:
+            rebuild_index(model)
+            self.stdout.write(f"Rebuilt {fts_table(model)}.")
+        self.stdout.write(self.style.SUCCESS("Search indexes rebuilt."))
@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Replication stand-in for local SQLite replicas: copy the primary "
+        "database into every DATABASE_REPLICAS file with SQLite's online "
+        "backup API, once or every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Keep copying every N seconds (the simulated replication lag)",
+        )
+
+    def handle(self, *args, **options):
+        replicas = list(getattr(settings, 'DATABASE_REPLICAS', ()))
+        if not replicas:
+            raise CommandError("No replicas configured; set SQLITE_REPLICAS=N.")
+        for alias in [DEFAULT_DB_ALIAS, *replicas]:
+            if settings.DATABASES[alias]['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f"'{alias}' is not a SQLite database.")
+
+        while True:
+            started = time.perf_counter()
+            self.copy(replicas)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f"Synced {len(replicas)} replica(s) in {elapsed:.0f} ms.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, replicas):
+        source = sqlite3.connect(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])
+        try:
+            for alias in replicas:
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:10
+"""
+FTS5 indexes for posts and comments (see posts/search.py).
+
+External-content tables over posts_post/posts_comment, kept in step by
+triggers, plus unmanaged models mapping them for the ORM. SQLite only;
+other backends keep using LIKE-based SearchFilter.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+FORWARD_SQL = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "title, content, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER posts_post_fts_au AFTER UPDATE OF title, content ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO posts_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+
+    "CREATE VIRTUAL TABLE posts_comment_fts USING fts5("
+    "content, content='posts_comment', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_comment_fts_ai AFTER INSERT ON posts_comment BEGIN "
+    "INSERT INTO posts_comment_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER posts_comment_fts_ad AFTER DELETE ON posts_comment BEGIN "
+    "INSERT INTO posts_comment_fts(posts_comment_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER posts_comment_fts_au AFTER UPDATE OF content ON posts_comment BEGIN "
+    "INSERT INTO posts_comment_fts(posts_comment_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO posts_comment_fts(rowid, content) VALUES (new.id, new.content); END",
+    "INSERT INTO posts_comment_fts(posts_comment_fts) VALUES ('rebuild')",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP TABLE IF EXISTS posts_post_fts",
+    "DROP TRIGGER IF EXISTS posts_comment_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_comment_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_comment_fts_au",
+    "DROP TABLE IF EXISTS posts_comment_fts",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(FORWARD_SQL), run_on_sqlite(REVERSE_SQL)),
+        migrations.CreateModel(
+            name='CommentSearchIndex',
+            fields=[
+                ('comment', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.comment')),
+                ('match', models.TextField(db_column='posts_comment_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_comment_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PostSearchIndex',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.post')),
+                ('match', models.TextField(db_column='posts_post_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:08
+"""
+Precomputed scores for the ranked feed (see posts/ranking.py).
+
+Existing posts get the recency part of their activity score and feed
+entries copy it; run ``rebuild_feeds --rescore`` to fold in existing
+comments and author affinities. Like 0004, adding a column to posts_post
+rebuilds it on SQLite, so the post FTS triggers are recreated.
+"""
+import django.db.models.deletion
+import posts.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+POST_FTS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_ai AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_ad AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_post_fts_au AFTER UPDATE OF title, content ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO posts_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in POST_FTS_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+def populate_scores(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    decay = getattr(settings, 'FEED_RANK_DECAY_SECONDS', 12 * 60 * 60)
+    batch = []
+    for post in Post.objects.only('id', 'created_at').iterator(chunk_size=1000):
+        post.activity_score = post.created_at.timestamp() / decay
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['activity_score'])
+            batch = []
+    Post.objects.bulk_update(batch, ['activity_score'])
+    FeedEntry.objects.update(
+        score=Subquery(Post.objects.filter(pk=OuterRef('post_id')).values('activity_score'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_comment_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='activity_score',
+            field=models.FloatField(default=posts.models.initial_activity_score, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-score', '-post'], name='feed_user_score_idx'),
+        ),
+        migrations.AddField(
+            model_name='authoraffinity',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='authoraffinity',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_affinities', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='authoraffinity',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_author_affinity'),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(populate_scores, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,15 @@ from django.db import models
 # Create your models here.
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+def initial_activity_score():
+    """
+    Post.activity_score of a post created now (see posts/ranking.py).
+    """
+    from .ranking import time_score
+    return time_score(timezone.now())
+
 
 class Post(models.Model):
     author = models.ForeignKey(
@@ -14,9 +23,21 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # denormalized comment activity, maintained by posts/signals.py
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # log of the post's decayed activity (creation plus comments), see posts/ranking.py
+    activity_score = models.FloatField(default=initial_activity_score, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # the default list order; found by `manage.py audit_query_plans`
+            models.Index(fields=['created_at'], name='post_created_at_idx'),
+            # ?ordering=-comment_count / -last_comment_at with the id tie-breaker
+            models.Index(fields=['comment_count', 'id'], name='post_comment_count_idx'),
+            models.Index(fields=['last_comment_at', 'id'], name='post_last_comment_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.author}"
@@ -39,6 +60,114 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created_at']  # oldest first by default for comments
+        indexes = [
+            # ?post=<id> lists and the latest-comments preview of each post
+            models.Index(fields=['post', 'created_at'], name='comment_post_created_at_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author} on {self.post}"
+
+
+class FeedEntry(models.Model):
+    """
+    Materialized home-feed row: one per (follower, post).
+
+    Rows are written when a post is created (fan-out-on-write) and when a
+    follow edge is added, so reading a feed is a single range scan over
+    the (user, created_at) index instead of a join over the follow graph.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    # copied from post.created_at so the feed can be ordered without a join
+    created_at = models.DateTimeField()
+    # precomputed rank for ?rank=top: post activity plus the user's
+    # affinity for the author (see posts/ranking.py)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['-created_at', '-post_id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='feed_user_created_idx'),
+            models.Index(fields=['user', '-score', '-post'], name='feed_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"Feed entry for {self.user_id}: post {self.post_id}"
+
+
+class AuthorAffinity(models.Model):
+    """
+    How many comments ``user`` has written on ``author``'s posts; feeds the
+    affinity part of FeedEntry.score.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='author_affinities'
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'], name='unique_author_affinity'),
+        ]
+
+    def __str__(self):
+        return f"Affinity of {self.user_id} for {self.author_id}: {self.comments}"
+
+
+class PostSearchIndex(models.Model):
+    """
+    Read-only mapping of the FTS5 table over posts (created by migration
+    0003 and kept current by triggers); used by posts/search.py.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index'
+    )
+    # FTS5 exposes a hidden column named after the table; "= query" is a MATCH
+    match = models.TextField(db_column='posts_post_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+
+
+class CommentSearchIndex(models.Model):
+    """
+    Read-only mapping of the FTS5 table over comments.
+    """
+    comment = models.OneToOneField(
+        Comment,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index'
+    )
+    match = models.TextField(db_column='posts_comment_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_comment_fts'
@@ -0,0 +1,250 @@
+# posts/pagination.py
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# ---------------------------------------------------------------------
+# 🔹 STANDARD PAGINATION
+# ---------------------------------------------------------------------
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+# ---------------------------------------------------------------------
+# 🔹 KEYSET (CURSOR) PAGINATION
+# ---------------------------------------------------------------------
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the queryset's ordering plus a unique
+    tie-breaker, e.g. ``(created_at, id)``.
+
+    Each page is a ``WHERE (created_at, id) < (:c, :i) ... LIMIT n`` range
+    read, so there is no COUNT(*) and no OFFSET scan: page 1000 costs the
+    same as page 1. The ordering comes from the queryset itself, so
+    ``?ordering=`` from OrderingFilter is honoured. Views can set
+    ``cursor_tiebreaker`` when ``id`` is not the right unique column.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request, view)
+        return self.finish_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant for the ASGI read views: the page is read with
+        ``aiterator()`` so no thread is held between queries.
+        """
+        queryset = self.page_queryset(queryset, request, view)
+        chunk_size = self.page_size + 1
+        return self.finish_page([
+            obj async for obj in queryset[:chunk_size].aiterator(chunk_size=chunk_size)
+        ])
+
+    def page_queryset(self, queryset, request, view):
+        """
+        Order ``queryset`` by the keyset and restrict it to rows after the
+        cursor. The caller fetches ``page_size + 1`` rows from it.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor['reverse'])
+        ordering = [self.flip(field) for field in self.ordering] if self.reverse else self.ordering
+
+        nullable = self.nullable_fields(queryset.model, ordering)
+        queryset = queryset.order_by(*(self.order_expression(field, nullable) for field in ordering))
+        if self.cursor:
+            queryset = queryset.filter(self.keyset_filter(ordering, self.cursor['position'], nullable))
+        return queryset
+
+    def finish_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        # In reverse mode "has_more" means there is an earlier page.
+        self.has_next = bool(results) and (self.reverse or has_more)
+        self.has_previous = bool(results) and bool(self.cursor) and (has_more or not self.reverse)
+        self.first_position = self.position_of(results[0]) if results else None
+        self.last_position = self.position_of(results[-1]) if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset, view):
+        ordering = [
+            field for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        ] or ['-' + self.tiebreaker]
+        tiebreaker = getattr(view, 'cursor_tiebreaker', self.tiebreaker)
+        if ordering[-1].lstrip('-') != tiebreaker:
+            prefix = '-' if ordering[0].startswith('-') else ''
+            ordering.append(prefix + tiebreaker)
+        return ordering
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def nullable_fields(model, ordering):
+        names = set()
+        for field in ordering:
+            name = field.lstrip('-')
+            try:
+                if model._meta.get_field(name).null:
+                    names.add(name)
+            except FieldDoesNotExist:
+                pass  # annotations and related lookups
+        return names
+
+    @staticmethod
+    def order_expression(field, nullable):
+        """
+        Nullable columns sort NULLs as the smallest value on every backend,
+        which keyset_filter relies on; other columns keep plain ordering so
+        indexes still apply.
+        """
+        name = field.lstrip('-')
+        if name not in nullable:
+            return field
+        return F(name).desc(nulls_last=True) if field.startswith('-') else F(name).asc(nulls_first=True)
+
+    @staticmethod
+    def keyset_filter(ordering, position, nullable=()):
+        """
+        Lexicographic "comes after ``position``" predicate for ``ordering``:
+        (a > x) OR (a = x AND b > y) OR ..., with < for descending fields.
+        NULLs in ``nullable`` columns count as smaller than any value.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            if value is None:
+                # nothing sorts below NULL; everything non-NULL sorts above it
+                after = Q(pk__in=[]) if descending else Q(**{f'{name}__isnull': False})
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if descending and name in nullable:
+                    after |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
+    def position_of(self, obj):
+        position = []
+        for field in self.ordering:
+            value = obj
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if cursor['o'] != self.ordering or len(cursor['p']) != len(self.ordering):
+                raise ValueError
+            return {'position': cursor['p'], 'reverse': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        payload = {'o': self.ordering, 'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
+
+
+# ---------------------------------------------------------------------
+# 🔹 CURSOR BY DEFAULT, PAGE NUMBERS ON REQUEST
+# ---------------------------------------------------------------------
+class CursorOrPageNumberPagination(BasePagination):
+    """
+    Keyset pagination by default; falls back to the old page-number
+    pagination (with ``count``) when the client sends ``?page=``.
+    """
+    cursor_class = KeysetPagination
+    page_number_class = StandardResultsSetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_param = self.page_number_class.page_query_param
+        if page_param in request.query_params:
+            self.paginator = self.page_number_class()
+        else:
+            self.paginator = self.cursor_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.cursor_class().get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    @property
+    def display_page_controls(self):
+        paginator = getattr(self, 'paginator', None)
+        return isinstance(paginator, PageNumberPagination) and paginator.display_page_controls
@@ -0,0 +1,345 @@
+# posts/query_plans.py
+"""
+Query-plan audit of the API's read endpoints (``manage.py audit_query_plans``).
+
+Every GET route in the URLconf served by a DRF generic view or viewset is
+called in-process, once per combination of its filterset fields, ordering
+fields, search and page/cursor parameters (plus any ``query_plan_probes``
+the view declares). Each SELECT it runs is passed through SQLite's
+``EXPLAIN QUERY PLAN`` and two things are flagged:
+
+- ``SCAN <table>`` without an index: every row of the table is read;
+- ``USE TEMP B-TREE``: rows are sorted (or grouped) after being fetched,
+  so a LIMIT no longer bounds the work.
+
+For each flagged table the audit proposes a composite index from the
+query itself — equality/IN columns (and window PARTITION BY columns)
+first, then the ORDER BY columns — unless an existing index already starts
+with those columns. The rowid (integer primary key) that SQLite appends
+to every index is left off, so (post_id, created_at) also serves
+``ORDER BY created_at, id``.
+
+Without ANALYZE statistics SQLite plans as if every table were large, so
+the audit reflects the schema rather than how much data happens to exist.
+"""
+import re
+from urllib.parse import parse_qsl, urlsplit
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, migrations, models, transaction
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.generics import GenericAPIView
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+COLUMN = r'"(\w+)"\."(\w+)"'
+# compared with a literal; join conditions compare two columns
+EQUALITY = re.compile(COLUMN + r" (?:= |IN \()(?=[-\d']|NULL)")
+ORDER_BY = re.compile(r'ORDER BY (.+?)(?:\) | LIMIT | OFFSET |\)$|$)')
+ORDER_TERM = re.compile(COLUMN + r' (ASC|DESC)')
+PARTITION_BY = re.compile(r'PARTITION BY (.+?) ORDER BY')
+SCAN = re.compile(r'^SCAN (\w+)(.*)$')
+
+
+# ---------------------------------------------------------------------
+# 🔹 ENDPOINTS AND PROBES
+# ---------------------------------------------------------------------
+def route_label(prefix, pattern):
+    route = prefix + str(pattern)
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', route)
+    return '/' + route.replace('^', '').replace('$', '')
+
+
+def api_views(patterns=None, prefix=''):
+    """
+    [(label, callback, action, url kwarg names)] for every GET route served
+    by a DRF generic view, skipping format-suffix duplicates.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    found = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            found += api_views(pattern.url_patterns, prefix + str(pattern.pattern))
+            continue
+        callback = pattern.callback
+        view_class = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+        kwarg_names = set(pattern.pattern.regex.groupindex)
+        if view_class is None or not issubclass(view_class, GenericAPIView) or 'format' in kwarg_names:
+            continue
+        actions = getattr(callback, 'actions', None)
+        if actions is not None:
+            action = actions.get('get')
+        else:
+            action = 'get' if hasattr(view_class, 'get') else None
+        if action is not None:
+            found.append((route_label(prefix, pattern.pattern), callback, action, kwarg_names))
+    return found
+
+
+def view_model(view_class):
+    if view_class.queryset is not None:
+        return view_class.queryset.model
+    serializer_class = getattr(view_class, 'serializer_class', None)
+    return serializer_class.Meta.model if serializer_class is not None else None
+
+
+def sample_value(model, field):
+    value = (
+        model.objects.exclude(**{f'{field}__isnull': True})
+        .order_by().values_list(field, flat=True).first()
+    )
+    return str(value) if value is not None else '1'
+
+
+def sample_search_term(model, search_fields):
+    for field in search_fields:
+        text = model.objects.order_by().values_list(field, flat=True).first() or ''
+        words = re.findall(r'\w{3,}', text)
+        if words:
+            return words[0]
+    return 'a'
+
+
+def probes(view_class, action):
+    """
+    Query-parameter dicts to request ``view_class`` with: the cross product
+    of each filter, ordering and search option (each one also left out).
+    """
+    if action != 'list':
+        return [{}]
+    model = view_model(view_class)
+    extras = [{}] + list(getattr(view_class, 'query_plan_probes', ()))
+    filters = [{}] + [
+        {field: sample_value(model, field)} for field in getattr(view_class, 'filterset_fields', None) or ()
+    ]
+    orderings = [{}]
+    for field in getattr(view_class, 'ordering_fields', None) or ():
+        orderings += [{'ordering': field}, {'ordering': f'-{field}'}]
+    searches = [{}]
+    if getattr(view_class, 'search_fields', None):
+        searches.append({'search': sample_search_term(model, view_class.search_fields)})
+    pages = [{}]
+    if view_class.pagination_class is not None:
+        pages.append({'page': '2'})
+    return [
+        {**extra, **filter_, **ordering, **search, **page}
+        for extra in extras for filter_ in filters for ordering in orderings
+        for search in searches for page in pages
+    ]
+
+
+def allowed_host():
+    # a host that passes ALLOWED_HOSTS, for in-process requests
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+    return hosts[0] if hosts else 'localhost'
+
+
+def run_probe(callback, params, kwargs, user, factory):
+    """
+    Call the view and return (SELECT statements it ran, next page params).
+    """
+    request = factory.get('/', params, HTTP_HOST=allowed_host())
+    force_authenticate(request, user=user)
+    with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+        response = callback(request, **kwargs)
+        transaction.set_rollback(True)
+    statements = [
+        query['sql'] for query in captured.captured_queries
+        if query['sql'].lstrip().upper().startswith(('SELECT', 'WITH'))
+    ]
+    next_url = response.data.get('next') if isinstance(getattr(response, 'data', None), dict) else None
+    next_params = dict(parse_qsl(urlsplit(next_url).query)) if next_url else None
+    return statements, next_params
+
+
+# ---------------------------------------------------------------------
+# 🔹 PLANS AND INDEX PROPOSALS
+# ---------------------------------------------------------------------
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_issues(plan, sql):
+    """
+    Flagged lines of a query plan with the table each one concerns (None
+    for a temp B-tree, whose table comes from the ORDER BY clause).
+
+    A bare scan is only flagged when the table is filtered or the rows are
+    sorted afterwards: an unfiltered scan in rowid order (``ORDER BY id``,
+    ``COUNT(*)``) reads what was asked for.
+    """
+    sorts = any(detail.startswith('USE TEMP B-TREE') for detail in plan)
+    _, _, where = sql.partition(' WHERE ')
+    issues = []
+    for detail in plan:
+        scan = SCAN.match(detail)
+        if scan and not scan.group(2).strip().startswith(('USING', 'VIRTUAL TABLE')):
+            if sorts or f'"{scan.group(1)}".' in where:
+                issues.append((detail, scan.group(1)))
+        elif detail.startswith('USE TEMP B-TREE'):
+            issues.append((detail, None))
+    return issues
+
+
+def order_columns(sql):
+    """
+    [(table, column, descending)] of the last ORDER BY clause in ``sql``
+    that sorts on table columns.
+    """
+    terms = []
+    for clause in ORDER_BY.findall(sql):
+        clause_terms = [(table, column, direction == 'DESC') for table, column, direction in ORDER_TERM.findall(clause)]
+        if clause_terms:
+            terms = clause_terms
+    return terms
+
+
+def equality_columns(sql, table):
+    columns = [column for name, column in EQUALITY.findall(sql) if name == table]
+    for clause in PARTITION_BY.findall(sql):
+        columns += [column for name, column in re.findall(COLUMN, clause) if name == table]
+    return list(dict.fromkeys(columns))
+
+
+def existing_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [info['columns'] for info in constraints.values() if info['index'] or info['unique'] or info['primary_key']]
+
+
+def model_for_table(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table and model._meta.managed:
+            return model
+    return None
+
+
+def propose_index(sql, detail, table):
+    """
+    {'model', 'fields', 'columns'} for an index serving the flagged plan
+    line, or None when no index would help or one already exists.
+    """
+    ordering = order_columns(sql)
+    if table is None:
+        if not detail.startswith('USE TEMP B-TREE FOR ORDER BY') or not ordering:
+            return None
+        table = ordering[0][0]
+    model = model_for_table(table)
+    if model is None:
+        return None
+    sort = [(column, descending) for name, column, descending in ordering if name == table]
+    pk_column = model._meta.pk.column
+    equal = [
+        column for column in equality_columns(sql, table)
+        if column != pk_column and column not in {c for c, _ in sort}
+    ]
+    while sort and sort[-1][0] == pk_column:
+        sort.pop()  # the rowid ends every SQLite index
+    if sort and all(descending for _, descending in sort):
+        sort = [(column, False) for column, _ in sort]  # walked backwards
+    columns = equal + [column for column, _ in sort]
+    if not columns or columns == [pk_column]:
+        return None
+    if any(existing[:len(columns)] == columns for existing in existing_indexes(table)):
+        return None
+    by_column = {field.column: field.name for field in model._meta.concrete_fields}
+    descending = dict(sort)
+    fields = [('-' if descending.get(column) else '') + by_column[column] for column in columns]
+    return {'model': model, 'fields': fields, 'columns': columns}
+
+
+def index_name(model, fields):
+    name = '_'.join([model._meta.model_name] + [field.lstrip('-') for field in fields] + ['idx'])
+    if len(name) <= models.Index.max_name_length:
+        return name
+    index = models.Index(fields=fields)
+    index.set_name_with_model(model)
+    return index.name
+
+
+# ---------------------------------------------------------------------
+# 🔹 AUDIT
+# ---------------------------------------------------------------------
+def audit(user, views=None):
+    """
+    Run every probe as ``user`` and return (findings, proposals):
+
+    - findings: [{'view', 'params', 'sql', 'issues'}] for statements with
+      flagged plan lines;
+    - proposals: [{'model', 'fields', 'columns', 'name', 'views'}], one
+      per distinct index.
+    """
+    factory = APIRequestFactory()
+    findings, proposals, seen = [], {}, set()
+    for label, callback, action, kwarg_names in (views if views is not None else api_views()):
+        view_class = callback.cls
+        kwargs = {}
+        if kwarg_names:
+            model = view_model(view_class)
+            pk = model.objects.order_by('pk').values_list('pk', flat=True).first() if model else None
+            if pk is None:
+                continue
+            kwargs = {name: pk for name in kwarg_names}
+        queue = list(probes(view_class, action))
+        while queue:
+            params = queue.pop(0)
+            statements, next_params = run_probe(callback, params, kwargs, user, factory)
+            if next_params and 'cursor' in next_params and 'cursor' not in params:
+                queue.insert(0, next_params)
+            for sql in statements:
+                plan = explain(sql)
+                issues = plan_issues(plan, sql)
+                key = (label, sql)
+                if not issues or key in seen:
+                    continue
+                seen.add(key)
+                findings.append({'view': f'{label} ({action})', 'params': params, 'sql': sql, 'issues': issues})
+                for detail, table in issues:
+                    proposal = propose_index(sql, detail, table)
+                    if proposal is None:
+                        continue
+                    model = proposal['model']
+                    entry = proposals.setdefault((model._meta.label, tuple(proposal['fields'])), {
+                        **proposal, 'name': index_name(model, proposal['fields']), 'views': [],
+                    })
+                    if label not in entry['views']:
+                        entry['views'].append(label)
+    return findings, list(proposals.values())
+
+
+def index_migrations(proposals):
+    """
+    {app label: Migration} adding the proposed indexes after each app's
+    latest migration.
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    by_app = {}
+    for proposal in proposals:
+        by_app.setdefault(proposal['model']._meta.app_label, []).append(proposal)
+    result = {}
+    for app_label, app_proposals in by_app.items():
+        leaves = loader.graph.leaf_nodes(app_label)
+        number = max((MigrationAutodetector.parse_number(name) or 0 for _, name in leaves), default=0) + 1
+        migration = migrations.Migration(f'{number:04d}_query_plan_indexes', app_label)
+        migration.dependencies = leaves
+        migration.operations = [
+            migrations.AddIndex(
+                model_name=proposal['model']._meta.model_name,
+                index=models.Index(fields=proposal['fields'], name=proposal['name']),
+            )
+            for proposal in app_proposals
+        ]
+        result[app_label] = migration
+    return result
+
+
+def migration_source(migration):
+    writer = MigrationWriter(migration)
+    return writer.path, writer.as_string()
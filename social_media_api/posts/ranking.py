@@ -0,0 +1,211 @@
+# posts/ranking.py
+"""
+Precomputed scores for the ranked home feed (``/api/feed/?rank=top``).
+
+Every piece of activity decays with ``exp(-age / FEED_RANK_DECAY_SECONDS)``.
+Scores are kept in log space relative to a fixed epoch, so decay never has
+to be recomputed: ``log(exp(t / decay))`` is just ``t / decay``, and the
+"now" term shared by every post cancels out of the ordering.
+
+- ``Post.activity_score`` is the log of the post's decayed activity mass:
+  the post itself (weight 1) plus each comment (FEED_RANK_COMMENT_WEIGHT).
+  A burst of recent comments (comment velocity) lifts a post much as a
+  fresh post would; old comments count for little. It is folded in with a
+  numerically stable log-add-exp on each new comment.
+- ``AuthorAffinity`` counts the viewer's comments on an author's posts;
+  it adds ``FEED_RANK_AFFINITY_WEIGHT * log(1 + comments)``.
+
+``FeedEntry.score`` = activity + affinity, indexed per user, so a ranked
+feed page is a bounded index range scan. Scores are updated on post
+creation (fan-out), on follow (backfill) and on comment creation. Deleting
+a comment does not lower them; ``rebuild_feeds --rescore`` recomputes
+everything from scratch.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+from .models import Post, Comment, FeedEntry, AuthorAffinity
+
+RANK_DECAY_SECONDS = getattr(settings, 'FEED_RANK_DECAY_SECONDS', 12 * 60 * 60)
+COMMENT_WEIGHT = getattr(settings, 'FEED_RANK_COMMENT_WEIGHT', 0.5)
+AFFINITY_WEIGHT = getattr(settings, 'FEED_RANK_AFFINITY_WEIGHT', 1.0)
+
+
+def time_score(moment):
+    return moment.timestamp() / RANK_DECAY_SECONDS
+
+
+def comment_score(comment):
+    return time_score(comment.created_at) + math.log(COMMENT_WEIGHT)
+
+
+def affinity_score(comments):
+    return AFFINITY_WEIGHT * math.log1p(comments)
+
+
+def log_add_exp(a, b):
+    """
+    log(exp(a) + exp(b)) for two SQL expressions, without overflowing exp().
+    """
+    return Greatest(a, b) + Ln(Value(1.0) + Exp(-Abs(a - b)))
+
+
+def affinities_for_author(author_id):
+    """
+    {user id: affinity score} for users who have commented on ``author_id``.
+    """
+    return {
+        user_id: affinity_score(comments)
+        for user_id, comments in
+        AuthorAffinity.objects.filter(author_id=author_id).values_list('user_id', 'comments')
+    }
+
+
+def affinities_of(user_id):
+    """
+    {author id: affinity score} for the authors ``user_id`` has commented on.
+    """
+    return {
+        author_id: affinity_score(comments)
+        for author_id, comments in
+        AuthorAffinity.objects.filter(user_id=user_id).values_list('author_id', 'comments')
+    }
+
+
+def record_comment_activity(comment):
+    """
+    Fold a new comment into its post's activity score, the scores of the
+    post's feed entries, and the commenter's affinity for the author.
+    """
+    record_comments_activity([comment])
+
+
+def record_comments_activity(comments, post_authors=None):
+    """
+    Batch form of record_comment_activity() for comments written together
+    (e.g. by bulk_create), with a fixed number of statements however many
+    posts and authors the batch touches. ``post_authors`` ({post id: author
+    id}) saves looking the authors up when the caller has them.
+    """
+    by_post = {}
+    for comment in comments:
+        by_post.setdefault(comment.post_id, []).append(comment)
+    if not by_post:
+        return
+    if post_authors is None:
+        post_authors = dict(Post.objects.filter(pk__in=by_post).values_list('pk', 'author_id'))
+
+    new_activity = {}
+    for post_id, post_comments in by_post.items():
+        terms = [comment_score(comment) for comment in post_comments]
+        peak = max(terms)
+        new_activity[post_id] = peak + math.log(sum(math.exp(term - peak) for term in terms))
+
+    interactions = {}
+    for comment in comments:
+        author_id = post_authors.get(comment.post_id)
+        if author_id is not None and author_id != comment.author_id:
+            key = (comment.author_id, author_id)
+            interactions[key] = interactions.get(key, 0) + 1
+
+    with transaction.atomic():
+        # feed entries move by exactly as much as their post's activity score;
+        # reading it inside the same UPDATE keeps concurrent comments consistent
+        activity = Subquery(
+            Post.objects.filter(pk=OuterRef('post_id')).values('activity_score'), output_field=FloatField()
+        )
+        FeedEntry.objects.filter(post_id__in=by_post).update(
+            score=F('score') - activity + log_add_exp(activity, by_key(new_activity, 'post_id'))
+        )
+        Post.objects.filter(pk__in=by_post).update(
+            activity_score=log_add_exp(F('activity_score'), by_key(new_activity, 'pk'))
+        )
+        if interactions:
+            record_affinities(interactions)
+
+
+def by_key(values, field):
+    """
+    A CASE giving each row the float in ``values`` keyed by its ``field``.
+    """
+    return Case(
+        *[When(**{field: key}, then=Value(value)) for key, value in values.items()],
+        output_field=FloatField(),
+    )
+
+
+def record_affinities(interactions):
+    """
+    Add {(commenter id, author id): new comments} to AuthorAffinity and
+    shift the commenters' feed entries for those authors to match.
+    """
+    # IN lists rather than one OR per pair, which SQLite caps at 1000 deep;
+    # the CASEs leave rows outside ``interactions`` as they were
+    users = {user_id for user_id, _ in interactions}
+    authors = {author_id for _, author_id in interactions}
+    AuthorAffinity.objects.bulk_create(
+        [AuthorAffinity(user_id=user_id, author_id=author_id) for user_id, author_id in interactions],
+        ignore_conflicts=True,
+    )
+    affinities = AuthorAffinity.objects.filter(user_id__in=users, author_id__in=authors)
+    affinities.update(comments=F('comments') + Case(
+        *[When(user_id=user_id, author_id=author_id, then=Value(count))
+          for (user_id, author_id), count in interactions.items()],
+        default=Value(0),
+    ))
+    deltas = {}
+    for user_id, author_id, comments in affinities.values_list('user_id', 'author_id', 'comments'):
+        count = interactions.get((user_id, author_id))
+        if count:
+            deltas[user_id, author_id] = affinity_score(comments) - affinity_score(comments - count)
+    FeedEntry.objects.filter(user_id__in=users, post__author_id__in=authors).update(score=F('score') + Case(
+        *[When(user_id=user_id, post__in=Post.objects.filter(author_id=author_id).values('pk'), then=Value(delta))
+          for (user_id, author_id), delta in deltas.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+
+
+def rescore_posts(batch_size=1000):
+    """
+    Recompute every post's activity score and rebuild AuthorAffinity from
+    the comments table. Feed entries are rescored by rebuild_feed().
+    """
+    posts = Post.objects.order_by('id').only('id', 'created_at')
+    last_id = 0
+    while True:
+        batch = list(posts.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].pk
+        comment_times = {}
+        for post_id, created_at in (
+            Comment.objects.filter(post_id__in=[post.pk for post in batch])
+            .order_by().values_list('post_id', 'created_at')
+        ):
+            comment_times.setdefault(post_id, []).append(created_at)
+        for post in batch:
+            terms = [time_score(post.created_at)]
+            terms += [time_score(ts) + math.log(COMMENT_WEIGHT) for ts in comment_times.get(post.pk, ())]
+            peak = max(terms)
+            post.activity_score = peak + math.log(sum(math.exp(term - peak) for term in terms))
+        Post.objects.bulk_update(batch, ['activity_score'])
+
+    counts = (
+        Comment.objects
+        .exclude(author_id=F('post__author_id'))
+        .values('author_id', 'post__author_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        AuthorAffinity.objects.all().delete()
+        AuthorAffinity.objects.bulk_create(
+            (AuthorAffinity(user_id=row['author_id'], author_id=row['post__author_id'], comments=row['total'])
+             for row in counts.iterator()),
+            batch_size=batch_size,
+        )
@@ -0,0 +1,130 @@
+# posts/representations.py
+"""
+In-process cache of serialized post and comment representations.
+
+Serializers using ``CachedRepresentationMixin`` store the part of each
+object's representation that only depends on its own row, keyed by
+``(serializer, pk)`` and stamped with ``(updated_at, serializer version)``.
+A lookup whose stamp no longer matches the freshly loaded row is a miss,
+so edits made by other processes are never served stale. Fields listed in
+``uncached_fields`` — values from other rows (author username, embedded
+comments) or columns updated without touching ``updated_at`` (counters) —
+are rendered on every call and spliced into the cached fragment, in field
+order. List serializers call ``to_representation`` per item, so a page
+stitches cached fragments together and only serializes the misses.
+
+Entries are evicted least-recently-used beyond
+REPRESENTATION_CACHE_MAX_ENTRIES and dropped when their object is saved or
+deleted (see posts/signals.py).
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+
+class RepresentationCache:
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or getattr(settings, 'REPRESENTATION_CACHE_MAX_ENTRIES', 20000)
+        self._entries = OrderedDict()  # (serializer, model label, pk) -> (stamp, fragment)
+        self._keys_by_object = {}  # (model label, pk) -> {keys}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, stamp, fragment):
+        with self._lock:
+            self._entries[key] = (stamp, fragment)
+            self._entries.move_to_end(key)
+            self._keys_by_object.setdefault(key[1:], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        if self._entries.pop(key, None) is not None:
+            keys = self._keys_by_object.get(key[1:])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_object[key[1:]]
+
+    def invalidate(self, instance):
+        with self._lock:
+            for key in list(self._keys_by_object.get((instance._meta.label, instance.pk), ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_object.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+representation_cache = RepresentationCache()
+
+
+class CachedRepresentationMixin:
+    """
+    ModelSerializer mixin serving the row-local part of ``to_representation``
+    from ``representation_cache``.
+
+    Bump ``representation_version`` when a field's rendering changes
+    without the field list changing. Bulk readers that would only flush
+    the cache (exports) pass ``cache_representations=False`` in the context.
+    """
+    representation_version = 1
+    uncached_fields = ()
+    stamp_field = 'updated_at'
+
+    def to_representation(self, instance):
+        if not self.context.get('cache_representations', True):
+            return super().to_representation(instance)
+        key = (type(self).__qualname__, instance._meta.label, instance.pk)
+        stamp = (getattr(instance, self.stamp_field), self.representation_version, tuple(self.fields))
+        fragment = representation_cache.get(key, stamp)
+        if fragment is None:
+            data = super().to_representation(instance)
+            representation_cache.set(key, stamp, {
+                name: value for name, value in data.items() if name not in self.uncached_fields
+            })
+            return data
+
+        data = {}
+        for field in self._readable_fields:
+            name = field.field_name
+            if name in fragment:
+                data[name] = fragment[name]
+                continue
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            data[name] = None if check_for_none is None else field.to_representation(attribute)
+        return data
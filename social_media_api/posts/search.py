@@ -0,0 +1,78 @@
+# posts/search.py
+"""
+SQLite FTS5 full-text search for posts and comments.
+
+Each indexed model has an external-content FTS5 table (created by migration
+0003) that SQLite triggers keep in step with every insert, update and
+delete, including bulk_create and queryset.update(). ``FullTextSearchFilter``
+replaces DRF's SearchFilter: instead of ``LIKE '%term%'`` scans it joins
+the FTS table (mapped by PostSearchIndex/CommentSearchIndex), runs an FTS5
+MATCH and orders hits by bm25 relevance. On other databases it falls
+back to the plain SearchFilter behaviour.
+"""
+from django.db import connection
+from django.db.models import F
+from rest_framework import filters
+
+from .models import Post, Comment
+
+# model -> indexed columns; the FTS table is named "<db_table>_fts"
+FTS_INDEXES = {
+    Post: ['title', 'content'],
+    Comment: ['content'],
+}
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def rebuild_index(model):
+    """
+    Rebuild ``model``'s FTS table from the content table.
+    """
+    fts = fts_table(model)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+
+
+def match_expression(terms):
+    """
+    Turn search terms into an FTS5 query: every term must match, as a
+    prefix, and each is quoted so user input cannot inject FTS syntax.
+    """
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def search(queryset, terms):
+    """
+    Restrict ``queryset`` to FTS matches for ``terms`` and annotate
+    ``search_rank`` (bm25; lower is more relevant).
+
+    The FTS table is joined on rowid, so SQLite drives the query from the
+    index and computes bm25 once per hit.
+    """
+    return (
+        queryset
+        .filter(search_index__match=match_expression(terms))
+        .annotate(search_rank=F('search_index__rank'))
+    )
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the FTS5 index, ordered by relevance.
+
+    A later ``?ordering=`` still takes precedence over relevance order.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or queryset.model not in FTS_INDEXES or not fts_available():
+            return super().filter_queryset(request, queryset, view)
+        return search(queryset, terms).order_by('search_rank')
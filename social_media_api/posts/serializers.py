@@ -1,11 +1,39 @@
 from rest_framework import serializers
 from .models import Post, Comment
+from .representations import CachedRepresentationMixin
+from django.conf import settings
+from django.utils.functional import cached_property
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 
 User = get_user_model()
 
-class CommentSerializer(serializers.ModelSerializer):
+# how many of the latest comments are embedded in each serialized post
+COMMENT_PREVIEW_SIZE = getattr(settings, 'POST_COMMENT_PREVIEW_SIZE', 3)
+
+
+def with_comments(queryset, full=False):
+    """
+    Eager-load what PostSerializer embeds for a whole page of posts.
+
+    By default only the latest COMMENT_PREVIEW_SIZE comments of each post
+    are fetched, with one ROW_NUMBER() window query for the page; the full
+    list is available from /api/comments/?post=<id>. ``full=True`` embeds
+    every comment instead.
+    """
+    if full:
+        return queryset.prefetch_related(
+            Prefetch('comments', queryset=Comment.objects.select_related('author'))
+        )
+    latest = Comment.objects.select_related('author').order_by('-created_at', '-id')
+    return queryset.prefetch_related(
+        Prefetch('comments', queryset=latest[:COMMENT_PREVIEW_SIZE], to_attr='latest_comments')
+    )
+
+class CommentSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
+    # rendered per request; the rest comes from the representation cache
+    uncached_fields = ('author',)
 
     class Meta:
         model = Comment
@@ -13,16 +41,77 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
 
 
-class PostSerializer(serializers.ModelSerializer):
+class CommentBatchItemSerializer(serializers.ModelSerializer):
+    """
+    One comment of a batch. ``post`` is a plain id here; the batch checks
+    all of them with one query (see posts/comments.py).
+    """
+    post = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Comment
+        fields = ['post', 'content']
+
+
+class CommentBatchSerializer(serializers.Serializer):
+    comments = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=500,
+    )
+    # false: create the valid comments and report the rest;
+    # true: create nothing unless every comment is valid
+    atomic = serializers.BooleanField(default=False)
+
+
+class PostSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
-    # nested comments optional: include them when you want to show comments with posts
-    comments = CommentSerializer(many=True, read_only=True)
+    # latest comments only (see with_comments); ?comments=all embeds them all
+    comments = serializers.SerializerMethodField()
+    # from other rows or updated without touching updated_at, so rendered
+    # per request; the rest comes from the representation cache
+    uncached_fields = ('author', 'comment_count', 'last_comment_at', 'comments')
 
     class Meta:
         model = Post
-        fields = ['id', 'author', 'title', 'content', 'created_at', 'updated_at', 'comments']
-        read_only_fields = ['id', 'author', 'created_at', 'updated_at', 'comments']
+        fields = [
+            'id', 'author', 'title', 'content', 'created_at', 'updated_at',
+            'comment_count', 'last_comment_at', 'comments',
+        ]
+        read_only_fields = [
+            'id', 'author', 'created_at', 'updated_at', 'comment_count', 'last_comment_at', 'comments',
+        ]
+
+    def get_comments(self, obj):
+        latest = getattr(obj, 'latest_comments', None)
+        if latest is not None:
+            # fetched newest first; show them oldest first like the comment list
+            comments = list(reversed(latest))
+        elif self.context.get('full_comments'):
+            comments = obj.comments.all()
+        else:
+            latest = obj.comments.select_related('author').order_by('-created_at', '-id')
+            comments = list(reversed(latest[:COMMENT_PREVIEW_SIZE]))
+        return [self.comment_serializer.to_representation(comment) for comment in comments]
+
+    @cached_property
+    def comment_serializer(self):
+        # one child for the whole page: building a serializer's fields costs
+        # more than rendering a cached comment
+        return CommentSerializer(context=self.context)
 
     def create(self, validated_data):
         # 'author' will be set in the view (using request.user)
         return Post.objects.create(**validated_data)
+
+
+class PostExportSerializer(PostSerializer):
+    """
+    PostSerializer's layout without the embedded comments; exports emit
+    comments as rows of their own (see posts/export.py).
+    """
+    comments = None
+
+    class Meta(PostSerializer.Meta):
+        fields = [f for f in PostSerializer.Meta.fields if f != 'comments']
+        read_only_fields = fields
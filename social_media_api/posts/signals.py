@@ -0,0 +1,77 @@
+# posts/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.counters import adjust_counter
+from .counters import record_comment, forget_comment
+from .feed import backfill_feed, prune_feed
+from .models import Post, Comment
+from .ranking import record_comment_activity
+from .representations import representation_cache
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.followers.through)
+def sync_feed_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep materialized feeds in step with the follow graph.
+
+    ``user.following.add(target)`` arrives with ``reverse=True`` (instance is
+    the follower); ``target.followers.add(user)`` arrives with
+    ``reverse=False`` (instance is the followed author).
+    """
+    if action == 'pre_clear':
+        # pk_set is None on clear, so remember the edges before they go
+        related = instance.following if reverse else instance.followers
+        instance._cleared_follow_ids = set(related.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_follow_ids', set())
+        action = 'post_remove'
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    if reverse:
+        edges = [(instance.pk, pk_set)]
+    else:
+        edges = [(follower_id, {instance.pk}) for follower_id in pk_set]
+
+    for follower_id, author_ids in edges:
+        if action == 'post_add':
+            backfill_feed(follower_id, author_ids)
+        else:
+            prune_feed(follower_id, author_ids)
+
+
+@receiver(post_save, sender=Post)
+def increment_posts_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter([instance.author_id], 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_posts_count(sender, instance, **kwargs):
+    adjust_counter([instance.author_id], 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        record_comment(instance)
+        record_comment_activity(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_comment(sender, instance, **kwargs):
+    # also runs for comments removed by a cascade from their post or author
+    forget_comment(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def forget_cached_representation(sender, instance, **kwargs):
+    representation_cache.invalidate(instance)
@@ -0,0 +1,326 @@
+# posts/synthetic.py
+"""
+Bulk synthetic data for benchmarks (``manage.py generate_data``).
+
+Generates ``synthetic_*`` users sharing one precomputed password hash, a
+follow graph with power-law degrees (Zipf in-degrees, Pareto out-degrees),
+posts spread over the last ``days`` days and comments clustered on recent
+posts. Everything is drawn from one ``random.Random(seed)``, so a seed
+always produces the same users, graph and text.
+
+Rows are written with ``bulk_insert``: one prepared INSERT run through
+``executemany()`` per chunk. ``bulk_create`` builds a model instance per
+row and, on SQLite, splits every chunk into INSERTs of 999 parameters, which
+caps it at some 10k rows/s; here each row is a tuple and every column that
+does not vary between rows is prepared once. As in loaddata, foreign keys
+are checked once at the end rather than per row. On SQLite the secondary
+indexes and FTS triggers are dropped for the load and rebuilt in one pass
+at the end, inside the same transaction, so a failed run leaves nothing
+behind.
+
+Derived data is rebuilt set-wise afterwards: user counters, post comment
+stats and, optionally, the materialized feeds. Activity scores only
+account for the post itself; ``rebuild_feeds --rescore`` folds the
+comments in.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.counters import reconcile_counters
+from accounts.models import username_key
+from .cleanup import delete_users
+from .counters import reconcile_comment_stats
+from .feed import FEED_MAX_ENTRIES
+from .loadtest import WORDS, zipf_weights
+from .models import Post, Comment, FeedEntry
+from .ranking import RANK_DECAY_SECONDS
+from .search import FTS_INDEXES, rebuild_index
+
+User = get_user_model()
+
+PREFIX = 'synthetic_'
+PASSWORD = 'synthetic-password'
+CHUNK_SIZE = 50000
+# distinct titles/contents drawn from; generating text per row would cost
+# more than inserting it
+TEXT_POOL_SIZE = 4096
+# SQLite page cache for the run (the default is 2 MB)
+CACHE_KIB = 256 * 1024
+EPOCH = datetime(1970, 1, 1)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def db_timestamp(seconds):
+    """
+    Unix time as a naive UTC datetime string, the form Django stores. Much
+    cheaper than preparing an aware datetime per row.
+    """
+    return str(EPOCH + timedelta(seconds=seconds))
+
+
+def bulk_insert(model, fields, rows, defaults=None, chunk_size=CHUNK_SIZE):
+    """
+    Insert ``rows``, tuples of already database-ready values for
+    ``fields``, with one executemany() per chunk. Every other column gets
+    its value on ``model(**defaults)``, prepared once. No save(), no
+    signals. Returns the number of rows inserted.
+    """
+    opts = model._meta
+    varying = [opts.get_field(name) for name in fields]
+    prototype = model(**(defaults or {}))
+    fixed = [field for field in opts.concrete_fields if field not in varying and not field.primary_key]
+    fixed_values = tuple(field.get_db_prep_save(getattr(prototype, field.attname), connection) for field in fixed)
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(opts.db_table),
+        ', '.join(quote(field.column) for field in varying + fixed),
+        ', '.join(['%s'] * (len(varying) + len(fixed))),
+    )
+    inserted = 0
+    with connection.cursor() as cursor:
+        for chunk in chunked(rows, chunk_size):
+            cursor.executemany(sql, [row + fixed_values for row in chunk])
+            inserted += len(chunk)
+    return inserted
+
+
+def defer_indexes(models):
+    """
+    Drop the secondary indexes and triggers (FTS) on the tables of
+    ``models`` and return a function that recreates them and rebuilds the
+    search indexes: building an index once from sorted rows is much cheaper
+    than updating it row by row. SQLite only; must run inside a transaction.
+    """
+    if connection.vendor != 'sqlite':
+        return lambda: None
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        # automatic indexes (inline UNIQUE constraints) have no sql and stay
+        cursor.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+            "AND sql IS NOT NULL AND tbl_name IN ({})".format(', '.join(['%s'] * len(tables))),
+            tables,
+        )
+        deferred = cursor.fetchall()
+        for kind, name, _ in deferred:
+            cursor.execute(f'DROP {kind.upper()} {connection.ops.quote_name(name)}')
+
+    def restore():
+        with connection.cursor() as cursor:
+            # indexes first: the FTS rebuild reads the tables
+            for _, _, sql in sorted(deferred, key=lambda item: item[0] != 'index'):
+                cursor.execute(sql)
+        for model in models:
+            if model in FTS_INDEXES:
+                rebuild_index(model)
+
+    return restore
+
+
+@contextmanager
+def page_cache(kib=CACHE_KIB):
+    """
+    Raise SQLite's page cache while loading and building indexes.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        previous = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA cache_size = {-kib}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {previous}')
+
+
+def materialize_feeds(user_ids, limit=None):
+    """
+    Fill the feeds of the users with ids in ``user_ids`` (a range, who only
+    follow each other) with the newest ``limit`` posts of the users they
+    follow, set-wise; ``rebuild_feed`` takes a query per user.
+    """
+    limit = FEED_MAX_ENTRIES if limit is None else limit
+    quote = connection.ops.quote_name
+    Follow = User.followers.through
+    tables = {
+        'feed': quote(FeedEntry._meta.db_table),
+        'follow': quote(Follow._meta.db_table),
+        'post': quote(Post._meta.db_table),
+    }
+    inserted = 0
+    with connection.cursor() as cursor:
+        # no feed needs more than the newest `limit` posts of an author
+        cursor.execute(
+            'CREATE TEMP TABLE synthetic_recent_posts AS '
+            'SELECT id, author_id, created_at, activity_score FROM ('
+            ' SELECT id, author_id, created_at, activity_score, ROW_NUMBER() OVER ('
+            '  PARTITION BY author_id ORDER BY created_at DESC, id DESC'
+            ' ) AS position FROM {post} WHERE author_id >= %s AND author_id < %s'
+            ') WHERE position <= %s'.format(**tables),
+            [user_ids.start, user_ids.stop, limit],
+        )
+        cursor.execute('CREATE INDEX synthetic_recent_posts_author ON synthetic_recent_posts (author_id)')
+        sql = (
+            'INSERT INTO {feed} (user_id, post_id, created_at, score) '
+            'SELECT user_id, post_id, created_at, score FROM ('
+            ' SELECT f.to_user_id AS user_id, p.id AS post_id, p.created_at AS created_at,'
+            ' p.activity_score AS score, ROW_NUMBER() OVER ('
+            '  PARTITION BY f.to_user_id ORDER BY p.created_at DESC, p.id DESC'
+            ' ) AS position'
+            ' FROM {follow} f JOIN synthetic_recent_posts p ON p.author_id = f.from_user_id'
+            ' WHERE f.to_user_id >= %s AND f.to_user_id < %s'
+            ') WHERE position <= %s'
+        ).format(**tables)
+        for start in range(user_ids.start, user_ids.stop, 1000):
+            cursor.execute(sql, [start, min(start + 1000, user_ids.stop), limit])
+            inserted += cursor.rowcount
+        cursor.execute('DROP TABLE synthetic_recent_posts')
+    return inserted
+
+
+def clear_data():
+    return delete_users(User.objects.filter(username__startswith=PREFIX))
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def text_pool(rng, words):
+    return [' '.join(rng.choices(WORDS, k=words)) for _ in range(TEXT_POOL_SIZE)]
+
+
+class Generator:
+    """
+    One generation run; ``run()`` returns {step: (rows, seconds)}.
+    """
+
+    models = [User, User.followers.through, Post, Comment]
+
+    def __init__(self, users, follows, posts, comments, seed=0, days=30, now=None,
+                 chunk_size=CHUNK_SIZE, feeds=False, stdout=None):
+        self.users = users
+        self.follows = follows
+        self.posts = users * posts
+        self.comments = int(self.posts * comments)
+        self.rng = random.Random(seed)
+        now = now or timezone.now()
+        self.start = now - timedelta(days=days)
+        # post and comment times are computed in Unix seconds
+        self.end_time = now.timestamp()
+        self.start_time = self.start.timestamp()
+        self.chunk_size = chunk_size
+        self.feeds = feeds
+        self.stdout = stdout
+        self.timings = {}
+
+    def step(self, name, function):
+        started = time.perf_counter()
+        rows = function()
+        elapsed = time.perf_counter() - started
+        self.timings[name] = (rows, elapsed)
+        if self.stdout is not None:
+            rate = rows / elapsed if elapsed else 0
+            self.stdout.write(f"{name}: {rows} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+        return rows
+
+    def run(self):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise ValueError(f"{PREFIX}* users already exist.")
+        # like loaddata: no foreign key lookups per row, one check at the end
+        with connection.constraint_checks_disabled(), page_cache(), transaction.atomic():
+            first_user, first_post = next_id(User), next_id(Post)
+            self.user_ids = range(first_user, first_user + self.users)
+            self.post_ids = range(first_post, first_post + self.posts)
+            # rank 1 is the most followed and the most active user
+            self.popularity = zipf_weights(self.users)
+            self.restore_indexes = defer_indexes(self.models)
+
+            self.step('users', self.insert_users)
+            self.follows_inserted = self.step('follows', self.insert_follows)
+            self.step('posts', self.insert_posts)
+            self.step('comments', self.insert_comments)
+            self.step('indexes', self.reindex)
+            self.step('counters', lambda: reconcile_counters(User.objects.filter(pk__gte=self.user_ids.start)))
+            self.step('comment stats', lambda: reconcile_comment_stats(
+                Post.objects.filter(pk__gte=self.post_ids.start)
+            ))
+            if self.feeds:
+                self.step('feeds', lambda: materialize_feeds(self.user_ids))
+        return self.timings
+
+    def reindex(self):
+        self.restore_indexes()
+        connection.check_constraints(table_names=[model._meta.db_table for model in self.models])
+        return self.users + self.follows_inserted + self.posts + self.comments
+
+    def insert_users(self):
+        names = ((user_id, f'{PREFIX}{user_id}') for user_id in self.user_ids)
+        rows = ((user_id, name, username_key(name)) for user_id, name in names)
+        defaults = {'password': make_password(PASSWORD), 'date_joined': self.start}  # hashed once
+        return bulk_insert(User, ['id', 'username', 'username_key'], rows, defaults, self.chunk_size)
+
+    def follow_edges(self):
+        ids, rng = self.user_ids, self.rng
+        for follower in ids:
+            # mean Pareto(1.5) is 3: `follows` edges per user on average
+            degree = min(len(ids) - 1, int(rng.paretovariate(1.5) * self.follows / 3))
+            for author in set(rng.choices(ids, cum_weights=self.popularity, k=degree)):
+                if author != follower:
+                    yield author, follower
+
+    def insert_follows(self):
+        Follow = User.followers.through
+        return bulk_insert(Follow, ['from_user', 'to_user'], self.follow_edges(), chunk_size=self.chunk_size)
+
+    def post_time(self, index):
+        return self.start_time + (self.end_time - self.start_time) * index / self.posts
+
+    def post_rows(self):
+        rng = self.rng
+        titles, contents = text_pool(rng, 4), text_pool(rng, 20)
+        for chunk in chunked(self.post_ids, self.chunk_size):
+            authors = rng.choices(self.user_ids, cum_weights=self.popularity, k=len(chunk))
+            for post_id, author, title, content in zip(
+                chunk, authors, rng.choices(titles, k=len(chunk)), rng.choices(contents, k=len(chunk))
+            ):
+                created = self.post_time(post_id - self.post_ids.start)
+                stamp = db_timestamp(created)
+                yield post_id, author, title, content, stamp, stamp, created / RANK_DECAY_SECONDS  # time_score()
+
+    def insert_posts(self):
+        fields = ['id', 'author', 'title', 'content', 'created_at', 'updated_at', 'activity_score']
+        return bulk_insert(Post, fields, self.post_rows(), chunk_size=self.chunk_size)
+
+    def comment_rows(self):
+        rng, count = self.rng, self.posts
+        contents = text_pool(rng, 12)
+        for chunk in chunked(range(self.comments), self.chunk_size):
+            authors = rng.choices(self.user_ids, cum_weights=self.popularity, k=len(chunk))
+            for author, content in zip(authors, rng.choices(contents, k=len(chunk))):
+                # skewed towards the newest posts
+                index = count - 1 - int(count * rng.random() ** 3)
+                posted = self.post_time(index)
+                stamp = db_timestamp(posted + (self.end_time - posted) * rng.random())
+                yield self.post_ids[index], author, content, stamp, stamp
+
+    def insert_comments(self):
+        fields = ['post', 'author', 'content', 'created_at', 'updated_at']
+        return bulk_insert(Comment, fields, self.comment_rows(), chunk_size=self.chunk_size)
@@ -1,3 +1,946 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import random
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.authentication import token_cache
+from accounts.counters import reconcile_counters
+from accounts.graph import follow_graph
+from social_media_api.db_router import PrimaryReplicaRouter, ReadYourWritesMiddleware
+from .counters import reconcile_comment_stats
+from .events import Broker, UnixSocketTransport, broker, comment_topic, encode_event
+from .loadtest import clear_population, compare, parse_mix, report, run_load, seed_population
+from .longpoll import feed_waiters, wait_for_entries
+from .feed import fan_out_post, feed_queryset, rebuild_feed, trim_feeds
+from .models import Post, Comment, FeedEntry
+from .query_plans import api_views, audit, index_migrations, plan_issues
+from .ranking import rescore_posts
+from .representations import representation_cache
+from .search import search
+from .serializers import COMMENT_PREVIEW_SIZE, PostSerializer, with_comments
+from .synthetic import PASSWORD as SYNTHETIC_PASSWORD, PREFIX as SYNTHETIC_PREFIX, Generator, clear_data
+
+User = get_user_model()
+
+
+class FeedAPITestCase(APITestCase):
+    """
+    Materialized home feed: fan-out on create, backfill/prune on follow.
+    """
+
+    def setUp(self):
+        follow_graph.clear()
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.stranger = User.objects.create_user(username="stranger", password="testpass123")
+        self.feed_url = reverse("feed")
+
+    def authenticate(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def feed_titles(self):
+        self.authenticate(self.reader)
+        response = self.client.get(self.feed_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["title"] for post in response.data["results"]]
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        self.reader.following.add(self.author)
+        self.authenticate(self.author)
+        response = self.client.post(reverse("post-list"), {"title": "Hello", "content": "World"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.feed_titles(), ["Hello"])
+        self.assertFalse(FeedEntry.objects.filter(user=self.stranger).exists())
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Post.objects.create(author=self.author, title="Old", content="post")
+        self.assertEqual(self.feed_titles(), [])
+
+        self.reader.following.add(self.author)
+        self.assertEqual(self.feed_titles(), ["Old"])
+
+        self.reader.following.remove(self.author)
+        self.assertEqual(self.feed_titles(), [])
+
+    def test_feed_is_trimmed_to_newest_entries(self):
+        self.reader.following.add(self.author)
+        posts = [
+            Post.objects.create(author=self.author, title=f"Post {i}", content="x")
+            for i in range(5)
+        ]
+        for post in posts:
+            FeedEntry.objects.get_or_create(user=self.reader, post=post, created_at=post.created_at)
+
+        trim_feeds([self.reader.id], limit=3)
+
+        kept = set(FeedEntry.objects.filter(user=self.reader).values_list("post_id", flat=True))
+        self.assertEqual(kept, {post.id for post in posts[2:]})
+
+
+class FeedDeltaTestCase(APITestCase):
+    """
+    ?since= deltas of the home feed, and the async long-poll.
+    """
+
+    def setUp(self):
+        follow_graph.clear()
+        self.reader = User.objects.create(username="reader")
+        self.author = User.objects.create(username="author")
+        self.reader.following.add(self.author)
+        self.publish("Old")
+        self.auth = {"Authorization": f"Token {Token.objects.create(user=self.reader).key}"}
+
+    def publish(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            fan_out_post(Post.objects.create(author=self.author, title=title, content="x"))
+
+    def titles(self, response):
+        return [post["title"] for post in response.json()["results"]]
+
+    def test_since_returns_only_newer_posts(self):
+        first = self.client.get(reverse("feed"), headers=self.auth).json()
+        self.assertEqual(first["since"], FeedEntry.objects.get(user=self.reader).id)
+
+        self.publish("New 1")
+        self.publish("New 2")
+        response = self.client.get(reverse("feed"), {"since": first["since"], "page_size": 1}, headers=self.auth)
+        self.assertEqual(self.titles(response), ["New 1"])
+        self.assertTrue(response.json()["has_more"])
+
+        response = self.client.get(reverse("feed"), {"since": response.json()["since"]}, headers=self.auth)
+        self.assertEqual(self.titles(response), ["New 2"])
+        self.assertFalse(response.json()["has_more"])
+
+        since = response.json()["since"]
+        response = self.client.get(reverse("feed"), {"since": since}, headers=self.auth)
+        self.assertEqual(response.json(), {"since": since, "has_more": False, "results": []})
+
+        invalid = self.client.get(reverse("feed"), {"since": "-1"}, headers=self.auth)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_long_poll_expires_with_an_empty_delta(self):
+        since = (await self.async_client.get(reverse("async-feed"), headers=self.auth)).json()["since"]
+        response = await self.async_client.get(reverse("async-feed"), {"since": since, "wait": 0.05}, headers=self.auth)
+        self.assertEqual(response.json(), {"since": since, "has_more": False, "results": []})
+
+    async def test_fan_out_wakes_waiting_requests(self):
+        arrived = []
+
+        async def fetch():
+            return list(arrived)
+
+        poll = asyncio.ensure_future(wait_for_entries(self.reader.pk, fetch, 10))
+        await asyncio.sleep(0.05)
+        self.assertFalse(poll.done())
+
+        arrived.append("New")
+        with mock.patch("posts.feed.feed_waiters.notify", wraps=feed_waiters.notify) as notify:
+            await sync_to_async(self.publish)("New")
+        notify.assert_called_once_with([self.reader.pk])
+        self.assertEqual(await asyncio.wait_for(poll, 1), ["New"])
+
+
+class KeysetPaginationTestCase(APITestCase):
+    """
+    Cursor pagination on (created_at, id) with a page-number fallback.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.posts = [
+            Post.objects.create(author=self.author, title=f"Post {i}", content="x")
+            for i in range(25)
+        ]
+        # identical timestamps force the id tie-breaker to do its job
+        Post.objects.filter(id__in=[p.id for p in self.posts[10:15]]).update(
+            created_at=self.posts[10].created_at
+        )
+        self.list_url = reverse("post-list")
+
+    def collect(self, url, key="next"):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            ids.extend(post["id"] for post in response.data["results"])
+            url = response.data[key]
+            pages += 1
+        return ids, pages
+
+    def test_cursor_walks_every_post_once_in_order(self):
+        ids, pages = self.collect(self.list_url + "?page_size=7")
+        expected = list(
+            Post.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 4)
+
+    def test_cursor_honours_ordering_param_and_previous_links(self):
+        forward, _ = self.collect(self.list_url + "?ordering=created_at&page_size=10")
+        self.assertEqual(
+            forward,
+            list(Post.objects.order_by("created_at", "id").values_list("id", flat=True)),
+        )
+
+        first = self.client.get(self.list_url + "?ordering=created_at&page_size=10")
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+
+    def test_page_number_mode_is_still_available(self):
+        response = self.client.get(self.list_url + "?page=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.list_url + "?cursor=bogus")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CommentPreviewTestCase(APITestCase):
+    """
+    Posts embed a bounded comment preview fetched for the whole page at once.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.list_url = reverse("post-list")
+
+    def make_posts(self, count, comments_each):
+        for i in range(count):
+            post = Post.objects.create(author=self.author, title=f"Post {i}", content="x")
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.author, content=f"c{n}") for n in range(comments_each)
+            )
+        # bulk_create skips the signals that maintain comment_count
+        reconcile_comment_stats()
+
+    def test_preview_is_bounded_and_counted(self):
+        self.make_posts(2, COMMENT_PREVIEW_SIZE + 4)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for post in response.data["results"]:
+            self.assertEqual(post["comment_count"], COMMENT_PREVIEW_SIZE + 4)
+            self.assertEqual(
+                [c["content"] for c in post["comments"]],
+                [f"c{n}" for n in range(4, COMMENT_PREVIEW_SIZE + 4)],
+            )
+
+    def test_query_count_does_not_grow_with_page_or_comments(self):
+        self.make_posts(2, 1)
+        # ETag validators (page rows + comment aggregate), then the page
+        # itself and one windowed comment query
+        with self.assertNumQueries(4):
+            self.client.get(self.list_url)
+        self.make_posts(8, 20)
+        with self.assertNumQueries(4):
+            self.client.get(self.list_url)
+
+    def test_all_comments_mode(self):
+        self.make_posts(1, COMMENT_PREVIEW_SIZE + 2)
+        response = self.client.get(self.list_url + "?comments=all")
+        self.assertEqual(len(response.data["results"][0]["comments"]), COMMENT_PREVIEW_SIZE + 2)
+
+
+class FullTextSearchTestCase(APITestCase):
+    """
+    ?search= goes through the FTS5 index, kept current by triggers.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.list_url = reverse("post-list")
+
+    def search(self, url, term):
+        response = self.client.get(url, {"search": term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_search_ranks_matches_and_follows_updates(self):
+        weak = Post.objects.create(author=self.author, title="Gardening", content="tomatoes and django")
+        strong = Post.objects.create(author=self.author, title="Django tips", content="django django")
+        Post.objects.create(author=self.author, title="Cooking", content="pasta")
+
+        self.assertEqual(self.search(self.list_url, "djan"), [strong.id, weak.id])
+
+        weak.content = "tomatoes only"
+        weak.save()
+        self.assertEqual(self.search(self.list_url, "django"), [strong.id])
+
+        strong.delete()
+        self.assertEqual(self.search(self.list_url, "django"), [])
+
+    def test_comment_search_and_hostile_input(self):
+        post = Post.objects.create(author=self.author, title="t", content="c")
+        comment = Comment.objects.create(post=post, author=self.author, content='say "hello" world')
+        comments_url = reverse("comment-list")
+
+        self.assertEqual(self.search(comments_url, "hello"), [comment.id])
+        self.assertEqual(self.search(comments_url, '"hello OR NEAR('), [])
+        self.assertEqual(self.search(comments_url, "!!!"), [])
+
+
+class ConditionalGetTestCase(APITestCase):
+    """
+    ETag / Last-Modified validators and 304 responses.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username="author")
+        self.post = Post.objects.create(author=self.author, title="Hello", content="x")
+        self.list_url = reverse("post-list")
+        self.detail_url = reverse("post-detail", args=[self.post.id])
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(2):  # validator row(s) + embedded comment aggregate
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_unchanged_list_and_detail_return_304(self):
+        for url in (self.list_url, self.detail_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("Last-Modified", response)
+            self.assertNotModified(url, response["ETag"])
+
+    def test_edits_and_new_comments_change_the_etag(self):
+        for url in (self.list_url, self.detail_url):
+            etag = self.client.get(url)["ETag"]
+            Comment.objects.create(post=self.post, author=self.author, content="new")
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            etag = response["ETag"]
+            self.post.title = "Edited"
+            self.post.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_comment_detail_uses_updated_at(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content="c")
+        url = reverse("comment-detail", args=[comment.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_non_numeric_pk_is_not_found(self):
+        for name in ("post-detail", "comment-detail"):
+            response = self.client.get(reverse(name, args=["abc"]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncReadViewsTestCase(APITestCase):
+    """
+    The /api/async/ read endpoints return the same payloads as the DRF views.
+    """
+
+    def setUp(self):
+        follow_graph.clear()
+        self.reader = User.objects.create(username="reader")
+        self.author = User.objects.create(username="author")
+        self.reader.following.add(self.author)
+        self.token = Token.objects.create(user=self.reader)
+        for i in range(3):
+            post = Post.objects.create(author=self.author, title=f"Post {i}", content="x")
+            Comment.objects.create(post=post, author=self.reader, content=f"c{i}")
+            FeedEntry.objects.get_or_create(user=self.reader, post=post, created_at=post.created_at)
+        self.auth = {"Authorization": f"Token {self.token.key}"}
+
+    async def test_async_lists_match_sync_payloads(self):
+        for sync_name, async_name in (
+            ("post-list", "async-post-list"),
+            ("comment-list", "async-comment-list"),
+            ("feed", "async-feed"),
+        ):
+            sync = await self.async_client.get(reverse(sync_name), {"page_size": 2}, headers=self.auth)
+            response = await self.async_client.get(reverse(async_name), {"page_size": 2}, headers=self.auth)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()["results"], sync.json()["results"])
+            self.assertIsNotNone(response.json()["next"])
+
+    async def test_async_detail_and_errors(self):
+        post = await Post.objects.afirst()
+        response = await self.async_client.get(reverse("async-post-detail", args=[post.id]))
+        self.assertEqual(response.json()["title"], post.title)
+
+        missing = await self.async_client.get(reverse("async-post-detail", args=[999999]))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+        anonymous = await self.async_client.get(reverse("async-feed"))
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_comments_of_one_post(self):
+        post = await Post.objects.afirst()
+        sync = await self.async_client.get(reverse("comment-list"), {"post": post.id})
+        response = await self.async_client.get(reverse("async-comment-list"), {"post": post.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertEqual(response.json()["results"], sync.json()["results"])
+
+        missing = await self.async_client.get(reverse("async-comment-list"), {"post": 999999})
+        self.assertEqual(missing.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("post", missing.json()["detail"])
+
+
+class EventStreamTestCase(APITestCase):
+    """
+    Server-sent events for followed authors' posts and comments on own posts.
+    """
+
+    def setUp(self):
+        follow_graph.clear()
+        self.reader = User.objects.create(username="reader")
+        self.author = User.objects.create(username="author")
+        self.stranger = User.objects.create(username="stranger")
+        self.reader.following.add(self.author)
+        self.own_post = Post.objects.create(author=self.reader, title="Mine", content="x")
+        self.auth = {"Authorization": f"Token {Token.objects.create(user=self.reader).key}"}
+
+    def create(self, user, name, data):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(name), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def parse(self, chunk):
+        event, data = chunk.decode().strip().split("\n")
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_stream_delivers_followed_posts_and_comments(self):
+        response = await self.async_client.get(reverse("async-events"), headers=self.auth)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry: "))
+
+        create = sync_to_async(self.create)
+        await create(self.stranger, "post-list", {"title": "Unfollowed", "content": "x"})
+        await create(self.author, "post-list", {"title": "Followed", "content": "x"})
+        event, data = self.parse(await asyncio.wait_for(anext(stream), 2))
+        self.assertEqual((event, data["title"]), ("post", "Followed"))
+
+        await create(self.stranger, "comment-list", {"post": self.own_post.pk, "content": "Nice"})
+        event, data = self.parse(await asyncio.wait_for(anext(stream), 2))
+        self.assertEqual((event, data["content"]), ("comment", "Nice"))
+
+        # the server closes the response when the client goes away
+        response.close()
+        self.assertNotIn(comment_topic(self.reader.pk), broker._topics)
+
+        anonymous = await self.async_client.get(reverse("async-events"))
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_slow_subscriber_overflows(self):
+        slow = Broker(max_pending=2)
+        with slow.subscribe(["topic"]) as subscription:
+            for i in range(3):
+                slow.publish("topic", "post", {"id": i})
+            await asyncio.sleep(0)
+            frames = await subscription.get(1)
+        self.assertEqual(len(frames), 2)
+        self.assertTrue(subscription.overflowed)
+
+    async def test_unix_socket_transport_carries_events_between_brokers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)  # after the transports close
+        receiver = Broker(UnixSocketTransport(directory))
+        sender = Broker(UnixSocketTransport(directory))
+        self.addCleanup(receiver.transport.close)
+        self.addCleanup(sender.transport.close)
+
+        with receiver.subscribe(["topic"]) as subscription:
+            sender.publish("topic", "post", {"id": 1})
+            frames = await subscription.get(2)
+        self.assertEqual(frames, [encode_event("post", {"id": 1})])
+
+
+class ExportTestCase(APITestCase):
+    """
+    NDJSON export streams a user's posts and comments in the API layout.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="writer", password="testpass123")
+        self.other = User.objects.create_user(username="other", password="testpass123")
+        self.post = Post.objects.create(author=self.user, title="Mine", content="body")
+        Comment.objects.create(post=self.post, author=self.user, content="self reply")
+        Comment.objects.create(post=self.post, author=self.other, content="not exported")
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_streams_ndjson_with_serializer_layout(self):
+        response = self.client.get(reverse("export"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["type"] for row in rows], ["post", "comment"])
+        post = self.client.get(reverse("post-detail", args=[self.post.id])).data
+        self.assertEqual(rows[0], {"type": "post", **{k: v for k, v in post.items() if k != "comments"}})
+        self.assertEqual(rows[1]["content"], "self reply")
+
+    def test_gzip_and_permissions(self):
+        response = self.client.get(reverse("export"), {"compress": "gzip"})
+        lines = gzip.decompress(b"".join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 2)
+
+        response = self.client.get(reverse("export"), {"user": self.other.id})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        token_cache.clear()
+        response = self.client.get(reverse("export"), {"user": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("export"), {"user": self.other.id})
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 1)
+
+    async def test_asgi_streams_from_an_async_iterator(self):
+        token = await Token.objects.aget(user=self.user)
+        response = await self.async_client.get(reverse("export"), headers={"Authorization": f"Token {token.key}"})
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)["type"] for line in body.splitlines()], ["post", "comment"])
+
+    def test_management_command(self):
+        out = io.StringIO()
+        call_command("export_activity", "writer", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTestCase(APITestCase):
+    """
+    Opted-in safe reads go to a replica until the client writes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+        def make_view(replica_reads):
+            def view(request):
+                self.used = self.router.db_for_read(Post), self.router.db_for_read(Token)
+                if request.method == "POST":
+                    self.router.db_for_write(Post)
+                return HttpResponse()
+            view.view_class = type("View", (), {"replica_reads": replica_reads})
+            return view
+
+        self.replica_view = make_view(True)
+        self.primary_view = make_view(False)
+
+    def call(self, view, method="get", auth="Token abc"):
+        request = getattr(self.factory, method)("/", HTTP_AUTHORIZATION=auth)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReadYourWritesMiddleware(get_response)
+        middleware(request)
+        return self.used
+
+    def test_reads_are_routed_by_view_and_method(self):
+        self.assertEqual(self.call(self.replica_view), ("replica1", "default"))
+        self.assertEqual(self.call(self.primary_view), ("default", "default"))
+        self.assertEqual(self.router.db_for_read(Post), "default")  # outside a request
+
+    def test_client_sticks_to_primary_after_writing(self):
+        self.assertEqual(self.call(self.replica_view, "post"), ("default", "default"))
+        self.assertEqual(self.call(self.replica_view), ("default", "default"))
+        self.assertEqual(self.call(self.replica_view, auth="Token other"), ("replica1", "default"))
+
+
+class CommentStatsTestCase(APITestCase):
+    """
+    Post.comment_count / last_comment_at follow comment creates and deletes.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.commenter = User.objects.create_user(username="commenter", password="testpass123")
+        self.post = Post.objects.create(author=self.author, title="Busy", content="x")
+        self.quiet = Post.objects.create(author=self.author, title="Quiet", content="x")
+        token, _ = Token.objects.get_or_create(user=self.commenter)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def comment(self, content):
+        response = self.client.post(reverse("comment-list"), {"post": self.post.id, "content": content})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Comment.objects.get(pk=response.data["id"])
+
+    def test_create_delete_and_cascade(self):
+        first = self.comment("one")
+        second = self.comment("two")
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.comment_count, self.post.last_comment_at), (2, second.created_at))
+
+        self.client.delete(reverse("comment-detail", args=[second.id]))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.comment_count, self.post.last_comment_at), (1, first.created_at))
+
+        self.commenter.delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.comment_count, self.post.last_comment_at), (0, None))
+
+    def test_ordering_by_activity_pages_through_nulls(self):
+        self.comment("one")
+        for ordering in ("-comment_count", "-last_comment_at", "last_comment_at"):
+            response = self.client.get(reverse("post-list"), {"ordering": ordering, "page_size": 1})
+            titles = [response.data["results"][0]["title"]]
+            response = self.client.get(response.data["next"])
+            titles.append(response.data["results"][0]["title"])
+            self.assertIsNone(response.data["next"])
+            expected = ["Quiet", "Busy"] if ordering == "last_comment_at" else ["Busy", "Quiet"]
+            self.assertEqual(titles, expected, ordering)
+
+    def test_reconcile_repairs_drift(self):
+        self.comment("one")
+        Post.objects.filter(pk=self.post.pk).update(comment_count=9, last_comment_at=None)
+        self.assertEqual(reconcile_comment_stats(), 1)
+        self.assertEqual(reconcile_comment_stats(), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+
+class RankedFeedTestCase(APITestCase):
+    """
+    ?rank=top orders the feed by scores maintained on post and comment writes.
+    """
+
+    def setUp(self):
+        follow_graph.clear()
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.friend = User.objects.create_user(username="friend", password="testpass123")
+        self.other = User.objects.create_user(username="other", password="testpass123")
+        self.reader.following.add(self.friend, self.other)
+        self.older = Post.objects.create(author=self.friend, title="Older", content="x")
+        Post.objects.filter(pk=self.older.pk).update(created_at=timezone.now() - timedelta(hours=6))
+        rescore_posts()
+        rebuild_feed(self.reader.id)
+        self.newer = Post.objects.create(author=self.other, title="Newer", content="x")
+        fan_out_post(self.newer)
+        token, _ = Token.objects.get_or_create(user=self.reader)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def titles(self, **params):
+        response = self.client.get(reverse("feed"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["title"] for post in response.data["results"]]
+
+    def test_affinity_and_comments_lift_older_post(self):
+        self.assertEqual(self.titles(rank="top"), ["Newer", "Older"])
+        for n in range(2):
+            self.client.post(reverse("comment-list"), {"post": self.older.id, "content": f"reply {n}"})
+        self.assertEqual(self.titles(rank="top"), ["Older", "Newer"])
+        self.assertEqual(self.titles(), ["Newer", "Older"])
+        self.assertEqual(self.titles(rank="top", page_size=1), ["Older"])
+
+    def test_incremental_scores_match_full_rescore(self):
+        self.client.post(reverse("comment-list"), {"post": self.older.id, "content": "reply"})
+        incremental = dict(FeedEntry.objects.filter(user=self.reader).values_list("post_id", "score"))
+        rescore_posts()
+        rebuild_feed(self.reader.id)
+        rebuilt = dict(FeedEntry.objects.filter(user=self.reader).values_list("post_id", "score"))
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for post_id, score in rebuilt.items():
+            self.assertAlmostEqual(incremental[post_id], score, places=6)
+
+    def test_ranked_page_is_an_index_scan(self):
+        plan = feed_queryset(self.reader, ranked=True)[:10].explain()
+        self.assertIn("feed_user_score_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class RepresentationCacheTestCase(APITestCase):
+    """
+    Post/comment representations are reused until the row changes.
+    """
+
+    def setUp(self):
+        representation_cache.clear()
+        self.author = User.objects.create_user(username="author", password="testpass123")
+        self.posts = [Post.objects.create(author=self.author, title=f"Post {i}", content="x") for i in range(3)]
+
+    def serialize(self):
+        return PostSerializer(with_comments(Post.objects.select_related("author")), many=True).data
+
+    def test_cached_page_matches_fresh_serialization(self):
+        fresh = self.serialize()
+        hits = representation_cache.hits
+        self.assertEqual(self.serialize(), fresh)
+        self.assertEqual(representation_cache.hits - hits, 3)
+
+    def test_changes_are_never_served_stale(self):
+        self.serialize()
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.author, content="hello")
+        # another process editing the row: no signal here, the stamp changes
+        Post.objects.filter(pk=post.pk).update(title="Edited", updated_at=timezone.now())
+        self.author.username = "renamed"
+        self.author.save()
+
+        data = {item["id"]: item for item in self.serialize()}
+        self.assertEqual(data[post.id]["title"], "Edited")
+        self.assertEqual(data[post.id]["comment_count"], 1)
+        self.assertEqual([c["content"] for c in data[post.id]["comments"]], ["hello"])
+        self.assertEqual({item["author"] for item in data.values()}, {"renamed"})
+
+    def test_delete_invalidates(self):
+        self.serialize()
+        entries = representation_cache.stats()["entries"]
+        self.posts[0].delete()
+        self.assertEqual(representation_cache.stats()["entries"], entries - 1)
+
+
+class CommentBatchTestCase(APITestCase):
+    """
+    POST /api/comments/batch/ validates and inserts many comments at once.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="writer", password="testpass123")
+        self.post = Post.objects.create(author=self.user, title="Target", content="x")
+        self.url = reverse("comment-batch")
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def batch(self, comments, **extra):
+        return self.client.post(self.url, {"comments": comments, **extra}, format="json")
+
+    def test_partial_failure_creates_valid_items(self):
+        response = self.batch([
+            {"post": self.post.id, "content": "first"},
+            {"post": 999999, "content": "orphan"},
+            {"post": self.post.id, "content": ""},
+            {"post": self.post.id, "content": "second"},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["created", "invalid", "invalid", "created"],
+        )
+        self.assertIn("post", response.data["results"][1]["errors"])
+        self.assertEqual(response.data["results"][3]["comment"]["author"], "writer")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.post.last_comment_at, Comment.objects.latest("created_at").created_at)
+
+    def test_atomic_batch_is_all_or_nothing(self):
+        response = self.batch(
+            [{"post": self.post.id, "content": "ok"}, {"post": 999999, "content": "orphan"}],
+            atomic=True,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["skipped", "invalid"])
+        self.assertFalse(Comment.objects.exists())
+
+        response = self.batch([{"post": self.post.id, "content": "ok"}], atomic=True)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        self.batch([{"post": self.post.id, "content": "warm up"}])
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            self.batch([{"post": self.post.id, "content": f"c{n}"} for n in range(2)])
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            self.batch([{"post": self.post.id, "content": f"c{n}"} for n in range(50)])
+        self.assertEqual(len(small), len(large))
+
+    def test_query_count_does_not_grow_with_posts_and_authors(self):
+        posts = []
+        for n in range(12):
+            author = User.objects.create(username=f"author{n}")
+            self.user.following.add(author)
+            posts.append(Post.objects.create(author=author, title=f"Post {n}", content="x"))
+        rebuild_feed(self.user.id)
+        self.batch([{"post": posts[0].id, "content": "warm up"}])
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.batch([{"post": post.id, "content": "a"} for post in posts[:2]])
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.batch([{"post": post.id, "content": "b"} for post in posts for _ in range(2)])
+        self.assertEqual(len(few), len(many))
+
+        self.assertEqual(reconcile_comment_stats(), 0)
+        incremental = dict(FeedEntry.objects.filter(user=self.user).values_list("post_id", "score"))
+        rescore_posts()
+        rebuild_feed(self.user.id)
+        rebuilt = dict(FeedEntry.objects.filter(user=self.user).values_list("post_id", "score"))
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for post_id, score in rebuilt.items():
+            self.assertAlmostEqual(incremental[post_id], score, places=6)
+
+
+class QueryPlanAuditTestCase(APITestCase):
+    """
+    audit_query_plans flags sorting and scanning plans and proposes indexes.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="auditor", password="testpass123")
+        post = Post.objects.create(author=self.user, title="Audited", content="plans")
+        Comment.objects.create(post=post, author=self.user, content="hello")
+
+    def views(self, route):
+        return [view for view in api_views() if view[0] == route]
+
+    def test_plan_issues(self):
+        sql = 'SELECT * FROM "t" WHERE "t"."a" = 1 ORDER BY "t"."b" ASC'
+        self.assertEqual(
+            plan_issues(["SCAN t", "USE TEMP B-TREE FOR ORDER BY"], sql),
+            [("SCAN t", "t"), ("USE TEMP B-TREE FOR ORDER BY", None)],
+        )
+        # unfiltered rowid-order scans and index scans are what was asked for
+        self.assertEqual(plan_issues(["SCAN t"], 'SELECT * FROM "t" ORDER BY "t"."id" ASC LIMIT 1'), [])
+        self.assertEqual(plan_issues(["SCAN t USING INDEX t_b_idx"], sql), [])
+
+    def test_existing_indexes_are_not_proposed(self):
+        _, proposals = audit(self.user, self.views("/api/posts/"))
+        proposed = {(p["model"], tuple(p["fields"])) for p in proposals}
+        self.assertNotIn((Post, ("created_at",)), proposed)
+        self.assertNotIn((Comment, ("post", "created_at")), proposed)
+        self.assertIn((Post, ("updated_at",)), proposed)
+
+    def test_proposals_become_migrations(self):
+        findings, proposals = audit(self.user, self.views("/api/comments/"))
+        self.assertTrue(any(f["params"].get("ordering") == "updated_at" for f in findings))
+        fields = {tuple(p["fields"]) for p in proposals}
+        self.assertIn(("post", "updated_at"), fields)
+
+        migration = index_migrations(proposals)["posts"]
+        self.assertEqual(migration.dependencies, [("posts", "0006_plan_audit_indexes")])
+        self.assertTrue(migration.name.startswith("0007_"))
+        self.assertEqual({tuple(op.index.fields) for op in migration.operations}, fields)
+
+
+class LoadTestHarnessTestCase(TransactionTestCase):
+    """
+    manage.py loadtest drives the in-process app and reports per endpoint.
+    """
+
+    def test_read_and_login_mix(self):
+        population = seed_population(users=12, follows=4, posts=2, rng=random.Random(1))
+        self.assertTrue(any(population.following.values()))
+        self.assertTrue(FeedEntry.objects.exists())
+
+        mix = parse_mix("feed=3,login=1,feed_top=0,posts=0,post=0,comment=0,follow=0,unfollow=0")
+        recorder, elapsed, counted = run_load("wsgi", population, mix, clients=2, duration=0.5)
+        result = report(recorder, elapsed, counted, {"clients": 2})
+
+        feed = result["endpoints"]["GET /api/feed/"]
+        self.assertGreater(feed["requests"], 0)
+        self.assertEqual(feed["errors"] + feed["rejected"], 0)
+        self.assertGreater(feed["queries_mean"], 0)
+        self.assertLessEqual(feed["p50_ms"], feed["p99_ms"])
+        login = result["endpoints"].get("POST /api/accounts/login/")
+        if login is not None:
+            self.assertEqual(login["rejected"], 0)
+
+        baseline = json.loads(json.dumps(result))
+        baseline["endpoints"]["GET /api/feed/"]["p95_ms"] = feed["p95_ms"] * 2
+        changes = {(label, metric): change for label, metric, _, _, change in compare(result, baseline)}
+        self.assertAlmostEqual(changes[("GET /api/feed/", "p95_ms")], -0.5)
+
+    def test_clear_population_deletes_set_wise(self):
+        seed_population(users=12, follows=4, posts=2, rng=random.Random(1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(clear_population(), 12)
+        self.assertLess(len(queries), 30)
+        self.assertFalse(User.objects.exists() or Post.objects.exists() or FeedEntry.objects.exists())
+
+    def test_parse_mix_rejects_unknown_operations(self):
+        with self.assertRaises(ValueError):
+            parse_mix("teleport=5")
+
+
+class SyntheticDataTestCase(APITestCase):
+    """
+    manage.py generate_data bulk-inserts consistent, reproducible data.
+    """
+
+    def snapshot(self):
+        Follow = User.followers.through
+        first = User.objects.filter(username__startswith=SYNTHETIC_PREFIX).order_by('pk').first().pk
+        return (
+            sorted((edge.from_user_id - first, edge.to_user_id - first) for edge in Follow.objects.all()),
+            list(Post.objects.order_by('pk').values_list('title', 'content', 'activity_score')),
+            list(Comment.objects.order_by('pk').values_list('content', flat=True)),
+        )
+
+    def test_generate(self):
+        now = timezone.now()
+        Generator(30, follows=4, posts=3, comments=2, seed=7, now=now, chunk_size=16, feeds=True).run()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 90)
+        self.assertEqual(Comment.objects.count(), 180)
+        self.assertEqual(reconcile_counters(), 0)
+        self.assertEqual(reconcile_comment_stats(), 0)
+
+        user = User.objects.order_by('-followers_count').first()
+        self.assertTrue(user.check_password(SYNTHETIC_PASSWORD))
+        self.assertEqual(user.username_key, user.username)
+        post = Post.objects.order_by('-created_at').first()
+        self.assertLessEqual(post.created_at, now)
+        self.assertTrue(search(Post.objects.all(), post.title.split()).filter(pk=post.pk).exists())
+
+        viewer = User.objects.filter(following_count__gt=0).first()
+        feed = list(feed_queryset(viewer).values_list('id', flat=True))
+        rebuild_feed(viewer.id)
+        self.assertEqual(feed, list(feed_queryset(viewer).values_list('id', flat=True)))
+
+        before = self.snapshot()
+        with self.assertRaises(ValueError):
+            Generator(30, follows=4, posts=3, comments=2, seed=7, now=now).run()
+        clear_data()
+        Generator(30, follows=4, posts=3, comments=2, seed=7, now=now, chunk_size=16).run()
+        self.assertEqual(self.snapshot(), before)
+
+    def test_clear_deletes_set_wise_and_repairs_survivors(self):
+        Generator(30, follows=4, posts=3, comments=2, seed=7).run()
+        real = User.objects.create(username="real")
+        kept = Post.objects.create(author=real, title="kept", content="survivor")
+        synthetic = User.objects.filter(username__startswith=SYNTHETIC_PREFIX).first()
+        real.following.add(synthetic)
+        synthetic.following.add(real)
+        Comment.objects.create(post=kept, author=synthetic, content="gone")
+
+        with CaptureQueriesContext(connection) as queries:
+            clear_data()
+        self.assertLess(len(queries), 30)
+        self.assertEqual(list(User.objects.all()), [real])
+        self.assertEqual(list(Post.objects.all()), [kept])
+        real.refresh_from_db()
+        kept.refresh_from_db()
+        self.assertEqual((real.followers_count, real.following_count, real.posts_count), (0, 0, 1))
+        self.assertEqual((kept.comment_count, kept.last_comment_at), (0, None))
+        self.assertEqual(search(Post.objects.all(), ["survivor"]).count(), 1)
+        with connection.cursor() as cursor:
+            for fts in ("posts_post_fts", "posts_comment_fts"):
+                # raises if the index has rows its content table lost
+                cursor.execute(f"INSERT INTO {fts}({fts}, rank) VALUES ('integrity-check', 1)")
@@ -1,7 +1,10 @@
 # posts/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, FeedView
+from .views import PostViewSet, CommentViewSet, FeedView, ExportView
+from .async_views import (
+    AsyncPostListView, AsyncPostDetailView, AsyncCommentListView, AsyncFeedView, AsyncEventStreamView,
+)
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
@@ -10,4 +13,12 @@ router.register(r'comments', CommentViewSet, basename='comment')
 urlpatterns = [
     path('', include(router.urls)),
     path('feed/', FeedView.as_view(), name='feed'),
+    path('export/', ExportView.as_view(), name='export'),
+
+    # async read-only variants for ASGI deployments (see posts/async_views.py)
+    path('async/posts/', AsyncPostListView.as_view(), name='async-post-list'),
+    path('async/posts/<int:pk>/', AsyncPostDetailView.as_view(), name='async-post-detail'),
+    path('async/comments/', AsyncCommentListView.as_view(), name='async-comment-list'),
+    path('async/feed/', AsyncFeedView.as_view(), name='async-feed'),
+    path('async/events/', AsyncEventStreamView.as_view(), name='async-events'),
 ]
@@ -1,75 +1,150 @@
 # posts/views.py
-from rest_framework import viewsets, permissions, filters, generics
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.authentication import TokenAuthentication
+from rest_framework import viewsets, permissions, filters, generics, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from accounts.authentication import CachedTokenAuthentication
 
 from .models import Post, Comment
-from .serializers import PostSerializer, CommentSerializer
+from .serializers import PostSerializer, CommentSerializer, CommentBatchSerializer, with_comments
 from .permissions import IsOwnerOrReadOnly
+from .pagination import CursorOrPageNumberPagination, KeysetPagination
+from .feed import feed_queryset, fan_out_post
+from .events import publish_comment, publish_post
+from .longpoll import delta_response, is_first_page, parse_since, watermark
+from .search import FullTextSearchFilter
+from .conditional import ConditionalGetMixin
+from .export import aexport_stream, export_stream
+from .comments import create_comments, CREATED
 
 User = get_user_model()
 
 
-# ---------------------------------------------------------------------
-# 🔹 STANDARD PAGINATION
-# ---------------------------------------------------------------------
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
 # ---------------------------------------------------------------------
 # 🔹 POST VIEWSET
 # ---------------------------------------------------------------------
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for posts.
 
     - List/Retrieve: Open to all users (IsAuthenticatedOrReadOnly)
     - Create: Authenticated users only (author is auto-assigned)
     - Update/Delete: Only post author (IsOwnerOrReadOnly)
+
+    Each post embeds its latest comments plus the stored ``comment_count``
+    and ``last_comment_at``; pass ?comments=all to embed every comment.
+    ?ordering=-comment_count lists the most discussed posts first.
+
+    GET responses carry ETag/Last-Modified and answer 304 when unchanged
+    (see posts/conditional.py).
     """
     queryset = Post.objects.all().select_related('author')
     serializer_class = PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = CursorOrPageNumberPagination
+    replica_reads = True  # see social_media_api/db_router.py
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = []  # You can add more filters later
-    search_fields = ['title', 'content']
-    ordering_fields = ['created_at', 'updated_at']
+    search_fields = ['title', 'content']  # FTS5-indexed; see posts/search.py
+    ordering_fields = ['created_at', 'updated_at', 'comment_count', 'last_comment_at']
+    query_plan_probes = [{'comments': 'all'}]  # see posts/query_plans.py
+
+    def get_queryset(self):
+        return with_comments(super().get_queryset(), full=self.wants_all_comments())
+
+    def wants_all_comments(self):
+        return self.request.query_params.get('comments') == 'all'
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['full_comments'] = self.wants_all_comments()
+        return context
+
+    def get_related_validator(self, pks):
+        # embedded comments are part of the representation
+        stats = Comment.objects.filter(post_id__in=pks).aggregate(
+            modified=Max('updated_at'), total=Count('id'), last_id=Max('id')
+        )
+        return stats['modified'], f"{stats['total']}:{stats['last_id']}"
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        # fan-out-on-write: push the new post into every follower's feed
+        fan_out_post(post)
+        publish_post(post.author_id, serializer.data)
 
 
 # ---------------------------------------------------------------------
 # 🔹 COMMENT VIEWSET
 # ---------------------------------------------------------------------
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     CRUD operations for comments.
 
     - Create: Authenticated users only.
     - Update/Delete: Only comment author.
+
+    GET responses carry ETag/Last-Modified and answer 304 when unchanged.
+
+    POST /api/comments/batch/ creates up to 500 comments at once (see batch).
     """
     queryset = Comment.objects.all().select_related('author', 'post')
     serializer_class = CommentSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = CursorOrPageNumberPagination
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['post']
     search_fields = ['content']
     ordering_fields = ['created_at', 'updated_at']
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        # the post's comment_count/last_comment_at are updated by a signal
+        # and must commit or roll back together with the comment
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            publish_comment(comment.post.author_id, serializer.data)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+    @action(detail=False, methods=['post'], serializer_class=CommentBatchSerializer)
+    def batch(self, request):
+        """
+        {"comments": [{"post": 1, "content": "..."}, ...], "atomic": false}
+
+        Every item gets a result (created, invalid or skipped; see
+        posts/comments.py). Answers 201 when all were created, 207 when only
+        some were, and 400 when none were.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = create_comments(
+            request.user,
+            serializer.validated_data['comments'],
+            atomic=serializer.validated_data['atomic'],
+        )
+        created = sum(1 for result in results if result['status'] == CREATED)
+        if created == len(results):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'results': results}, status=code)
 
 
 # ---------------------------------------------------------------------
@@ -79,17 +154,97 @@ class FeedView(generics.ListAPIView):
     """
     Returns posts from users that the current user follows.
 
+    Served from the materialized FeedEntry table (see posts/feed.py), which
+    holds the newest FEED_MAX_ENTRIES posts per user.
+
+    Paginated by cursor on (created_at, post id); pass ?page=N for the
+    old page-number responses. ?rank=top orders by precomputed score
+    (recency, affinity for the author, comment activity; see
+    posts/ranking.py) instead.
+
+    The first page also returns ``since``, a watermark; ?since=<watermark>
+    then returns only the posts added to the feed after it, with the next
+    watermark (see posts/longpoll.py). /api/async/feed/ additionally takes
+    ?wait=<seconds> to hold an empty delta open until posts arrive.
+
     Endpoint:
         GET /api/feed/
+        GET /api/feed/?rank=top
+        GET /api/feed/?since=<watermark>
 
     Requires token authentication.
     """
     serializer_class = PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = CursorOrPageNumberPagination
+    cursor_tiebreaker = 'feed_post_id'
+    replica_reads = True
+    query_plan_probes = [{'rank': 'top'}]  # see posts/query_plans.py
 
     def get_queryset(self):
-        user = self.request.user
-        following_users = user.following.all() if hasattr(user, 'following') else User.objects.none()
-        return Post.objects.filter(author__in=following_users).order_by('-created_at')
+        ranked = self.request.query_params.get('rank') == 'top'
+        return with_comments(feed_queryset(self.request.user, ranked=ranked))
+
+    def get_delta_queryset(self, since):
+        return with_comments(feed_queryset(self.request.user, since=since))
+
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        if since is not None:
+            since = parse_since(since)
+            limit = KeysetPagination().get_page_size(request)
+            posts = list(self.get_delta_queryset(since)[:limit + 1])
+            return Response(delta_response(posts, self.serialize, since, limit))
+        response = super().list(request, *args, **kwargs)
+        if is_first_page(request.query_params):
+            response.data['since'] = watermark(self.page)
+        return response
+
+    def paginate_queryset(self, queryset):
+        self.page = super().paginate_queryset(queryset)
+        return self.page
+
+    def serialize(self, posts):
+        return self.get_serializer(posts, many=True).data
+
+
+# ---------------------------------------------------------------------
+# 🔹 EXPORT VIEW
+# ---------------------------------------------------------------------
+class ExportView(APIView):
+    """
+    Streams the current user's posts and comments as NDJSON.
+
+    Endpoint:
+        GET /api/export/                  -> application/x-ndjson
+        GET /api/export/?compress=gzip    -> gzip-compressed NDJSON
+
+    Staff may export another account with ?user=<id>. The body is
+    generated while it is sent, from an async iterator when served over
+    ASGI (see posts/export.py).
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        user_id = request.query_params.get('user')
+        if user_id and str(user_id) != str(user.pk):
+            if not user.is_staff:
+                raise PermissionDenied("Only staff can export other users.")
+            if not user_id.isdigit():
+                raise ValidationError({'user': ["Expected a user id."]})
+            user = get_object_or_404(User, pk=user_id)
+
+        compress = request.query_params.get('compress') == 'gzip'
+        # ASGI collects a sync iterator into a list before sending it
+        stream = aexport_stream if isinstance(request._request, ASGIRequest) else export_stream
+        filename = f"{user.username}-activity.ndjson"
+        if compress:
+            response = StreamingHttpResponse(stream(user, compress=True), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(stream(user), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
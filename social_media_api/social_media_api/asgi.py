@@ -10,7 +10,39 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Paths served by native async views (posts/async_views.py).
+ASYNC_PATH_PREFIXES = ('/api/async/',)
+
+
+class SharedThreadASGIHandler(ASGIHandler):
+    """
+    ASGIHandler without the per-request ThreadSensitiveContext.
+
+    Django normally gives every request its own sync thread for the whole
+    request lifetime, even when the view is async, so N open connections
+    hold N threads. Async-only paths instead run their few sync hops
+    (signals, middleware, ORM calls) on asgiref's one shared sync thread.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(
+                "Django can only handle ASGI/HTTP connections, not %s." % scope['type']
+            )
+        await self.handle(scope, receive, send)
+
+
+async_application = SharedThreadASGIHandler()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(ASYNC_PATH_PREFIXES):
+        await async_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,118 @@
+# social_media_api/db_router.py
+"""
+Primary/replica routing with read-your-writes stickiness.
+
+Writes always go to ``default``. Reads go to a random alias from
+DATABASE_REPLICAS only while serving a safe request to a view that opts in
+with ``replica_reads = True`` (PostViewSet, FeedView, UserListView);
+everything else — management commands, unsafe requests, other views —
+reads from the primary as before.
+
+A client that has just written is pinned to the primary for
+REPLICA_PIN_SECONDS so it sees its own writes despite replication lag.
+Clients are identified by their Authorization header (or session cookie)
+and the pin is kept in Django's cache, which must be shared between
+worker processes in a multi-process deployment.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# tokens and sessions are read right after they are created (login), so a
+# lagging replica would reject them; the token cache absorbs their reads
+PRIMARY_ONLY_APPS = {'authtoken', 'sessions'}
+
+PIN_CACHE_PREFIX = 'replica-pin:'
+
+# per-request routing state: {'replica': bool, 'wrote': bool}
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if not state or not state['replica'] or state['wrote']:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # later reads in this request, and the client's next requests,
+            # must see the write
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # replicas are copies of the primary and are never migrated directly
+        return db not in replica_aliases()
+
+
+class ReadYourWritesMiddleware:
+    """
+    Sets up routing state for each request and pins clients that wrote to
+    the primary for REPLICA_PIN_SECONDS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {'replica': False, 'wrote': False}
+        token = _state.set(state)
+        try:
+            request._db_routing_state = state
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state['wrote'] or (request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400):
+            pin_key = self.pin_key(request)
+            if pin_key is not None:
+                cache.set(pin_key, True, pin_seconds())
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = getattr(request, '_db_routing_state', None)
+        if state is None or not replica_aliases():
+            return None
+        # DRF views (including viewsets) expose .cls, plain Django views .view_class
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        state['replica'] = (
+            getattr(view_class, 'replica_reads', False)
+            and request.method in ('GET', 'HEAD', 'OPTIONS')
+            and not self.is_pinned(request)
+        )
+        return None
+
+    def is_pinned(self, request):
+        pin_key = self.pin_key(request)
+        return pin_key is not None and cache.get(pin_key) is not None
+
+    def pin_key(self, request):
+        identity = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        if not identity:
+            return None
+        return PIN_CACHE_PREFIX + hashlib.sha256(identity.encode('utf-8')).hexdigest()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,6 +53,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'social_media_api.db_router.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -86,6 +88,23 @@ DATABASES = {
     }
 }
 
+# Read replicas (social_media_api/db_router.py). SQLITE_REPLICAS=N adds N
+# local SQLite replicas, db.replica<i>.sqlite3, which `manage.py
+# sync_replicas` keeps in step with the primary.
+DATABASE_REPLICAS = []
+for i in range(1, int(os.environ.get('SQLITE_REPLICAS', '0')) + 1):
+    DATABASES[f'replica{i}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.replica{i}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{i}')
+
+DATABASE_ROUTERS = ['social_media_api.db_router.PrimaryReplicaRouter']
+
+# Seconds a client that wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,7 +149,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -145,4 +164,63 @@ REST_FRAMEWORK = {
 }
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Profile picture thumbnails (accounts/thumbnails.py), rendered by a pool of
+# THUMBNAIL_WORKERS processes; 0 renders inline after commit
+PROFILE_THUMBNAIL_SIZES = (64, 128, 256)
+THUMBNAIL_WORKERS = 2
+
+# Home feed: number of posts kept per user in the materialized feed
+FEED_MAX_ENTRIES = 500
+
+# Ranked feed (?rank=top, posts/ranking.py): activity decays by e every
+# FEED_RANK_DECAY_SECONDS; a comment weighs this much of a new post; each
+# e-fold of the viewer's comments on an author adds this many decay periods
+FEED_RANK_DECAY_SECONDS = 12 * 60 * 60
+FEED_RANK_COMMENT_WEIGHT = 0.5
+FEED_RANK_AFFINITY_WEIGHT = 1.0
+
+# Feed long-poll (/api/async/feed/?since=...&wait=N, posts/longpoll.py): the
+# longest wait a client may ask for, and how often a waiting request
+# rechecks for posts fanned out by other worker processes (seconds)
+FEED_LONG_POLL_MAX_WAIT = 30
+FEED_LONG_POLL_RECHECK = 5
+
+# Server-sent events (/api/async/events/, posts/events.py): how events reach
+# the other worker processes (posts.events.UnixSocketTransport for several
+# workers on one host, sharing EVENTS_SOCKET_DIR), frames a stream may fall
+# behind before it is dropped, and seconds between keepalive comments
+EVENTS_TRANSPORT = 'posts.events.LocalTransport'
+EVENTS_SOCKET_DIR = None  # None: <tmp>/social_media_api-events
+EVENTS_QUEUE_SIZE = 256
+EVENTS_HEARTBEAT = 15
+
+# In-process follow-graph cache (accounts/graph.py)
+FOLLOW_GRAPH_CACHE_BYTES = 32 * 1024 * 1024
+FOLLOW_GRAPH_CACHE_TTL = 60  # seconds; bounds staleness across worker processes
+
+# Username autocomplete (accounts/autocomplete.py): prefixes matching at least
+# AUTOCOMPLETE_SCAN_LIMIT users are ranked by walking the followers_count index
+AUTOCOMPLETE_SCAN_LIMIT = 2000
+AUTOCOMPLETE_MAX_RESULTS = 20
+
+# Number of latest comments embedded in each serialized post
+POST_COMMENT_PREVIEW_SIZE = 3
+
+# Cached post/comment representations (posts/representations.py)
+REPRESENTATION_CACHE_MAX_ENTRIES = 20000
+
+# Cached token authentication (accounts/authentication.py)
+TOKEN_CACHE_MAX_ENTRIES = 10000
+TOKEN_CACHE_TTL = 30  # seconds
+
+# Async login (accounts/hashing.py): password hashing threads, and how many
+# more logins may wait for one before the rest get a 503
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_QUEUE_DEPTH = 32
+
+# Bulk user import (accounts/importer.py): rows per bulk insert, and password
+# hashing processes (None: one per CPU)
+IMPORT_BATCH_SIZE = 1000
+IMPORT_HASH_WORKERS = None
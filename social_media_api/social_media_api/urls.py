@@ -19,9 +19,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from accounts.async_views import AsyncLoginView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')),
+    # async login for ASGI deployments (see accounts/async_views.py)
+    path('api/async/accounts/login/', AsyncLoginView.as_view(), name='async-login'),
     path('api/', include('posts.urls')),
 ]
 